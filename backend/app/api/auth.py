@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import RedirectResponse
+from sqlalchemy import select
 
 from app.auth.google import oauth
 from app.auth.jwt import create_access_token
 from app.auth.deps import get_current_user
-from app.db.session import get_db
+from app.db.session import consultar, get_db, get_sesion
 from app.models.user import User
 from app.models.user_file import UserFile
 from app.core.config import FRONTEND_URL
@@ -57,8 +58,8 @@ def me(user: User = Depends(get_current_user)):
     }
 
 @router.get("/my-files")
-def my_files(
+async def my_files(
     user: User = Depends(get_current_user),
-    db=Depends(get_db)
+    db=Depends(get_sesion)
 ):
-    return db.query(UserFile).filter(UserFile.user_id == user.id).all()
+    return await consultar(db, select(UserFile).where(UserFile.user_id == user.id))
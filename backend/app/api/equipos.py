@@ -1,18 +1,27 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Request
 
-from app.db.session import get_db
-from app.services.equipo_service import get_equipos, get_jugadores_por_equipo
-from app.schemas.equipo import EquipoOut
+from app.services import equipo_cache
+from app.schemas.equipo import EquipoConJugadoresOut, EquipoOut
 from app.schemas.jugador import JugadorOut
 
 # ❌ quitamos prefix aquí
 router = APIRouter(tags=["Equipos"])
 
+# Respuestas ya serializadas en memoria (equipo_cache) con ETag: un
+# cliente con la versión vigente recibe 304 sin cuerpo
 @router.get("/", response_model=list[EquipoOut])
-def listar_equipos(db: Session = Depends(get_db)):
-    return get_equipos(db)
+async def listar_equipos(request: Request):
+    return equipo_cache.responder_cacheado(request, await equipo_cache.obtener(equipo_cache.equipos))
+
+@router.get("/plantillas", response_model=list[EquipoConJugadoresOut])
+async def equipos_con_jugadores(request: Request):
+    """Todos los equipos con sus jugadores en una sola respuesta."""
+    return equipo_cache.responder_cacheado(
+        request, await equipo_cache.obtener(equipo_cache.equipos_con_jugadores)
+    )
 
 @router.get("/{equipo_id}/jugadores", response_model=list[JugadorOut])
-def jugadores_por_equipo(equipo_id: int, db: Session = Depends(get_db)):
-    return get_jugadores_por_equipo(db, equipo_id)
\ No newline at end of file
+async def jugadores_por_equipo(equipo_id: int, request: Request):
+    return equipo_cache.responder_cacheado(
+        request, await equipo_cache.obtener(equipo_cache.plantilla_equipo, equipo_id)
+    )
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+
+# espacial_service (pandas) se importa dentro de la ruta, como en kpis/stats
+router = APIRouter(prefix="/espacial", tags=["espacial"])
+
+
+@router.get("/by-equipo/{equipo_id}")
+def mapa_equipo(
+    equipo_id: int,
+    partido_id: int | None = None,
+    rejilla: str = Query("zonas", description="zonas (12x8) | tercios (tercios x carriles)"),
+    columnas: int | None = Query(None, description="Rejilla propia: celdas a lo largo (x)"),
+    filas: int | None = Query(None, description="Rejilla propia: celdas a lo ancho (y)"),
+    agrupar: str = Query("equipo", description="equipo | jugador | periodo"),
+    categoria: str | None = None,
+    top_flujos: int = Query(50, ge=0, le=5000),
+    db: Session = Depends(get_db),
+):
+    """
+    Heatmap (conteo por celda, filas x columnas) y flujos de pase
+    origen→destino del equipo, de un partido o de toda la temporada.
+    """
+    from app.services.espacial_service import mapa_espacial
+
+    return mapa_espacial(
+        db,
+        equipo_id,
+        partido_id=partido_id,
+        rejilla=rejilla,
+        columnas=columnas,
+        filas=filas,
+        agrupar=agrupar,
+        categoria=categoria,
+        top_flujos=top_flujos,
+    )
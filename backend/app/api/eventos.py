@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.db.session import SessionLocal
+
+# evento_service (pandas) se importa dentro de la ruta, como en kpis/stats
+router = APIRouter(prefix="/eventos", tags=["eventos"])
+
+
+@router.get("")
+def listar_eventos(
+    equipo_id: int | None = None,
+    partido_id: int | None = None,
+    id_jugador: int | None = None,
+    periodo: str | None = None,
+    categoria: str | None = None,
+    x_min: float | None = None,
+    x_max: float | None = None,
+    y_min: float | None = None,
+    y_max: float | None = None,
+    despues_de: int | None = Query(None, description="Cursor: id del último evento recibido"),
+    limite: int = Query(1000, ge=1, le=10000),
+):
+    """
+    Eventos guardados en NDJSON (una línea por evento, ordenados por id).
+    La última línea es {"siguiente": <cursor>} o {"siguiente": null} si no
+    hay más páginas; el cursor se pasa como `despues_de`.
+    """
+    from app.services.evento_service import COLUMNAS_CONSULTA, consulta_eventos, iter_eventos
+    import orjson
+
+    # Sesión propia: vive lo que dure el stream, no lo que dure la ruta
+    db = SessionLocal()
+    try:
+        zona = (x_min, x_max, y_min, y_max)
+        query = consulta_eventos(
+            db,
+            equipo_id=equipo_id,
+            partido_id=partido_id,
+            id_jugador=id_jugador,
+            periodo=periodo,
+            categoria=categoria,
+            zona=None if zona == (None, None, None, None) else zona,
+            despues_de=despues_de,
+            limite=limite,
+        )
+    except Exception:
+        db.close()
+        raise
+
+    def ndjson():
+        enviados, ultimo = 0, None
+        try:
+            for filas in iter_eventos(db, query):
+                enviados += len(filas)
+                ultimo = filas[-1][0]
+                yield b"".join(
+                    orjson.dumps(dict(zip(COLUMNAS_CONSULTA, fila))) + b"\n" for fila in filas
+                )
+        finally:
+            db.close()
+
+        # Página llena → puede haber más; si no, fin
+        siguiente = ultimo if enviados == limite else None
+        yield orjson.dumps({"siguiente": siguiente}) + b"\n"
+
+    # Si el stream nunca arranca (cliente cortó), cerrar igual la sesión
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(db.close),
+    )
@@ -1,20 +1,72 @@
-from fastapi import APIRouter, UploadFile, File, Depends
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.auth.deps import get_current_user
-from app.db.session import get_db
-from app.services.file_service import save_file
+from app.core.metricas import leer_upload
+from app.db.session import consultar_uno, get_db, get_sesion
+from app.models.user_file import UserFile
+from app.services import compute_service
 
 router = APIRouter(prefix="/files", tags=["files"])
 
 @router.post("/upload")
-def upload_file(
+async def upload_file(
     file: UploadFile = File(...),
     user = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    record = save_file(db, user, file)
+    # Importación diferida: file_service arrastra pandas
+    from app.services.file_service import importar_archivo, save_file, validar_upload
+
+    validar_upload(file)
+    try:
+        data = await leer_upload(file)
+    finally:
+        await file.close()
+
+    record = await run_in_threadpool(save_file, db, user, file.filename, data)
+
+    # Parseo, Parquet y KPIs en el pool de cómputo, fuera del event loop
+    dataset, error = None, None
+    try:
+        dataset = await compute_service.ejecutar(importar_archivo, record.id, data)
+    except HTTPException as e:
+        # Planilla ilegible, pool lleno o lento: el archivo queda guardado,
+        # sin eventos, y el cliente ve por qué
+        print("⚠️ No se importaron eventos de", record.filename, "→", e.detail)
+        error = e.detail
+
     return {
         "id": record.id,
-        "filename": record.filename
+        "filename": record.filename,
+        "dataset": dataset,
+        "dataset_error": error,
     }
+
+
+# --- KPIs de un archivo guardado (dataset Parquet, sin reparsear) ---
+@router.get("/{file_id}/kpis")
+async def kpis_archivo(
+    request: Request,
+    file_id: int,
+    equipo_id: int,
+    formato: str | None = None,
+    user = Depends(get_current_user),
+    db = Depends(get_sesion)
+):
+    from app.services.pipeline_service import kpis_desde_dataset
+    from app.utils.respuestas import RECORDS, formato_pedido, responder
+
+    record = await consultar_uno(
+        db, select(UserFile).where(UserFile.id == file_id, UserFile.user_id == user.id)
+    )
+    if record is None:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    formato = formato_pedido(request, formato)
+    resultado = await compute_service.ejecutar(kpis_desde_dataset, record.id, equipo_id, formato)
+    if formato == RECORDS:
+        return resultado
+    return responder(request, resultado, formato, tabla="eventos")
@@ -1,88 +1,234 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Depends, Request, Query, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import os
-import tempfile
-import pandas as pd
 
+from app.core.metricas import leer_upload
 from app.db.session import get_db
-from app.utils.stats_loader import load_stats
-from app.services.stats_service import merge_stats_with_players, filter_stats_by_equipo
-from app.services.kpi_service import calcular_kpis
+from app.services import compute_service
 
-router = APIRouter(prefix="/kpis", tags=["kpis"])
-
-# --- FUNCION AUXILIAR PARA PROCESAR ---
-def procesar_datos_kpi(db, equipo_id, df_input=None):
-    filtered = filter_stats_by_equipo(db, df_input, equipo_id)
+# Los servicios con pandas se importan dentro de cada ruta: el arranque
+# (y las réplicas que solo sirven equipos/auth) no cargan pandas.
 
-    if filtered is None or (isinstance(filtered, pd.DataFrame) and filtered.empty):
-        return None
+router = APIRouter(prefix="/kpis", tags=["kpis"])
 
-    event_col = next(
-        (c for c in filtered.columns if c.lower() in ["event", "evento", "type"]),
-        None
-    )
 
-    kpis = calcular_kpis(filtered)
-    eventos_dict = []
+# --- ENDPOINT PARA LA TABLA (GET) ---
+@router.get("/by-equipo/{equipo_id}")
+def get_kpis_equipo(
+    request: Request,
+    equipo_id: int,
+    incluir_eventos: bool = True,
+    incluir_xt: bool = True,
+    formato: str | None = None,
+    db: Session = Depends(get_db)
+):
+    from app.services.evento_service import cargar_eventos
+    from app.services.kpi_agregado_service import kpis_temporada
+    from app.services.pipeline_service import agregar_xt, eventos_payload
+    from app.services.xt_service import modelo_xt
+    from app.utils.respuestas import RECORDS, formato_pedido
+
+    formato = formato_pedido(request, formato)
+
+    # KPIs de temporada desde los contadores materializados (O(grupos));
+    # partidos viejos sin contadores los completa el backfill del arranque
+    kpis = kpis_temporada(db, equipo_id)
+    if not kpis:
+        kpis = {"por_jugador": {}}
+        incluir_eventos = incluir_xt = False
+
+    eventos = [] if formato == RECORDS else {}
+    xt = None
+    df = None
+    if incluir_xt and modelo_xt() is not None:
+        # Partidos completos, como POST y el stream: el ranking por equipo
+        # incluye al rival. Los eventos salen de la misma lectura.
+        df_partidos = cargar_eventos(db, partidos_de=equipo_id)
+        xt = agregar_xt(df_partidos, equipo_id)
+        df = df_partidos[df_partidos["equipo_id"] == equipo_id].reset_index(drop=True)
+    elif incluir_eventos:
+        # Lectura por índice eventos.equipo_id
+        df = cargar_eventos(db, equipo_id=equipo_id)
+
+    if incluir_eventos:
+        eventos = eventos_payload(df, formato)
+
+    return _responder(request, {**kpis, "eventos": eventos, "xt": xt}, formato)
+
+
+# --- xT: superficie de valor vigente ---
+@router.get("/xt/modelo")
+def get_modelo_xt():
+    from app.services.xt_service import info_modelo, modelo_xt
+
+    modelo = modelo_xt()
+    if modelo is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No hay modelo xT: python -m app.scripts.ajustar_xt"
+        )
+
+    return {**info_modelo(modelo), "valores": modelo["valores"].round(5).tolist()}
+
+
+# --- POSESIONES de un partido guardado ---
+@router.get("/posesiones/partido/{partido_id}")
+def get_posesiones_partido(
+    partido_id: int,
+    equipo_id: int | None = None,
+    ventana: int | None = Query(None, ge=1),
+    paso: int | None = Query(None, ge=1),
+    incluir_secuencias: bool = True,
+    db: Session = Depends(get_db)
+):
+    from app.services.evento_service import cargar_eventos
+    from app.services.posesion_service import analizar_posesiones
 
-    if not filtered.empty:
-        columnas = ["x", "y", "x2", "y2"]
-        if event_col:
-            columnas.append(event_col)
+    # Ambos equipos, en el orden del archivo (eventos.id)
+    df = cargar_eventos(db, partido_id=partido_id)
+    if df.empty:
+        raise HTTPException(status_code=404, detail="Partido sin eventos")
 
-        cols_to_use = [c for c in columnas if c in filtered.columns]
-        eventos_dict = filtered[cols_to_use].fillna(0).to_dict("records")
+    return analizar_posesiones(df, equipo_id, ventana, paso, incluir_secuencias)
 
-    return {**kpis, "eventos": eventos_dict}
 
+def _responder(request, contenido, formato):
+    from app.utils.respuestas import RECORDS, responder
 
-# --- ENDPOINT PARA LA TABLA (GET) ---
-@router.get("/by-equipo/{equipo_id}")
-def get_kpis_equipo(equipo_id: int, db: Session = Depends(get_db)):
-    resultado = procesar_datos_kpi(db, equipo_id)
-    if not resultado:
-        return {"por_jugador": {}, "eventos": []}
-    return resultado
+    if formato == RECORDS:
+        return contenido
+    return responder(request, contenido, formato, tabla="eventos")
 
 
 # --- ENDPOINT PARA CARGAR EXCEL (POST) ---
+# Parseo y KPIs corren en el pool de procesos (compute_service)
 @router.post("/by-equipo/{equipo_id}")
-def post_kpis_equipo(
+async def post_kpis_equipo(
+    request: Request,
     equipo_id: int,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    incluir_eventos: bool = True,
+    formato: str | None = None,
 ):
+    from app.services.pipeline_service import kpis_desde_upload
+    from app.utils.respuestas import formato_pedido
+
+    formato = formato_pedido(request, formato)
     suffix = os.path.splitext(file.filename or "")[1].lower() or ".xlsx"
 
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    path = tmp.name
+    if not incluir_eventos:
+        return _responder(request, await _post_kpis_stream(equipo_id, file, suffix, formato), formato)
 
     try:
-        # Guardar archivo subido
-        with open(path, "wb") as f:
-            f.write(file.file.read())
+        data = await leer_upload(file)
+        # El worker ya devuelve las columnas (arreglos NumPy, pickle barato)
+        resultado = await compute_service.ejecutar(
+            kpis_desde_upload, data, suffix, file.filename, equipo_id, formato
+        )
+        return _responder(request, resultado, formato)
+
+    finally:
+        # Cerrar archivo subido
+        await file.close()
 
-        # Cargar Excel (se cierra correctamente en load_stats)
-        df = load_stats(path)
 
-        merged = merge_stats_with_players(db, df)
-        resultado = procesar_datos_kpi(db, equipo_id, df_input=merged)
+async def _post_kpis_stream(equipo_id, file, suffix, formato):
+    from app.services.upload_cache import copiar_upload
+    from app.services.pipeline_service import kpis_desde_archivo_stream
 
-        if not resultado:
-            raise HTTPException(status_code=422, detail="No hay datos para este equipo")
+    # Copia por bloques en un hilo; el worker lee el archivo por bloques
+    path, clave = await run_in_threadpool(copiar_upload, file.file, suffix)
 
-        return resultado
+    try:
+        return await compute_service.ejecutar(
+            kpis_desde_archivo_stream, path, clave, file.filename, equipo_id, False, None, formato
+        )
 
     finally:
-        # Cerrar archivo subido y eliminar temporal
-        try:
-            file.file.close()
-        except Exception:
-            pass
+        await file.close()
 
         try:
             if os.path.exists(path):
                 os.remove(path)
         except PermissionError:
             pass
+
+
+# --- TEMPORADA: lote de partidos (varios archivos o un zip) ---
+# Cada partido se procesa en paralelo en el pool; luego se suman contadores
+@router.post("/temporada/by-equipo/{equipo_id}")
+async def post_kpis_temporada(
+    equipo_id: int,
+    files: list[UploadFile] = File(...),
+    ventana: int | None = Query(None, ge=1, description="Partidos de la forma reciente"),
+):
+    from app.core.config import TEMPORADA_VENTANA_FORMA
+    from app.services.temporada_service import expandir_lote, kpis_lote, procesar_partido
+
+    try:
+        archivos = [(f.filename, await leer_upload(f)) for f in files]
+    finally:
+        for f in files:
+            await f.close()
+
+    partidos = await run_in_threadpool(expandir_lote, archivos)
+    del archivos
+
+    resultados = await compute_service.ejecutar_lote(
+        procesar_partido, [(data, suffix, nombre) for nombre, data, suffix in partidos]
+    )
+
+    ok, errores = [], []
+    for (nombre, _, _), r in zip(partidos, resultados):
+        if isinstance(r, HTTPException):
+            errores.append({"archivo": nombre, "status_code": r.status_code, "detail": r.detail})
+        else:
+            ok.append(r)
+
+    if not ok:
+        raise HTTPException(status_code=422, detail={"mensaje": "Ningún partido se pudo procesar", "errores": errores})
+
+    kpis = await compute_service.ejecutar(kpis_lote, equipo_id, ok, ventana or TEMPORADA_VENTANA_FORMA)
+    return {**kpis, "errores": errores}
+
+
+# --- JOBS: archivos grandes sin esperar la respuesta ---
+@router.post("/jobs/by-equipo/{equipo_id}", status_code=202)
+async def crear_job_kpis(
+    request: Request,
+    equipo_id: int,
+    file: UploadFile = File(...),
+    incluir_eventos: bool = False,
+    formato: str | None = None,
+):
+    from app.services import job_service
+    from app.services.upload_cache import copiar_upload
+    from app.utils.respuestas import formato_pedido
+
+    # El formato se fija al crear el job (los eventos se arman en el worker)
+    formato = formato_pedido(request, formato)
+
+    suffix = os.path.splitext(file.filename or "")[1].lower() or ".xlsx"
+
+    try:
+        path, clave = await run_in_threadpool(copiar_upload, file.file, suffix)
+    finally:
+        await file.close()
+
+    # El temporal lo borra el job al terminar
+    return job_service.crear_job(path, clave, file.filename, equipo_id, incluir_eventos, formato)
+
+
+@router.get("/jobs/{job_id}")
+def estado_job_kpis(job_id: str):
+    from app.services import job_service
+    return job_service.estado_job(job_id)
+
+
+@router.get("/jobs/{job_id}/resultado")
+def resultado_job_kpis(request: Request, job_id: str):
+    from app.services import job_service
+
+    job = job_service.estado_job(job_id)
+    return _responder(request, job_service.resultado_job(job_id), job["formato"])
@@ -5,6 +5,8 @@ from app.api.stats import router as stats_router
 from app.api.kpis import router as kpis_router
 from app.api.auth import router as auth_router
 from app.api.files import router as files_router
+from app.api.eventos import router as eventos_router
+from app.api.espacial import router as espacial_router
 
 # Prefijo global /api
 router = APIRouter(prefix="/api")
@@ -14,4 +16,6 @@ router.include_router(auth_router)
 router.include_router(files_router)
 router.include_router(equipos_router, prefix="/equipos", tags=["Equipos"])
 router.include_router(stats_router, prefix="/stats", tags=["Stats"])
-router.include_router(kpis_router)
\ No newline at end of file
+router.include_router(kpis_router)
+router.include_router(eventos_router)
+router.include_router(espacial_router)
\ No newline at end of file
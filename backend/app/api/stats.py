@@ -1,73 +1,68 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.utils.stats_loader import load_stats
-from app.services.stats_service import (
-    merge_stats_with_players,
-    filter_stats_by_equipo
-)
-import tempfile, os, gc
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from app.core.metricas import leer_upload
+from app.services import compute_service
+import os
 
-router = APIRouter()
+# Los servicios con pandas se importan dentro de cada ruta: el arranque
+# (y las réplicas que solo sirven equipos/auth) no cargan pandas.
 
-def _load_tmp_file(file: UploadFile) -> str:
-    suffix = os.path.splitext(file.filename)[1].lower()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, mode="wb") as tmp:
-        tmp.write(file.file.read())
-        return tmp.name
+router = APIRouter()
 
 
-@router.post("/upload")
-def upload_stats(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+async def _procesar_upload(
+    request: Request,
+    file: UploadFile,
+    equipo_id: int | None = None,
+    formato: str | None = None,
 ):
-    path = _load_tmp_file(file)
+    from app.services.pipeline_service import stats_desde_upload
+    from app.utils.respuestas import RECORDS, formato_pedido, responder
+
+    formato = formato_pedido(request, formato)
+    suffix = os.path.splitext(file.filename)[1].lower()
     try:
-        df = load_stats(path)
-        merged = merge_stats_with_players(db, df)
-        res = merged.fillna("").to_dict(orient="records")
-        del df
-        return res
+        data = await leer_upload(file)
+        resultado = await compute_service.ejecutar(stats_desde_upload, data, suffix, equipo_id, formato)
+        if formato == RECORDS:
+            return resultado
+        return responder(request, resultado, formato, tabla="columnas")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         try:
-            file.file.close()          # ✅ FIX
+            await file.close()          # ✅ FIX
         except Exception:
             pass
-        gc.collect()
-        if os.path.exists(path):
-            try:
-                os.remove(path)
-            except:
-                pass
+
+
+@router.post("/upload")
+async def upload_stats(request: Request, file: UploadFile = File(...), formato: str | None = None):
+    return await _procesar_upload(request, file, formato=formato)
 
 
 @router.post("/by-equipo/{equipo_id}")
-def stats_por_equipo(
+async def stats_por_equipo(
+    request: Request,
     equipo_id: int,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    formato: str | None = None,
 ):
-    path = _load_tmp_file(file)
-    try:
-        df = load_stats(path)
-        merged = merge_stats_with_players(db, df)
-        filtered = filter_stats_by_equipo(db, merged, equipo_id)
-        res = filtered.fillna("").to_dict(orient="records")
-        del df
-        return res
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        try:
-            file.file.close()          # ✅ FIX
-        except Exception:
-            pass
-        gc.collect()
-        if os.path.exists(path):
-            try:
-                os.remove(path)
-            except:
-                pass
+    return await _procesar_upload(request, file, equipo_id, formato)
+
+
+@router.get("/cache")
+def estado_cache():
+    from app.auth import cache as auth_cache
+    from app.db.session import metricas_pool
+    from app.services import equipo_cache
+    from app.services.upload_cache import cache_stats_pool
+    return {
+        # Sumados entre el proceso web y los workers del pool
+        **cache_stats_pool(compute_service.estados_workers()),
+        "compute": compute_service.estado(),
+        "db": metricas_pool(),
+        "auth": auth_cache.estado(),
+        "equipos": equipo_cache.estado(),
+    }
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from app.core.config import AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS
+from app.models.user import User
+
+# ─────────────────────────────
+# Caché de autenticación (TTL + LRU)
+# ─────────────────────────────
+# tokens:   token → user_id (el JWT ya verificado; vence con el TTL o el exp)
+# usuarios: user_id → columnas de la fila users
+# Un cambio en la fila (ORM: update/delete) invalida la entrada; entre
+# procesos/réplicas la frescura la acota el TTL.
+class CacheTTL:
+    def __init__(self, max_entradas: int, ttl: float):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._datos: "OrderedDict[object, tuple[float, object]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def obtener(self, clave):
+        ahora = time.time()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] <= ahora:
+                if entrada is not None:
+                    del self._datos[clave]
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return entrada[1]
+
+    def guardar(self, clave, valor, expira: float | None = None):
+        vence = time.time() + self.ttl
+        if expira is not None:
+            vence = min(vence, expira)
+        with self._lock:
+            self._datos[clave] = (vence, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def quitar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {"entradas": len(self._datos), "hits": self.hits, "misses": self.misses}
+
+
+tokens = CacheTTL(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS)
+usuarios = CacheTTL(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS)
+
+# Sube con cada invalidación: una lectura que empezó antes no se cachea
+_generacion = 0
+_lock = threading.Lock()
+
+
+def generacion() -> int:
+    with _lock:
+        return _generacion
+
+
+def invalidar_usuario(user_id: int):
+    global _generacion
+    with _lock:
+        _generacion += 1
+    usuarios.quitar(user_id)
+
+
+def guardar_usuario(user: User, generacion_lectura: int):
+    datos = {c.key: getattr(user, c.key) for c in User.__table__.columns}
+    with _lock:
+        if generacion_lectura != _generacion:
+            return
+        usuarios.guardar(user.id, datos)
+
+
+def usuario_cacheado(user_id: int) -> User | None:
+    # Instancia nueva (transitoria) por request: nada compartido entre hilos
+    datos = usuarios.obtener(user_id)
+    return User(**datos) if datos is not None else None
+
+
+def limpiar():
+    tokens.limpiar()
+    usuarios.limpiar()
+
+
+def estado() -> dict:
+    return {
+        "ttl_segundos": AUTH_CACHE_TTL_SECONDS,
+        "tokens": tokens.estado(),
+        "usuarios": usuarios.estado(),
+    }
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _usuario_modificado(mapper, connection, target):
+    invalidar_usuario(target.id)
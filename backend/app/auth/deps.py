@@ -1,17 +1,17 @@
-from fastapi import Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from fastapi import HTTPException, Request
+from sqlalchemy import select
 from jose import jwt, JWTError
 
+from app.auth import cache
 from app.core.config import SECRET_KEY
-from app.db.session import get_db
+from app.db.session import leer_uno
 from app.models.user import User
 
 ALGORITHM = "HS256"
 
-def get_current_user(
-    request: Request,
-    db: Session = Depends(get_db)
-):
+async def get_current_user(request: Request):
+    # Con caché (auth/cache.py): ni verificación JWT ni sesión de BD en
+    # los requests repetidos del mismo token/usuario
     # ✅ FIX: cookie O Authorization header
     token = request.cookies.get("access_token")
 
@@ -23,16 +23,28 @@ def get_current_user(
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+    user_id = cache.tokens.obtener(token)
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_id = payload.get("sub")
+            if user_id is None:
+                raise HTTPException(status_code=401, detail="Invalid token")
+        except JWTError:
             raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+        user_id = int(user_id)
+        # El token cacheado no sobrevive a su exp
+        cache.tokens.guardar(token, user_id, expira=payload.get("exp"))
+
+    user = cache.usuario_cacheado(user_id)
+    if user is not None:
+        return user
+
+    generacion = cache.generacion()
+    user = await leer_uno(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
+    cache.guardar_usuario(user, generacion)
     return user
@@ -19,6 +19,20 @@ DATABASE_URL = os.getenv(
     f"sqlite:///{BASE_DIR / 'data' / 'datastrike.db'}"
 )
 
+# Pool de conexiones (QueuePool; no aplica a SQLite en memoria)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Ping por checkout (detecta conexiones caídas); DB_POOL_PRE_PING=0 lo
+# apaga donde el reciclado alcanza y el round-trip pesa
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# Engine async opcional (asyncpg / aiosqlite) para las rutas de solo I/O.
+# DB_ASYNC_URL por defecto se deriva de DATABASE_URL.
+DB_ASYNC_ENABLED = os.getenv("DB_ASYNC_ENABLED", "0") == "1"
+DB_ASYNC_URL = os.getenv("DB_ASYNC_URL")
+
 # =========================
 # SECURITY
 # =========================
@@ -27,6 +41,9 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(
     os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "10080")
 )
+# Caché de tokens verificados y usuarios (0 = sin caché)
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1024"))
 
 # =========================
 # GOOGLE AUTH
@@ -41,3 +58,79 @@ FRONTEND_URL = os.getenv(
     "FRONTEND_URL",
     "https://base-sports-1168.vercel.app" if ENV == "prod" else "http://localhost:5173"
 )
+
+# =========================
+# UPLOAD CACHE
+# =========================
+UPLOAD_CACHE_ENABLED = os.getenv("UPLOAD_CACHE_ENABLED", "1") == "1"
+UPLOAD_CACHE_DIR = os.getenv("UPLOAD_CACHE_DIR", str(BASE_DIR / "data" / "cache"))
+# LRU en memoria *por proceso*: con el pool de procesos (COMPUTE_POOL_ENABLED)
+# cada worker tiene el suyo, el total es UPLOAD_CACHE_MAX_MB × COMPUTE_WORKERS
+UPLOAD_CACHE_MAX_MB = int(os.getenv("UPLOAD_CACHE_MAX_MB", "256"))
+UPLOAD_CACHE_TTL_SECONDS = int(os.getenv("UPLOAD_CACHE_TTL_SECONDS", "86400"))
+# Presupuesto del nivel en disco (Parquet): al pasarse se borran los más viejos
+UPLOAD_CACHE_DISK_MAX_MB = int(os.getenv("UPLOAD_CACHE_DISK_MAX_MB", "2048"))
+
+# =========================
+# STATS LOADER (streaming)
+# =========================
+STATS_CHUNK_ROWS = int(os.getenv("STATS_CHUNK_ROWS", "50000"))
+STATS_CHUNK_MAX_MB = int(os.getenv("STATS_CHUNK_MAX_MB", "64"))
+UPLOAD_COPY_CHUNK_KB = int(os.getenv("UPLOAD_COPY_CHUNK_KB", "1024"))
+
+# =========================
+# COMPUTE POOL
+# =========================
+COMPUTE_POOL_ENABLED = os.getenv("COMPUTE_POOL_ENABLED", "1") == "1"
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", str(min(4, os.cpu_count() or 1))))
+COMPUTE_MAX_PENDING = int(os.getenv("COMPUTE_MAX_PENDING", str(COMPUTE_WORKERS * 4)))
+COMPUTE_TIMEOUT_SECONDS = float(os.getenv("COMPUTE_TIMEOUT_SECONDS", "120"))
+
+# =========================
+# KPI JOBS
+# =========================
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+
+# =========================
+# ROSTER CACHE
+# =========================
+ROSTER_CACHE_TTL_SECONDS = int(os.getenv("ROSTER_CACHE_TTL_SECONDS", "300"))
+# Cache-Control max-age de /api/equipos (luego el cliente revalida con ETag)
+EQUIPOS_CACHE_MAX_AGE = int(os.getenv("EQUIPOS_CACHE_MAX_AGE", "60"))
+
+# =========================
+# STARTUP
+# =========================
+# background | sync | off (seed con `python -m app.scripts.load_excel --seed`)
+SEED_ON_STARTUP = os.getenv("SEED_ON_STARTUP", "background").lower()
+
+# =========================
+# ESPACIAL (heatmaps / flujos)
+# =========================
+ESPACIAL_CACHE_ENTRIES = int(os.getenv("ESPACIAL_CACHE_ENTRIES", "512"))
+
+# =========================
+# TEMPORADA (lotes de partidos)
+# =========================
+TEMPORADA_MAX_PARTIDOS = int(os.getenv("TEMPORADA_MAX_PARTIDOS", "64"))
+TEMPORADA_MAX_MB = int(os.getenv("TEMPORADA_MAX_MB", "512"))
+TEMPORADA_VENTANA_FORMA = int(os.getenv("TEMPORADA_VENTANA_FORMA", "5"))
+
+# =========================
+# xT (expected threat)
+# =========================
+# Modelo ajustado offline: python -m app.scripts.ajustar_xt
+XT_MODEL_PATH = os.getenv("XT_MODEL_PATH", str(BASE_DIR / "data" / "xt_model.npz"))
+XT_COLUMNAS = int(os.getenv("XT_COLUMNAS", "16"))
+XT_FILAS = int(os.getenv("XT_FILAS", "12"))
+
+# =========================
+# MÉTRICAS / PROFILING
+# =========================
+# Histogramas por etapa en GET /metrics + header Server-Timing
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Con PROFILING_ENABLED=1, un request con `X-Profile: 1` deja un volcado
+# del cómputo en PROFILING_DIR (cprofile → .prof, pyinstrument → .html)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_DIR = os.getenv("PROFILING_DIR", str(BASE_DIR / "data" / "profiles"))
+PROFILER = os.getenv("PROFILER", "cprofile").lower()
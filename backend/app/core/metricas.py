@@ -0,0 +1,297 @@
+import functools
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.core.config import METRICS_ENABLED, PROFILING_DIR, PROFILING_ENABLED, PROFILER
+
+# ─────────────────────────────
+# Métricas por etapa (Prometheus + Server-Timing)
+# ─────────────────────────────
+# etapa("parseo") / @medido("kpis") miden cada paso del pipeline. Cada
+# medición va a:
+#   - el histograma de la etapa (GET /metrics, formato de texto Prometheus)
+#   - el request en curso (header Server-Timing, ver MiddlewareMetricas)
+# En los workers del pool de cómputo las mediciones se juntan y viajan
+# con el resultado (compute_service): el proceso web las registra como si
+# hubieran pasado en el request. Cada proceso web expone las suyas.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_histogramas: dict[tuple[str, str], dict] = {}  # (métrica, etiqueta) → buckets/suma/cuenta
+_filas: dict[str, int] = {}
+_bytes_subidos = 0
+_volcados = itertools.count(1)  # nombres únicos dentro del mismo segundo
+
+# Mediciones del request (o del trabajo en el worker) en curso
+_recolector: ContextVar["Recolector | None"] = ContextVar("recolector_metricas", default=None)
+# Profiling pedido por el request en curso (X-Profile: 1)
+_perfil: ContextVar[bool] = ContextVar("perfil_pedido", default=False)
+
+
+class Recolector:
+    """
+    Mediciones de un request. `observar=False` (workers) solo las junta:
+    el proceso web las registra al recibir el resultado.
+    """
+
+    def __init__(self, observar: bool = True):
+        self.observar = observar
+        self.etapas: list[tuple] = []  # (nombre, segundos, filas, bytes)
+        self.perfil: str | None = None
+
+    def server_timing(self, total: float | None = None) -> str:
+        # Misma etapa varias veces (p. ej. por bloque): se suman
+        duraciones: dict[str, float] = {}
+        for nombre, segundos, _, _ in self.etapas:
+            duraciones[nombre] = duraciones.get(nombre, 0.0) + segundos
+        partes = [f"{n};dur={s * 1000:.1f}" for n, s in duraciones.items()]
+        if total is not None:
+            partes.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(partes)
+
+
+def _observar(metrica: str, etiqueta: str, segundos: float):
+    with _lock:
+        h = _histogramas.get((metrica, etiqueta))
+        if h is None:
+            h = _histogramas[(metrica, etiqueta)] = {"buckets": [0] * len(BUCKETS), "suma": 0.0, "cuenta": 0}
+        for i, limite in enumerate(BUCKETS):
+            if segundos <= limite:
+                h["buckets"][i] += 1
+        h["suma"] += segundos
+        h["cuenta"] += 1
+
+
+def _contar(nombre: str, filas: int | None, bytes_: int | None):
+    global _bytes_subidos
+
+    with _lock:
+        if filas is not None:
+            _filas[nombre] = _filas.get(nombre, 0) + int(filas)
+        if bytes_ is not None:
+            _bytes_subidos += int(bytes_)
+
+
+def registrar(nombre: str, segundos: float, filas: int | None = None, bytes_: int | None = None):
+    if not METRICS_ENABLED:
+        return
+
+    recolector = _recolector.get()
+    if recolector is not None:
+        recolector.etapas.append((nombre, segundos, filas, bytes_))
+        if not recolector.observar:
+            return
+
+    _observar("etapa", nombre, segundos)
+    _contar(nombre, filas, bytes_)
+
+
+@contextmanager
+def etapa(nombre: str, filas: int | None = None, bytes_: int | None = None):
+    """Mide el bloque; `info["filas"]` / `info["bytes"]` se pueden completar adentro."""
+    info = {"filas": filas, "bytes": bytes_}
+    inicio = time.perf_counter()
+    try:
+        yield info
+    finally:
+        registrar(nombre, time.perf_counter() - inicio, info["filas"], info["bytes"])
+
+
+def _largo(valor) -> int | None:
+    # Filas de un DataFrame (resultado o primer argumento)
+    return len(valor) if hasattr(valor, "columns") and hasattr(valor, "__len__") else None
+
+
+def medido(nombre: str):
+    """Decorador: mide la función como etapa; filas = largo del DataFrame que devuelve o recibe."""
+    def decorador(fn):
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = fn(*args, **kwargs)
+            filas = _largo(resultado)
+            if filas is None:
+                filas = next((n for n in map(_largo, args) if n is not None), None)
+            registrar(nombre, time.perf_counter() - inicio, filas)
+            return resultado
+        return envoltura
+    return decorador
+
+
+async def leer_upload(file) -> bytes:
+    """`await file.read()` medido: cuenta los bytes subidos."""
+    with etapa("lectura_upload") as info:
+        data = await file.read()
+        info["bytes"] = len(data)
+    return data
+
+
+# ─────────────────────────────
+# Request y workers
+# ─────────────────────────────
+def iniciar(observar: bool = True) -> tuple[Recolector, object]:
+    recolector = Recolector(observar)
+    return recolector, _recolector.set(recolector)
+
+
+def terminar(token):
+    _recolector.reset(token)
+
+
+def importar(etapas: list[tuple] | None):
+    """Registra en este proceso (y en el request en curso) lo medido en un worker."""
+    for nombre, segundos, filas, bytes_ in etapas or []:
+        registrar(nombre, segundos, filas, bytes_)
+
+
+def observar_request(ruta: str, segundos: float):
+    if METRICS_ENABLED:
+        _observar("request", ruta, segundos)
+
+
+# ─────────────────────────────
+# Profiling opt-in (PROFILING_ENABLED=1 + header X-Profile: 1)
+# ─────────────────────────────
+def perfil_pedido() -> bool:
+    return PROFILING_ENABLED and _perfil.get()
+
+
+def pedir_perfil(activo: bool):
+    return _perfil.set(activo)
+
+
+def anotar_perfil(archivo: str | None):
+    recolector = _recolector.get()
+    if recolector is not None and archivo:
+        recolector.perfil = archivo
+
+
+@contextmanager
+def perfilar(nombre: str, activo: bool):
+    """
+    Con `activo`, perfila el bloque (cProfile o pyinstrument según PROFILER)
+    y deja el volcado en PROFILING_DIR; info["archivo"] trae la ruta.
+    """
+    info = {"archivo": None}
+    if not activo:
+        yield info
+        return
+
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    base = os.path.join(PROFILING_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_volcados)}-{nombre}")
+
+    perfilador = None
+    if PROFILER == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+            perfilador = Profiler()
+        except ImportError:
+            print("⚠️ PROFILER=pyinstrument pero no está instalado, se usa cProfile")
+
+    if perfilador is not None:
+        perfilador.start()
+        try:
+            yield info
+        finally:
+            perfilador.stop()
+            info["archivo"] = f"{base}.html"
+            with open(info["archivo"], "w", encoding="utf-8") as f:
+                f.write(perfilador.output_html())
+        return
+
+    import cProfile
+
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    try:
+        yield info
+    finally:
+        perfilador.disable()
+        info["archivo"] = f"{base}.prof"
+        perfilador.dump_stats(info["archivo"])
+
+
+# ─────────────────────────────
+# Exposición
+# ─────────────────────────────
+def _histograma(nombre: str, ayuda: str, etiqueta: str, metrica: str, lineas: list[str]):
+    lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+    for (m, valor), h in sorted(_histogramas.items()):
+        if m != metrica:
+            continue
+        # Buckets ya acumulados (_observar suma en todos los límites >= valor)
+        for limite, n in zip(BUCKETS, h["buckets"]):
+            lineas.append(f'{nombre}_bucket{{{etiqueta}="{valor}",le="{limite}"}} {n}')
+        lineas.append(f'{nombre}_bucket{{{etiqueta}="{valor}",le="+Inf"}} {h["cuenta"]}')
+        lineas.append(f'{nombre}_sum{{{etiqueta}="{valor}"}} {h["suma"]:.6f}')
+        lineas.append(f'{nombre}_count{{{etiqueta}="{valor}"}} {h["cuenta"]}')
+
+
+def exportar() -> str:
+    """Texto en formato de exposición de Prometheus (text/plain; version=0.0.4)."""
+    lineas: list[str] = []
+    with _lock:
+        _histograma(
+            "datastrike_etapa_segundos", "Duración de cada etapa del pipeline de KPIs",
+            "etapa", "etapa", lineas,
+        )
+        _histograma(
+            "datastrike_request_segundos", "Duración de los requests por ruta",
+            "ruta", "request", lineas,
+        )
+        lineas += [
+            "# HELP datastrike_filas_procesadas_total Filas procesadas por etapa",
+            "# TYPE datastrike_filas_procesadas_total counter",
+        ]
+        lineas += [f'datastrike_filas_procesadas_total{{etapa="{n}"}} {v}' for n, v in sorted(_filas.items())]
+        lineas += [
+            "# HELP datastrike_bytes_subidos_total Bytes de archivos subidos",
+            "# TYPE datastrike_bytes_subidos_total counter",
+            f"datastrike_bytes_subidos_total {_bytes_subidos}",
+        ]
+    return "\n".join(lineas) + "\n"
+
+
+# ─────────────────────────────
+# Middleware ASGI
+# ─────────────────────────────
+class MiddlewareMetricas:
+    """
+    Abre un Recolector por request, agrega Server-Timing (y X-Profile con
+    el volcado si se pidió) y observa la duración total por ruta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        recolector, token = iniciar()
+        pedido = any(k == b"x-profile" and v not in (b"", b"0") for k, v in scope.get("headers", []))
+        token_perfil = pedir_perfil(pedido)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                headers = list(mensaje.get("headers", []))
+                headers.append((b"server-timing", recolector.server_timing(time.perf_counter() - inicio).encode()))
+                if recolector.perfil:
+                    headers.append((b"x-profile", os.path.basename(recolector.perfil).encode()))
+                mensaje = {**mensaje, "headers": headers}
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _perfil.reset(token_perfil)
+            terminar(token)
+            route = scope.get("route")
+            # Plantilla de la ruta (/api/files/{file_id}/kpis), no la URL: cardinalidad acotada
+            observar_request(getattr(route, "path", "sin_ruta"), time.perf_counter() - inicio)
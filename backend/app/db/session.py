@@ -1,12 +1,139 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.core.config import DATABASE_URL
+import threading
+import time
+from contextvars import ContextVar
 
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import (
+    DATABASE_URL,
+    DB_ASYNC_ENABLED,
+    DB_ASYNC_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+)
+
+# ─────────────────────────────
+# Métricas del pool (eventos públicos del pool)
+# ─────────────────────────────
+# checkout/checkin dan las conexiones en uso (y el overflow) y cuánto se
+# retiene cada una; do_connect/connect, lo que tarda abrir una nueva.
+# "pool_lleno" cuenta los checkouts que dejaron el pool sin conexiones
+# libres; la espera es desde que se pide la conexión hasta el checkout.
+_lock = threading.Lock()
+_metricas: dict[str, dict] = {}
+_apertura = threading.local()
+# ContextVar y no threading.local: con el engine async varias corrutinas
+# esperan conexión en el mismo hilo
+_pedida_en: ContextVar[float | None] = ContextVar("conexion_pedida_en", default=None)
+
+
+def _vacias() -> dict:
+    return {
+        "checkouts": 0, "pool_lleno": 0, "en_uso_max": 0, "overflow_max": 0,
+        "espera_total_ms": 0.0, "espera_max_ms": 0.0,
+        "uso_total_ms": 0.0, "uso_max_ms": 0.0,
+        "conexiones_nuevas": 0, "apertura_total_ms": 0.0, "apertura_max_ms": 0.0,
+    }
+
+
+class _MideEspera:
+    """
+    El pool no tiene evento público antes del checkout: connect() (API
+    pública de Pool) marca cuándo se pidió la conexión y el evento
+    "checkout" calcula la espera.
+    """
+
+    def connect(self):
+        _pedida_en.set(time.perf_counter())
+        return super().connect()
+
+
+class _QueuePool(_MideEspera, QueuePool):
+    pass
+
+
+class _AsyncAdaptedQueuePool(_MideEspera, AsyncAdaptedQueuePool):
+    pass
+
+
+def _medir_pool(eng, nombre: str):
+    pool = eng.pool
+    limite = pool.size() + max(DB_MAX_OVERFLOW, 0) if isinstance(pool, QueuePool) else None
+
+    @event.listens_for(eng, "do_connect")
+    def _antes_de_abrir(dialect, conn_rec, cargs, cparams):
+        _apertura.inicio = time.perf_counter()
+
+    @event.listens_for(pool, "connect")
+    def _abierta(dbapi_conn, registro):
+        inicio = getattr(_apertura, "inicio", None)
+        _apertura.inicio = None
+        ms = (time.perf_counter() - inicio) * 1000 if inicio is not None else 0.0
+        with _lock:
+            m = _metricas.setdefault(nombre, _vacias())
+            m["conexiones_nuevas"] += 1
+            m["apertura_total_ms"] += ms
+            m["apertura_max_ms"] = max(m["apertura_max_ms"], ms)
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_conn, registro, proxy):
+        ahora = time.perf_counter()
+        registro.info["checkout_en"] = ahora
+        pedida = _pedida_en.get()
+        _pedida_en.set(None)
+        espera = (ahora - pedida) * 1000 if pedida is not None else 0.0
+        en_uso = pool.checkedout() if isinstance(pool, QueuePool) else 0
+        overflow = max(pool.overflow(), 0) if isinstance(pool, QueuePool) else 0
+        with _lock:
+            m = _metricas.setdefault(nombre, _vacias())
+            m["checkouts"] += 1
+            m["en_uso_max"] = max(m["en_uso_max"], en_uso)
+            m["overflow_max"] = max(m["overflow_max"], overflow)
+            m["espera_total_ms"] += espera
+            m["espera_max_ms"] = max(m["espera_max_ms"], espera)
+            if limite is not None and en_uso >= limite:
+                m["pool_lleno"] += 1
+
+    @event.listens_for(pool, "checkin")
+    def _checkin(dbapi_conn, registro):
+        inicio = registro.info.pop("checkout_en", None)
+        if inicio is None:
+            return
+        ms = (time.perf_counter() - inicio) * 1000
+        with _lock:
+            m = _metricas.setdefault(nombre, _vacias())
+            m["uso_total_ms"] += ms
+            m["uso_max_ms"] = max(m["uso_max_ms"], ms)
+
+
+def _opciones_pool(url: str, poolclass) -> dict:
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+aiosqlite:")):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# ─────────────────────────────
+# Engine sync (pandas, workers, scripts)
+# ─────────────────────────────
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-    pool_pre_ping=True
+    **_opciones_pool(DATABASE_URL, _QueuePool),
 )
+_medir_pool(engine, "sync")
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -20,3 +147,121 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ─────────────────────────────
+# Engine async opcional (DB_ASYNC_ENABLED=1)
+# ─────────────────────────────
+def url_async(url: str) -> str:
+    for prefijo, driver in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(prefijo):
+            return driver + url[len(prefijo):]
+    return url
+
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_ASYNC_ENABLED:
+    try:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        _url = DB_ASYNC_URL or url_async(DATABASE_URL)
+        async_engine = create_async_engine(_url, **_opciones_pool(_url, _AsyncAdaptedQueuePool))
+        _medir_pool(async_engine.sync_engine, "async")
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    except ImportError as e:
+        # Sin asyncpg/aiosqlite instalado: las rutas siguen con el engine sync
+        print("⚠️ DB_ASYNC_ENABLED=1 pero falta el driver async, se usa el engine sync:", e)
+
+
+async def get_sesion():
+    """
+    Sesión para rutas async de solo I/O: AsyncSession si el engine async
+    está activo; si no, la Session sync de siempre (se usa vía consultar).
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(db.close)
+
+
+def es_async(db) -> bool:
+    return not isinstance(db, Session)
+
+
+async def consultar(db, stmt) -> list:
+    """scalars(stmt).all() en cualquiera de las dos sesiones, sin bloquear el event loop."""
+    if es_async(db):
+        return (await db.scalars(stmt)).all()
+    return await run_in_threadpool(lambda: db.scalars(stmt).all())
+
+
+async def consultar_uno(db, stmt):
+    """scalars(stmt).first() en cualquiera de las dos sesiones."""
+    if es_async(db):
+        return (await db.scalars(stmt)).first()
+    return await run_in_threadpool(lambda: db.scalars(stmt).first())
+
+
+async def leer_uno(stmt):
+    """consultar_uno con una sesión corta propia: para dependencias que casi nunca van a la base."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await consultar_uno(db, stmt)
+
+    def leer():
+        with SessionLocal() as db:
+            return db.scalars(stmt).first()
+
+    return await run_in_threadpool(leer)
+
+
+def metricas_pool() -> dict:
+    salida = {}
+    for nombre, eng in (("sync", engine), ("async", async_engine and async_engine.sync_engine)):
+        if eng is None:
+            continue
+        pool = eng.pool
+        with _lock:
+            m = dict(_metricas.get(nombre) or _vacias())
+        # Nombre de la clase de SQLAlchemy, no el de la subclase que mide la espera
+        clase = type(pool).__bases__[-1] if isinstance(pool, _MideEspera) else type(pool)
+        datos = {
+            "pool": clase.__name__,
+            "checkouts": m["checkouts"],
+            "pool_lleno": m["pool_lleno"],
+            "en_uso_max": m["en_uso_max"],
+            "overflow_max": m["overflow_max"],
+            "espera_promedio_ms": round(m["espera_total_ms"] / m["checkouts"], 3) if m["checkouts"] else 0.0,
+            "espera_max_ms": round(m["espera_max_ms"], 3),
+            "uso_promedio_ms": round(m["uso_total_ms"] / m["checkouts"], 3) if m["checkouts"] else 0.0,
+            "uso_max_ms": round(m["uso_max_ms"], 3),
+            "conexiones_nuevas": m["conexiones_nuevas"],
+            "apertura_promedio_ms": (
+                round(m["apertura_total_ms"] / m["conexiones_nuevas"], 3) if m["conexiones_nuevas"] else 0.0
+            ),
+            "apertura_max_ms": round(m["apertura_max_ms"], 3),
+        }
+        if isinstance(pool, QueuePool):
+            datos.update(
+                tamano=pool.size(),
+                en_uso=pool.checkedout(),
+                libres=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=DB_MAX_OVERFLOW,
+                timeout_segundos=DB_POOL_TIMEOUT,
+            )
+        salida[nombre] = datos
+    return salida
@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
@@ -9,12 +10,18 @@ from app.db.session import engine
 from app.db.base import Base
 from app.api.router import router
 from app.core.config import SECRET_KEY
+from app.core.metricas import MiddlewareMetricas, exportar
 
 # Importar modelos (OBLIGATORIO para crear tablas)
 from app.models.equipo import Equipo
 from app.models.jugador import Jugador
 from app.models.user import User
 from app.models.user_file import UserFile
+from app.models.user_file_dataset import UserFileDataset
+from app.models.partido import Partido
+from app.models.evento import Evento
+from app.models.kpi_agregado import KpiAgregado
+from app.models.kpi_materializado import KpiMaterializado
 
 app = FastAPI(title="DataStrike API")
 
@@ -26,9 +33,18 @@ def startup():
     # Crear tablas
     Base.metadata.create_all(bind=engine)
 
-    # Cargar datos iniciales desde Excel (solo si DB está vacía)
-    from app.scripts.load_excel import seed_if_empty
-    seed_if_empty()
+    # Cargar datos iniciales desde Excel (solo si DB está vacía).
+    # Por defecto en segundo plano: el servidor acepta tráfico de inmediato.
+    from app.services.seed_service import iniciar_materializacion, iniciar_seed
+    iniciar_seed()
+
+    # Backfill de contadores KPI de partidos viejos (fuera de GET /kpis)
+    iniciar_materializacion()
+
+@app.on_event("shutdown")
+def shutdown():
+    from app.services import compute_service
+    compute_service.shutdown()
 
 # ─────────────────────────────
 # Middlewares
@@ -49,6 +65,9 @@ app.add_middleware(
     https_only=True     # ✅ FIX
 )
 
+# Último en agregarse = el más externo: Server-Timing mide el request entero
+app.add_middleware(MiddlewareMetricas)
+
 # ─────────────────────────────
 # Rutas
 # ─────────────────────────────
@@ -57,4 +76,20 @@ app.include_router(router)
 
 @app.get("/")
 def root():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    # Readiness: 503 hasta que la base tenga equipos/jugadores
+    from app.services.seed_service import estado_seed, LISTO
+    seed = estado_seed()
+    listo = seed["estado"] == LISTO
+    return JSONResponse(
+        status_code=200 if listo else 503,
+        content={"status": "ok" if listo else "starting", "seed": seed},
+    )
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Formato de texto de Prometheus (etapas del pipeline, filas, bytes subidos)
+    return PlainTextResponse(exportar(), media_type="text/plain; version=0.0.4")
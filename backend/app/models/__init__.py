@@ -0,0 +1,12 @@
+# Todos los modelos registrados en Base.metadata apenas se importa cualquiera
+# de ellos: create_all (main, scripts, workers) necesita las tablas que las
+# claves foráneas referencian (p. ej. partidos.user_file_id → user_files).
+from app.models.equipo import Equipo  # noqa: F401
+from app.models.jugador import Jugador  # noqa: F401
+from app.models.user import User  # noqa: F401
+from app.models.user_file import UserFile  # noqa: F401
+from app.models.user_file_dataset import UserFileDataset  # noqa: F401
+from app.models.partido import Partido  # noqa: F401
+from app.models.evento import Evento  # noqa: F401
+from app.models.kpi_agregado import KpiAgregado  # noqa: F401
+from app.models.kpi_materializado import KpiMaterializado  # noqa: F401
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy.orm import relationship
+from app.db.base import Base
+
+
+class Evento(Base):
+    __tablename__ = "eventos"
+
+    id = Column(Integer, primary_key=True)
+
+    partido_id = Column(
+        Integer,
+        ForeignKey("partidos.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+
+    # 🔑 Las lecturas del dashboard filtran por equipo: índice obligatorio
+    equipo_id = Column(
+        Integer,
+        ForeignKey("equipos.id", ondelete="CASCADE"),
+        nullable=True,
+        index=True
+    )
+
+    id_jugador = Column(Integer, nullable=True)
+    periodo = Column(String, nullable=True)
+    evento = Column(String, nullable=True)
+
+    x = Column(Float, nullable=True)
+    y = Column(Float, nullable=True)
+    x2 = Column(Float, nullable=True)
+    y2 = Column(Float, nullable=True)
+    xg = Column(Float, nullable=True)
+
+    partido = relationship("Partido", back_populates="eventos")
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
+from app.db.base import Base
+
+
+class KpiAgregado(Base):
+    """
+    Contadores KPI materializados por partido y equipo.
+    Una temporada se obtiene sumando filas; los porcentajes se derivan al leer.
+    """
+    __tablename__ = "kpi_agregados"
+
+    id = Column(Integer, primary_key=True)
+
+    partido_id = Column(
+        Integer,
+        ForeignKey("partidos.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    equipo_id = Column(Integer, ForeignKey("equipos.id", ondelete="CASCADE"), nullable=False)
+
+    # general | periodo | carril | jugador | tipo
+    dimension = Column(String, nullable=False)
+    clave = Column(String, nullable=False, default="")
+    subclave = Column(String, nullable=False, default="")
+
+    eventos = Column(Integer, nullable=False, default=0)
+    pases = Column(Integer, nullable=False, default=0)
+    completados = Column(Integer, nullable=False, default=0)
+    fallidos = Column(Integer, nullable=False, default=0)
+    perdidas = Column(Integer, nullable=False, default=0)
+    ganadas = Column(Integer, nullable=False, default=0)
+    progresivos = Column(Integer, nullable=False, default=0)
+    xg = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        Index("ix_kpi_agregados_equipo_dimension", "equipo_id", "dimension"),
+    )
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, func
+from app.db.base import Base
+
+
+class KpiMaterializado(Base):
+    """
+    Marca de partido con contadores ya calculados. Un partido puede no
+    tener filas en kpi_agregados (eventos sin equipo en la plantilla) y
+    aun así estar materializado: no se vuelve a calcular.
+    """
+    __tablename__ = "kpi_materializados"
+
+    partido_id = Column(
+        Integer,
+        ForeignKey("partidos.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+
+    created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy.orm import relationship
+from app.db.base import Base
+
+
+class Partido(Base):
+    __tablename__ = "partidos"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # 🔑 SHA-256 del archivo subido: la misma planilla no se guarda dos veces
+    hash = Column(String, unique=True, index=True, nullable=False)
+    filename = Column(String, nullable=True)
+
+    user_file_id = Column(
+        Integer,
+        ForeignKey("user_files.id", ondelete="SET NULL"),
+        nullable=True
+    )
+
+    created_at = Column(DateTime, server_default=func.now())
+
+    user_file = relationship("UserFile")
+    eventos = relationship(
+        "Evento",
+        back_populates="partido",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
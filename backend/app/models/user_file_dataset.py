@@ -0,0 +1,30 @@
+from sqlalchemy import JSON, BigInteger, Column, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy.orm import relationship
+from app.db.base import Base
+
+
+class UserFileDataset(Base):
+    """Parquet normalizado (particionado por periodo) de un archivo subido."""
+    __tablename__ = "user_file_datasets"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # 🔑 Un dataset por archivo: se convierte una sola vez
+    user_file_id = Column(
+        Integer,
+        ForeignKey("user_files.id", ondelete="CASCADE"),
+        unique=True,
+        index=True,
+        nullable=False
+    )
+
+    path = Column(String, nullable=False)
+    filas = Column(Integer, nullable=False)
+    filas_por_periodo = Column(JSON, nullable=False)
+    # {columna: tipo Arrow}
+    esquema = Column(JSON, nullable=False)
+    bytes = Column(BigInteger, nullable=False)
+
+    created_at = Column(DateTime, server_default=func.now())
+
+    user_file = relationship("UserFile")
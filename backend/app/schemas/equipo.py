@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 
+from app.schemas.jugador import JugadorOut
+
 class EquipoOut(BaseModel):
     id: int
     nombre: str
@@ -8,3 +10,6 @@ class EquipoOut(BaseModel):
 
     class Config:
         orm_mode = True  # ✅ FIX
+
+class EquipoConJugadoresOut(EquipoOut):
+    jugadores: list[JugadorOut] = []
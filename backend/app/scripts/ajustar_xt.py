@@ -0,0 +1,78 @@
+"""
+Ajuste offline del modelo xT (expected threat).
+
+Lee todos los eventos guardados por lotes, ajusta la superficie por
+iteración de valor y la deja en XT_MODEL_PATH (.npz). Las requests solo
+leen ese archivo: correr este script después de cargar partidos nuevos
+(p. ej. como cron o release command). Si el corpus no cambió desde el
+último ajuste, no hace nada.
+
+Uso (desde backend/):
+    python -m app.scripts.ajustar_xt
+    python -m app.scripts.ajustar_xt --columnas 12 --filas 8 --forzar
+    python -m app.scripts.ajustar_xt --desde superficie_xt.npy
+"""
+import argparse
+import time
+
+from app.core.config import XT_COLUMNAS, XT_FILAS, XT_MODEL_PATH
+from app.db.session import SessionLocal
+# Igual que main.py: todos los modelos registrados antes de usar el ORM
+from app.models.equipo import Equipo  # noqa: F401
+from app.models.jugador import Jugador  # noqa: F401
+from app.models.user import User  # noqa: F401
+from app.models.user_file import UserFile  # noqa: F401
+from app.models.user_file_dataset import UserFileDataset  # noqa: F401
+from app.models.partido import Partido  # noqa: F401
+from app.models.evento import Evento  # noqa: F401
+from app.services.xt_service import (
+    ajustar_xt,
+    guardar_modelo,
+    huella_corpus,
+    importar_superficie,
+    modelo_xt,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ajusta (o importa) la superficie xT")
+    parser.add_argument("--columnas", type=int, default=XT_COLUMNAS, help="Celdas a lo largo (x)")
+    parser.add_argument("--filas", type=int, default=XT_FILAS, help="Celdas a lo ancho (y)")
+    parser.add_argument("--desde", help="Importar una superficie ya calculada (.npy o .csv) en vez de ajustar")
+    parser.add_argument("--salida", default=XT_MODEL_PATH, help="Archivo .npz del modelo")
+    parser.add_argument("--forzar", action="store_true", help="Reajustar aunque los eventos no hayan cambiado")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+
+    if args.desde:
+        modelo = importar_superficie(args.desde)
+    else:
+        db = SessionLocal()
+        try:
+            actual = modelo_xt(args.salida)
+            if (
+                not args.forzar
+                and actual is not None
+                and actual["huella"] == huella_corpus(db)
+                and actual["valores"].shape == (args.filas, args.columnas)
+            ):
+                print("ℹ️ Los eventos no cambiaron desde el último ajuste, no se reajusta")
+                return
+
+            modelo = ajustar_xt(db, args.columnas, args.filas)
+        finally:
+            db.close()
+
+    guardar_modelo(modelo, args.salida)
+
+    filas, columnas = modelo["valores"].shape
+    print(
+        f"✅ Modelo xT {filas}x{columnas} guardado en {args.salida} "
+        f"({modelo['eventos']} eventos, {modelo['iteraciones']} iteraciones, "
+        f"{time.perf_counter() - inicio:.2f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
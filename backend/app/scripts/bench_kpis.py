@@ -0,0 +1,199 @@
+"""
+Benchmark de calcular_kpis.
+
+Compara la implementación de referencia (regex por grupo) con la actual
+(clasificación única + sumas agrupadas) y verifica que el JSON sea el mismo.
+
+Uso (desde backend/):
+    python -m app.scripts.bench_kpis
+    python -m app.scripts.bench_kpis --sizes 10000 100000 1000000
+    python -m app.scripts.bench_kpis --jugadores 3000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.kpi_service import (
+    _bloques_jugador,
+    _contadores_por_fila,
+    calcular_kpis,
+    carril_por_y,
+    construir_kpis,
+    detectar_columna_evento,
+)
+
+EVENTOS = [
+    "Asistencia", "Balon aereo ganado", "Balon aereo perdido",
+    "Centro completo", "Centro incompleto", "Duelo ganado", "Duelo perdido",
+    "Gol", "Tiro", "Remate", "Pase completo", "Pase incompleto",
+    "Pase filtrado", "Pase entre lineas", "Regate fallido",
+]
+
+
+# ─────────────────────────────
+# Datos sintéticos
+# ─────────────────────────────
+def generar_eventos(n: int, jugadores: int = 300, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "evento": rng.choice(EVENTOS, size=n),
+        "periodo": rng.choice(["1T", "2T", "ET"], size=n, p=[0.48, 0.48, 0.04]),
+        "id_jugador": rng.integers(1001001, 1001001 + jugadores, size=n),
+        "jugador": "Jugador",
+        "imagen_jugador": "",
+        "x": rng.uniform(0, 100, size=n),
+        "y": rng.uniform(0, 100, size=n),
+        "x2": rng.uniform(0, 100, size=n),
+        "y2": rng.uniform(0, 100, size=n),
+        "xg": rng.uniform(0, 0.3, size=n),
+    })
+
+
+# ─────────────────────────────
+# Implementación de referencia (regex por grupo)
+# ─────────────────────────────
+def _contiene(s, patron):
+    return s.str.contains(patron, case=False, na=False, regex=True)
+
+
+def por_jugador_referencia(df):
+    # Bloque por_jugador original: un groupby con lookups por jugador
+    event_col = next(c for c in df.columns if c.lower() in ["event", "evento", "type"])
+    resultado = {}
+    for jugador_id, d in df.groupby("id_jugador"):
+        resultado[int(jugador_id)] = {
+            "jugador": d["jugador"].iloc[0] if "jugador" in d.columns else "Desconocido",
+            "imagen_jugador": d["imagen_jugador"].iloc[0] if "imagen_jugador" in d.columns else "",
+            "eventos_total": int(len(d)),
+            # value_counts con empates en orden de aparición: el quicksort
+            # de NumPy no es estable y el orden de los empates cambiaría
+            # según la plataforma
+            "eventos_por_tipo": (
+                d[event_col].str.lower().value_counts(sort=False)
+                .sort_values(ascending=False, kind="stable").to_dict()
+            ),
+            "xg": float(d["xg"].sum()) if "xg" in d.columns else 0.0,
+        }
+    return resultado
+
+
+def por_jugador_actual(df):
+    # Solo los bloques jugador/tipo (crosstab por códigos) + armado del dict
+    eventos = df[detectar_columna_evento(df)].astype("category")
+    filas = _contadores_por_fila(df, eventos)
+    return construir_kpis(pd.concat(_bloques_jugador(df, eventos, filas), ignore_index=True))["por_jugador"]
+
+
+def calcular_kpis_referencia(df):
+    df = df.copy()
+    event_col = next(c for c in df.columns if c.lower() in ["event", "evento", "type"])
+    ev = df[event_col]
+
+    es_pase = _contiene(ev, "Pase|Centro|Asistencia")
+    pase_exitoso = _contiene(ev, "Pase completo|Pase entre lineas|Pase filtrado|Centro completo|Asistencia")
+    pase_fallido = _contiene(ev, "Pase incompleto|Centro incompleto")
+    perdida_total = _contiene(ev, "Pase incompleto|Centro incompleto|Balon aereo perdido|Duelo perdido|Regate fallido")
+    jugada_ganada = _contiene(
+        ev,
+        "Pase completo|Pase entre lineas|Pase filtrado|Centro completo|Asistencia|Balon aereo ganado|Duelo ganado|Tiro|Remate|Gol"
+    )
+
+    total_eventos = len(df)
+    pases = df[es_pase]
+    pases_completados = df[es_pase & pase_exitoso]
+    pases_fallidos = df[es_pase & pase_fallido]
+
+    result = {
+        "general": {
+            "eventos": int(total_eventos),
+            "pases_totales": int(len(pases)),
+            "pases_completados": int(len(pases_completados)),
+            "pct_pase_completado": round(len(pases_completados) / len(pases) * 100, 2) if len(pases) else 0,
+            "pct_pase_perdido": round(len(pases_fallidos) / len(pases) * 100, 2) if len(pases) else 0,
+            "pct_perdidas_totales": round(len(df[perdida_total]) / total_eventos * 100, 2) if total_eventos else 0,
+            "pct_jugadas_ganadas": round(
+                len(df[jugada_ganada]) / (len(df[jugada_ganada]) + len(df[perdida_total])) * 100, 2
+            ) if (len(df[jugada_ganada]) + len(df[perdida_total])) else 0,
+        },
+        "por_periodo": {},
+        "por_carril": {},
+        "por_jugador": {},
+        "pases_progresivos": {}
+    }
+
+    for periodo, d in df.groupby("periodo"):
+        es_p = _contiene(d[event_col], "Pase|Centro|Asistencia")
+        ex = _contiene(d[event_col], "Pase completo|Pase entre lineas|Pase filtrado|Centro completo|Asistencia")
+        fa = _contiene(d[event_col], "Pase incompleto|Centro incompleto")
+        pases_p = d[es_p]
+        result["por_periodo"][periodo] = {
+            "eventos": int(len(d)),
+            "pases": int(len(pases_p)),
+            "pct_completado": round(len(d[es_p & ex]) / len(pases_p) * 100, 2) if len(pases_p) else 0,
+            "pct_perdida": round(len(d[es_p & fa]) / len(pases_p) * 100, 2) if len(pases_p) else 0,
+        }
+
+    result["por_jugador"] = por_jugador_referencia(df)
+
+    if {"x", "x2", "id_jugador"}.issubset(df.columns):
+        progresivos = df[es_pase & ((df["x2"] - df["x"]) > 15)]
+        ranking = progresivos.groupby("id_jugador").size().sort_values(ascending=False).head(10)
+        result["pases_progresivos"] = {int(k): int(v) for k, v in ranking.items()}
+
+    if "y" in df.columns:
+        df["carril"] = df["y"].apply(carril_por_y)
+        for carril, d in df.groupby("carril"):
+            es_p = _contiene(d[event_col], "Pase|Centro|Asistencia")
+            ex = _contiene(d[event_col], "Pase completo|Pase entre lineas|Pase filtrado|Centro completo|Asistencia")
+            fa = _contiene(d[event_col], "Pase incompleto|Centro incompleto")
+            pases_c = d[es_p]
+            result["por_carril"][carril] = {
+                "pct_completado": round(len(d[es_p & ex]) / len(pases_c) * 100, 2) if len(pases_c) else 0,
+                "pct_perdida": round(len(d[es_p & fa]) / len(pases_c) * 100, 2) if len(pases_c) else 0,
+            }
+
+    return result
+
+
+# ─────────────────────────────
+# Medición
+# ─────────────────────────────
+def _medir(fn, df, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        out = fn(df)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de calcular_kpis")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jugadores", type=int, default=300, help="Jugadores distintos en los datos")
+    args = parser.parse_args()
+
+    for titulo, referencia, actual in (
+        ("calcular_kpis", calcular_kpis_referencia, calcular_kpis),
+        ("por_jugador", por_jugador_referencia, por_jugador_actual),
+    ):
+        print(f"\n{titulo} ({args.jugadores} jugadores)")
+        print(f"{'eventos':>10} {'referencia':>12} {'actual':>12} {'speed-up':>9}")
+        for n in args.sizes:
+            df = generar_eventos(n, jugadores=args.jugadores)
+            t_ref, out_ref = _medir(referencia, df, args.repeat)
+            t_new, out_new = _medir(actual, df, args.repeat)
+
+            # JSON y no ==: el orden de las claves (empates de eventos_por_tipo) también cuenta
+            if json.dumps(out_ref) != json.dumps(out_new):
+                raise SystemExit(f"❌ Resultados distintos con {n} eventos")
+
+            print(f"{n:>10} {t_ref * 1000:>10.1f}ms {t_new * 1000:>10.1f}ms {t_ref / t_new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark del parseo de uploads.
+
+Compara el camino anterior (bytes → NamedTemporaryFile → load_stats(ruta)
+→ gc.collect() por request) con el actual (load_stats directo sobre los
+bytes del upload): latencia por request, pico de memoria (tracemalloc) y
+bytes escritos en disco. Verifica que el DataFrame sea el mismo.
+
+Con --esquema compara además la lectura completa con la proyección de
+ESQUEMA_KPI (solo las columnas de los KPIs, tipos compactos): tiempo,
+pico y memoria del DataFrame resultante. --extras agrega columnas que
+los KPIs no usan, como en los exports reales.
+
+Uso (desde backend/):
+    python -m app.scripts.bench_uploads
+    python -m app.scripts.bench_uploads --sizes 1000 10000 50000 --formatos .csv
+    python -m app.scripts.bench_uploads --esquema --extras 30
+"""
+import argparse
+import gc
+import io
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from app.scripts.bench_kpis import generar_eventos
+from app.utils.stats_loader import ESQUEMA_KPI, huella_memoria, load_stats
+
+
+# ─────────────────────────────
+# Archivos sintéticos
+# ─────────────────────────────
+def generar_upload(n: int, suffix: str, extras: int = 0) -> bytes:
+    df = generar_eventos(n)
+    for i in range(extras):
+        # Mitad numéricas, mitad texto repetido (equipo, zona, cualificadores...)
+        df[f"extra_{i}"] = df["x"] * i if i % 2 else df["evento"].str[: 3 + i % 5]
+    buffer = io.BytesIO()
+    if suffix == ".xlsx":
+        # Dos hojas, como las planillas reales (1er y 2do tiempo)
+        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+            mitad = n // 2
+            df.iloc[:mitad].to_excel(writer, sheet_name="1er tiempo", index=False)
+            df.iloc[mitad:].to_excel(writer, sheet_name="2do tiempo", index=False)
+    else:
+        df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+# ─────────────────────────────
+# Caminos a comparar
+# ─────────────────────────────
+def parsear_referencia(data: bytes, suffix: str):
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    path = tmp.name
+    try:
+        with tmp:
+            tmp.write(data)
+        return load_stats(path)
+    finally:
+        os.remove(path)
+        gc.collect()
+
+
+def parsear_actual(data: bytes, suffix: str):
+    return load_stats(data, suffix)
+
+
+def parsear_esquema(data: bytes, suffix: str):
+    return load_stats(data, suffix, ESQUEMA_KPI)
+
+
+def _medir(fn, data, suffix, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        out = fn(data, suffix)
+        tiempos.append(time.perf_counter() - t0)
+
+    # El pico se mide aparte: tracemalloc agrega overhead a la latencia
+    tracemalloc.start()
+    fn(data, suffix)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tiempos), pico, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del parseo de uploads")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--formatos", nargs="+", default=[".csv", ".xlsx"], choices=[".csv", ".xlsx"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--esquema", action="store_true", help="Comparar lectura completa vs ESQUEMA_KPI")
+    parser.add_argument("--extras", type=int, default=0, help="Columnas extra que los KPIs no usan")
+    args = parser.parse_args()
+
+    if args.esquema:
+        return comparar_esquema(args)
+
+    for suffix in args.formatos:
+        print(f"\n{suffix}")
+        print(
+            f"{'eventos':>8} {'MB':>6} {'ref ms':>9} {'actual ms':>10} {'speed-up':>9} "
+            f"{'ref pico':>9} {'act pico':>9} {'disco ref':>10}"
+        )
+        for n in args.sizes:
+            data = generar_upload(n, suffix)
+            t_ref, pico_ref, out_ref = _medir(parsear_referencia, data, suffix, args.repeat)
+            t_new, pico_new, out_new = _medir(parsear_actual, data, suffix, args.repeat)
+
+            if not out_ref.equals(out_new):
+                raise SystemExit(f"❌ Resultados distintos con {n} eventos ({suffix})")
+
+            mb = len(data) / 1024 / 1024
+            print(
+                f"{n:>8} {mb:>6.2f} {t_ref * 1000:>7.1f}ms {t_new * 1000:>8.1f}ms {t_ref / t_new:>8.2f}x "
+                f"{pico_ref / 1024 / 1024:>7.1f}MB {pico_new / 1024 / 1024:>7.1f}MB {mb:>8.2f}MB"
+            )
+
+
+def comparar_esquema(args):
+    for suffix in args.formatos:
+        print(f"\n{suffix} ({args.extras} columnas extra)")
+        print(
+            f"{'eventos':>8} {'completo ms':>12} {'esquema ms':>11} "
+            f"{'pico compl':>11} {'pico esq':>9} {'df compl':>9} {'df esq':>8} {'reducción':>10}"
+        )
+        for n in args.sizes:
+            data = generar_upload(n, suffix, args.extras)
+            t_full, pico_full, full = _medir(parsear_actual, data, suffix, args.repeat)
+            t_esq, pico_esq, esq = _medir(parsear_esquema, data, suffix, args.repeat)
+
+            mem_full = huella_memoria(full)["bytes"]
+            mem_esq = huella_memoria(esq)["bytes"]
+            print(
+                f"{n:>8} {t_full * 1000:>10.1f}ms {t_esq * 1000:>9.1f}ms "
+                f"{pico_full / 1024 / 1024:>9.1f}MB {pico_esq / 1024 / 1024:>7.1f}MB "
+                f"{mem_full / 1024 / 1024:>7.1f}MB {mem_esq / 1024 / 1024:>6.1f}MB {mem_full / mem_esq:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,28 @@
-import pandas as pd
+"""
+Carga de equipos y jugadores desde Excel.
+
+Al arrancar la API se usa seed_if_empty() (ver seed_service). Seed
+único, p. ej. como release command antes de levantar réplicas:
+    python -m app.scripts.load_excel --seed
+
+Para cargar (o actualizar) una
+liga completa desde cualquier libro, desde backend/:
+    python -m app.scripts.load_excel --equipos Equipos.xlsx --jugadores Liga.xlsx
+    python -m app.scripts.load_excel --jugadores Liga.xlsx --hoja-jugadores "Grupo 2" --lote 2000
+"""
+import argparse
+import time
 from pathlib import Path
 
+import pandas as pd
+from sqlalchemy import insert, select, update
+
 from app.db.session import SessionLocal
 from app.models.equipo import Equipo
 from app.models.jugador import Jugador
+from app.services.equipo_cache import invalidar_equipos
+from app.services.roster_cache import invalidar_plantilla
+from app.services.seed_service import seed_pendiente
 
 # ─────────────────────────────
 # Rutas (CORRECTAS PARA GIT + RAILWAY)
@@ -14,6 +33,8 @@ DATA_DIR = BASE_DIR / "data"
 EQUIPOS_EXCEL = DATA_DIR / "Equipos.xlsx"
 JUGADORES_EXCEL = DATA_DIR / "LigaPremier.xlsx"
 
+BATCH_SIZE = 1000
+
 # ─────────────────────────────
 # Utilidades
 # ─────────────────────────────
@@ -21,60 +42,136 @@ def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = df.columns.str.strip().str.lower()
     return df.where(pd.notnull(df), None)
 
+
+def _entero(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype="Int64")
+    return pd.to_numeric(df[col], errors="coerce").astype("Int64")
+
+
+def _texto(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    return df[col]
+
+
+def _registros(data: pd.DataFrame) -> list[dict]:
+    # NaN/NA → None para el driver
+    return data.astype(object).where(data.notna(), None).to_dict("records")
+
+
+def _ids_existentes(db, modelo, ids: list[int]) -> set[int]:
+    # Una sola consulta (por lote de ids) en lugar de un SELECT por fila
+    existentes = set()
+    for i in range(0, len(ids), BATCH_SIZE):
+        existentes.update(
+            db.execute(select(modelo.id).where(modelo.id.in_(ids[i:i + BATCH_SIZE]))).scalars()
+        )
+    return existentes
+
+
+def _upsert(db, modelo, filas: list[dict], actualizar: list[str], lote: int, existentes: set[int]):
+    """
+    INSERT ... ON CONFLICT (id) por lotes. Con `actualizar` vacío, las
+    filas existentes se dejan como están (DO NOTHING).
+    """
+    dialecto = db.get_bind().dialect.name
+
+    if dialecto in ("sqlite", "postgresql"):
+        if dialecto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+        else:
+            from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+
+        # Sobre la tabla (Core): executemany agrupa los VALUES por lote
+        tabla = modelo.__table__
+        stmt = insert_dialecto(tabla)
+        if actualizar:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[tabla.c.id],
+                set_={c: stmt.excluded[c] for c in actualizar},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[tabla.c.id])
+
+        for i in range(0, len(filas), lote):
+            db.execute(stmt, filas[i:i + lote])
+        return
+
+    # Otros motores: separar inserts/updates con los ids ya prefetcheados
+    nuevas = [f for f in filas if f["id"] not in existentes]
+    viejas = [f for f in filas if f["id"] in existentes]
+
+    for i in range(0, len(nuevas), lote):
+        db.execute(insert(modelo), nuevas[i:i + lote])
+    if actualizar:
+        for i in range(0, len(viejas), lote):
+            db.execute(
+                update(modelo),
+                [{"id": f["id"], **{c: f[c] for c in actualizar}} for f in viejas[i:i + lote]],
+            )
+
+
+def _cargar(db, modelo, filas: list[dict], actualizar: list[str], lote: int, nombre: str):
+    inicio = time.perf_counter()
+
+    existentes = _ids_existentes(db, modelo, [f["id"] for f in filas])
+    _upsert(db, modelo, filas, actualizar, lote, existentes)
+    db.commit()
+    invalidar_plantilla()
+    invalidar_equipos()
+
+    nuevos = sum(f["id"] not in existentes for f in filas)
+    repetidos = len(filas) - nuevos
+    print(
+        f"⏱️ {nombre}: {len(filas)} filas → {nuevos} nuevos, "
+        f"{repetidos} {'actualizados' if actualizar else 'sin cambios'} "
+        f"({time.perf_counter() - inicio:.2f}s, lotes de {lote})"
+    )
+
 # ─────────────────────────────
 # Carga de equipos (sin duplicar)
 # ─────────────────────────────
-def load_equipos(db, df: pd.DataFrame):
-    for _, row in df.iterrows():
-        equipo_id = int(row["id_club"])
-
-        existe = db.query(Equipo).filter(Equipo.id == equipo_id).first()
-        if existe:
-            continue
-
-        equipo = Equipo(
-            id=equipo_id,
-            nombre=row["nombre_equipo"],
-            logo_url=row.get("imagen_logo"),
-            liga=None
-        )
-        db.add(equipo)
+def filas_equipos(df: pd.DataFrame) -> list[dict]:
+    data = pd.DataFrame({
+        "id": _entero(df, "id_club"),
+        "nombre": _texto(df, "nombre_equipo"),
+        "logo_url": _texto(df, "imagen_logo"),
+        "liga": None,
+    })
+    return _registros(data.dropna(subset=["id"]).drop_duplicates(subset=["id"]))
 
-    db.commit()
+
+def load_equipos(db, df: pd.DataFrame, lote: int = BATCH_SIZE):
+    # Los equipos ya existentes no se modifican
+    _cargar(db, Equipo, filas_equipos(df), [], lote, "equipos")
 
 # ─────────────────────────────
 # Upsert de jugadores
 # ─────────────────────────────
-def upsert_jugadores(db, df: pd.DataFrame):
+def filas_jugadores(df: pd.DataFrame) -> list[dict]:
+    data = pd.DataFrame({
+        "id": _entero(df, "id_jugador"),
+        "nombre": _texto(df, "nombre"),
+        "numero": _entero(df, "numcamisa"),
+        "imagen_url": _texto(df, "imagen_jugador"),
+        "equipo_id": _entero(df, "id_club"),
+    })
     # Evitar duplicados que causen error de integridad
-    df = df.drop_duplicates(subset=["id_jugador"])
-
-    for _, row in df.iterrows():
-        jugador_id = int(row["id_jugador"])
+    return _registros(data.dropna(subset=["id"]).drop_duplicates(subset=["id"]))
 
-        jugador = db.query(Jugador).filter(Jugador.id == jugador_id).first()
 
-        if jugador:
-            jugador.nombre = row["nombre"]
-            jugador.numero = row.get("numcamisa")
-            jugador.imagen_url = row.get("imagen_jugador")
-            jugador.equipo_id = int(row["id_club"])
-        else:
-            jugador = Jugador(
-                id=jugador_id,
-                nombre=row["nombre"],
-                numero=row.get("numcamisa"),
-                imagen_url=row.get("imagen_jugador"),
-                equipo_id=int(row["id_club"])
-            )
-            db.add(jugador)
-
-    db.commit()
+def upsert_jugadores(db, df: pd.DataFrame, lote: int = BATCH_SIZE):
+    _cargar(
+        db, Jugador, filas_jugadores(df),
+        ["nombre", "numero", "imagen_url", "equipo_id"], lote, "jugadores"
+    )
 
 # ─────────────────────────────
 # Seed seguro (Railway / Producción)
 # ─────────────────────────────
-def seed_if_empty():
+def seed_if_empty() -> bool:
+    """Carga los Excel de /data si no hay equipos. True si al final hay datos."""
     db = SessionLocal()
     try:
         print("📂 DATA_DIR:", DATA_DIR)
@@ -84,7 +181,7 @@ def seed_if_empty():
         if not EQUIPOS_EXCEL.exists() or not JUGADORES_EXCEL.exists():
             raise FileNotFoundError("❌ No se encontraron los archivos Excel en /data")
 
-        if db.query(Equipo).count() == 0:
+        if seed_pendiente(db):
             print("🌱 Base vacía, cargando datos desde Excel...")
 
             df_equipos = normalize_columns(pd.read_excel(EQUIPOS_EXCEL))
@@ -97,9 +194,63 @@ def seed_if_empty():
         else:
             print("ℹ️ Datos ya existen, no se recargan")
 
+        return True
+
     except Exception as e:
         db.rollback()
         print("❌ Error cargando datos:", e)
+        return False
 
     finally:
         db.close()
+
+
+# ─────────────────────────────
+# CLI: cargar cualquier libro de liga
+# ─────────────────────────────
+def _leer(ruta: str, hoja: str | None) -> pd.DataFrame:
+    return normalize_columns(pd.read_excel(ruta, sheet_name=hoja or 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga masiva de equipos y jugadores desde Excel")
+    parser.add_argument("--equipos", help="Libro con id_club, nombre_equipo, imagen_logo")
+    parser.add_argument("--hoja-equipos", help="Hoja de equipos (por defecto la primera)")
+    parser.add_argument("--jugadores", help="Libro con id_jugador, nombre, numcamisa, imagen_jugador, id_club")
+    parser.add_argument("--hoja-jugadores", help="Hoja de jugadores (por defecto la primera)")
+    parser.add_argument("--lote", type=int, default=BATCH_SIZE, help="Filas por INSERT")
+    parser.add_argument("--seed", action="store_true", help="Seed de /data solo si la base está vacía")
+    args = parser.parse_args()
+
+    if not args.seed and not args.equipos and not args.jugadores:
+        parser.error("Indica --seed, --equipos y/o --jugadores")
+
+    # Todas las tablas (app.models registra cada modelo): en una base vacía
+    # partidos referencia a user_files
+    import app.models  # noqa: F401
+    from app.db.base import Base
+    from app.db.session import engine
+    Base.metadata.create_all(bind=engine)
+
+    if args.seed:
+        raise SystemExit(0 if seed_if_empty() else 1)
+
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    try:
+        # Mismo orden que el seed: los jugadores referencian a equipos
+        if args.equipos:
+            load_equipos(db, _leer(args.equipos, args.hoja_equipos), args.lote)
+        if args.jugadores:
+            upsert_jugadores(db, _leer(args.jugadores, args.hoja_jugadores), args.lote)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print(f"✅ Carga terminada en {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
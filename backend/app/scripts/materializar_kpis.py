@@ -0,0 +1,36 @@
+"""
+Backfill de contadores KPI.
+
+Materializa (kpi_agregados + kpi_materializados) los partidos guardados
+que todavía no tienen contadores, p. ej. eventos cargados antes de
+existir esas tablas. La API lo hace sola al arrancar salvo con
+SEED_ON_STARTUP=off; GET /kpis nunca lo hace.
+
+Uso (desde backend/):
+    python -m app.scripts.materializar_kpis
+"""
+import time
+
+from app.db.base import Base
+from app.db.session import SessionLocal, engine
+# Igual que main.py: todos los modelos registrados antes de usar el ORM
+import app.models  # noqa: F401
+from app.services.kpi_agregado_service import materializar_pendientes
+
+
+def main():
+    # kpi_materializados puede no existir todavía en una base anterior
+    Base.metadata.create_all(bind=engine)
+
+    inicio = time.perf_counter()
+    db = SessionLocal()
+    try:
+        n = materializar_pendientes(db)
+    finally:
+        db.close()
+
+    print(f"✅ {n} partidos materializados ({time.perf_counter() - inicio:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+
+from app.core import metricas
+from app.core.config import (
+    COMPUTE_POOL_ENABLED,
+    COMPUTE_WORKERS,
+    COMPUTE_MAX_PENDING,
+    COMPUTE_TIMEOUT_SECONDS,
+)
+
+# ─────────────────────────────
+# Pool de cómputo (parseo Excel + pandas)
+# ─────────────────────────────
+# El trabajo CPU-bound sale del threadpool de Starlette (y del GIL del
+# proceso web) hacia procesos aparte; las rutas de I/O siguen respondiendo.
+_lock = threading.Lock()
+_executor = None
+_manager = None
+_pendientes = 0
+# pid → último cache_stats() reportado por ese worker (ver _estado_worker)
+_estados_workers: dict[int, dict] = {}
+
+
+def _init_worker():
+    # Igual que main.py: todos los modelos registrados antes de usar el ORM
+    import app.models  # noqa: F401
+
+
+def _pool():
+    global _executor
+
+    with _lock:
+        if _executor is None:
+            if COMPUTE_POOL_ENABLED:
+                # spawn: el worker no hereda conexiones ni hilos del servidor
+                _executor = ProcessPoolExecutor(
+                    max_workers=COMPUTE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            else:
+                _executor = ThreadPoolExecutor(max_workers=COMPUTE_WORKERS)
+        return _executor
+
+
+def _reservar():
+    global _pendientes
+
+    with _lock:
+        if _pendientes >= COMPUTE_MAX_PENDING:
+            raise HTTPException(
+                status_code=429,
+                detail="Servidor ocupado procesando archivos, intenta de nuevo",
+                headers={"Retry-After": "5"},
+            )
+        _pendientes += 1
+
+
+def _liberar(_future=None):
+    global _pendientes
+
+    with _lock:
+        _pendientes -= 1
+
+
+def _estado_worker():
+    # Solo con procesos (con hilos la caché es la del proceso web) y si el
+    # worker ya usó la caché: no se importa pandas solo para esto
+    modulo = sys.modules.get("app.services.upload_cache")
+    if not COMPUTE_POOL_ENABLED or modulo is None:
+        return None
+    return os.getpid(), modulo.cache_stats()
+
+
+def _ejecutar_en_worker(fn, perfil: bool, *args):
+    """
+    Corre en el worker: abre su propia sesión de BD y devuelve el resultado
+    en una tupla serializable (HTTPException no sobrevive a pickle; los
+    demás errores vuelven como 400), junto con las etapas medidas, el
+    volcado de profiling (si se pidió) y los contadores de la caché de
+    uploads del worker.
+    """
+    from app.db.session import SessionLocal
+
+    # Solo se juntan: el proceso web las registra en resultado()
+    recolector, token = metricas.iniciar(observar=False)
+    db = SessionLocal()
+    try:
+        with metricas.perfilar(fn.__name__, perfil) as p:
+            try:
+                salida = ("ok", fn(db, *args))
+            except HTTPException as e:
+                salida = ("http", e.status_code, e.detail)
+            except Exception as e:
+                # Archivo corrupto, hoja ilegible...: 400 como /api/stats,
+                # no un 500 con el traceback del worker
+                db.rollback()
+                print("⚠️ Error procesando en el worker:", fn.__name__, "→", repr(e))
+                salida = ("http", 400, str(e))
+        return (*salida, recolector.etapas, p["archivo"], _estado_worker())
+    finally:
+        db.close()
+        metricas.terminar(token)
+
+
+def enviar(fn, *args) -> Future:
+    """
+    Encola fn(db, *args) en el pool y devuelve el Future sin esperar.
+    429 si ya hay COMPUTE_MAX_PENDING trabajos en curso o en cola.
+    El resultado se lee con resultado(future).
+    """
+    global _executor
+
+    _reservar()
+    try:
+        future = _pool().submit(_ejecutar_en_worker, fn, metricas.perfil_pedido(), *args)
+    except BrokenProcessPool:
+        _liberar()
+        with _lock:
+            _executor = None
+            _estados_workers.clear()
+        raise HTTPException(status_code=503, detail="Pool de cómputo reiniciándose")
+    except Exception:
+        _liberar()
+        raise
+
+    # El cupo se libera cuando el trabajo termina de verdad, no al timeout
+    future.add_done_callback(_liberar)
+    return future
+
+
+def resultado(future: Future):
+    """Resultado de un Future ya terminado (o la HTTPException equivalente)."""
+    global _executor
+
+    try:
+        salida = future.result()
+    except BrokenProcessPool:
+        with _lock:
+            _executor = None
+            _estados_workers.clear()
+        raise HTTPException(status_code=503, detail="Un worker de cómputo falló, intenta de nuevo")
+
+    *salida, etapas, perfil, estado = salida
+    metricas.importar(etapas)
+    metricas.anotar_perfil(perfil)
+    if estado is not None:
+        pid, cache = estado
+        with _lock:
+            _estados_workers[pid] = {**cache, "reportado_en": time.time()}
+
+    if salida[0] == "http":
+        raise HTTPException(status_code=salida[1], detail=salida[2])
+
+    return salida[1]
+
+
+async def ejecutar(fn, *args, timeout: float | None = None):
+    """
+    Ejecuta fn(db, *args) en el pool y espera el resultado.
+    504 si no termina en `timeout` (por defecto COMPUTE_TIMEOUT_SECONDS).
+    """
+    future = enviar(fn, *args)
+
+    try:
+        await asyncio.wait_for(
+            asyncio.wrap_future(future),
+            timeout or COMPUTE_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        # Si todavía estaba en cola no llega a correr y libera su cupo ya
+        future.cancel()
+        raise HTTPException(status_code=504, detail="El procesamiento excedió el tiempo límite")
+    except BrokenProcessPool:
+        pass  # resultado() lo traduce a 503
+
+    return resultado(future)
+
+
+async def ejecutar_lote(fn, lista_args: list[tuple], timeout: float | None = None) -> list:
+    """
+    Ejecuta fn(db, *args) por cada tupla de `lista_args` con a lo sumo
+    COMPUTE_WORKERS trabajos en vuelo: el lote ocupa todos los núcleos sin
+    llenar la cola del pool (los demás requests siguen entrando).
+    Devuelve, en el mismo orden, el resultado o la HTTPException de cada uno
+    (un elemento que falla no corta el resto del lote).
+    """
+    en_vuelo = asyncio.Semaphore(COMPUTE_WORKERS)
+
+    async def uno(args):
+        async with en_vuelo:
+            try:
+                return await ejecutar(fn, *args, timeout=timeout)
+            except HTTPException as e:
+                return e
+            except Exception as e:
+                return HTTPException(status_code=422, detail=str(e))
+
+    return await asyncio.gather(*(uno(args) for args in lista_args))
+
+
+def estados_workers() -> dict[int, dict]:
+    """Contadores de caché de cada worker, tal como los devolvió su último trabajo."""
+    with _lock:
+        return dict(_estados_workers)
+
+
+def progreso_compartido() -> dict:
+    """
+    Diccionario que el worker puede actualizar y el servidor leer.
+    Con procesos es un proxy de multiprocessing.Manager.
+    """
+    global _manager
+
+    if not COMPUTE_POOL_ENABLED:
+        return {}
+
+    with _lock:
+        if _manager is None:
+            _manager = multiprocessing.get_context("spawn").Manager()
+        return _manager.dict()
+
+
+def estado() -> dict:
+    with _lock:
+        return {
+            "modo": "procesos" if COMPUTE_POOL_ENABLED else "hilos",
+            "workers": COMPUTE_WORKERS,
+            "pendientes": _pendientes,
+            "max_pendientes": COMPUTE_MAX_PENDING,
+            "timeout_segundos": COMPUTE_TIMEOUT_SECONDS,
+        }
+
+
+def shutdown():
+    global _executor, _manager
+
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+            _estados_workers.clear()
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
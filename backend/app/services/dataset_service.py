@@ -0,0 +1,129 @@
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.metricas import etapa, medido
+from app.models.user_file import UserFile
+from app.models.user_file_dataset import UserFileDataset
+from app.utils.stats_loader import load_stats, proyeccion, proyectar
+
+# ─────────────────────────────
+# Datasets Parquet de archivos subidos
+# ─────────────────────────────
+# save_file convierte la planilla una sola vez en un dataset Parquet
+# (uploads/<user_id>/datasets/<user_file_id>/periodo=<p>/part-0.parquet)
+# con columnas normalizadas; UserFileDataset guarda filas y esquema.
+# Los KPIs de un archivo guardado leen solo las columnas que necesitan,
+# con memory map, sin volver a parsear el Excel.
+EXTENSIONES_STATS = {".xlsx", ".csv"}
+
+# periodo siempre como texto ("1T", "2T", "ET"), no inferido por Arrow
+_PARTICIONES = pads.partitioning(pa.schema([("periodo", pa.string())]), flavor="hive")
+
+
+def _tabla(df: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Columnas con tipos mixtos (números y texto en la misma columna): como texto
+        mixtas = {c: df[c].astype("string") for c in df.columns if df[c].dtype == object}
+        return pa.Table.from_pandas(df.assign(**mixtas), preserve_index=False)
+
+
+def _escribir(tabla: pa.Table, destino: Path) -> int:
+    tmp = destino.with_name(destino.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    pq.write_to_dataset(
+        tabla,
+        tmp,
+        partition_cols=["periodo"],
+        basename_template="part-{i}.parquet",
+    )
+
+    # Reemplazo de una sola vez: un lector nunca ve el dataset a medias
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(tmp, destino)
+    return sum(f.stat().st_size for f in destino.rglob("*.parquet"))
+
+
+def guardar_dataset(db: Session, record: UserFile, df: pd.DataFrame) -> UserFileDataset:
+    """Escribe (o reescribe) el dataset de `record` a partir del DataFrame ya leído."""
+    destino = Path(record.path).parent / "datasets" / str(record.id)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+
+    with etapa("escritura_parquet", filas=len(df)):
+        tabla = _tabla(df)
+        tamano = _escribir(tabla, destino)
+
+    por_periodo = df["periodo"].astype(str).value_counts(sort=False)
+    datos = {
+        "path": str(destino),
+        "filas": len(df),
+        "filas_por_periodo": {str(k): int(v) for k, v in por_periodo.items()},
+        "esquema": {f.name: str(f.type) for f in tabla.schema},
+        "bytes": tamano,
+    }
+
+    dataset = db.scalar(select(UserFileDataset).where(UserFileDataset.user_file_id == record.id))
+    if dataset is None:
+        dataset = UserFileDataset(user_file_id=record.id, **datos)
+        db.add(dataset)
+    else:
+        for k, v in datos.items():
+            setattr(dataset, k, v)
+
+    db.commit()
+    db.refresh(dataset)
+    return dataset
+
+
+def dataset_de_archivo(db: Session, record: UserFile) -> UserFileDataset:
+    """
+    Dataset del archivo; si todavía no existe (archivos subidos antes de
+    guardar datasets) se convierte ahora desde el archivo original.
+    """
+    dataset = db.scalar(select(UserFileDataset).where(UserFileDataset.user_file_id == record.id))
+    if dataset is not None and Path(dataset.path).is_dir():
+        return dataset
+
+    if Path(record.filename).suffix.lower() not in EXTENSIONES_STATS:
+        raise HTTPException(status_code=422, detail="El archivo no es una planilla de estadísticas")
+    if not Path(record.path).exists():
+        raise HTTPException(status_code=404, detail="El archivo original ya no está disponible")
+
+    print("ℹ️ Convirtiendo a Parquet:", record.filename)
+    return guardar_dataset(db, record, load_stats(record.path))
+
+
+@medido("lectura_parquet")
+def leer_dataset(dataset: UserFileDataset, esquema: dict | None = None) -> pd.DataFrame:
+    """
+    DataFrame del dataset (memory map). Con `esquema` solo se leen sus
+    columnas, con los mismos tipos compactos que load_stats(esquema=...).
+    """
+    columnas = None
+    if esquema is not None:
+        columnas = [c for c in proyeccion(dataset.esquema, esquema) if c != "periodo"] + ["periodo"]
+
+    tabla = pq.read_table(dataset.path, columns=columnas, memory_map=True, partitioning=_PARTICIONES)
+    df = tabla.to_pandas()
+    return proyectar(df, esquema) if esquema is not None else df
+
+
+def info_dataset(dataset: UserFileDataset) -> dict:
+    return {
+        "filas": dataset.filas,
+        "filas_por_periodo": dataset.filas_por_periodo,
+        "columnas": len(dataset.esquema),
+        "esquema": dataset.esquema,
+        "bytes": dataset.bytes,
+    }
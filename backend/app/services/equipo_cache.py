@@ -0,0 +1,187 @@
+import hashlib
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+import orjson
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from sqlalchemy import nulls_last, select
+
+from app.core.config import EQUIPOS_CACHE_MAX_AGE, ROSTER_CACHE_TTL_SECONDS
+from app.db.session import SessionLocal
+from app.models.equipo import Equipo
+from app.models.jugador import Jugador
+from app.schemas.equipo import EquipoOut
+from app.schemas.jugador import JugadorOut
+
+# ─────────────────────────────
+# Caché de respuestas de equipos / plantillas
+# ─────────────────────────────
+# Los equipos y jugadores solo cambian cuando corre load_excel: las
+# respuestas se serializan una vez (bytes JSON por equipo) y se sirven
+# tal cual, con ETag fuerte y Last-Modified. load_excel sube la versión
+# con invalidar_equipos(); los otros procesos releen al vencer
+# ROSTER_CACHE_TTL_SECONDS. El ETag es el hash del contenido, así que es
+# el mismo en todas las réplicas y un reload sin cambios no lo rompe.
+_lock = threading.Lock()
+_carga = threading.Lock()
+_version = 0
+_cache = None  # dict con version, cargado_en y las respuestas
+_contadores = {"hits": 0, "misses": 0, "no_modificados": 0}
+
+
+class _Respuesta:
+    __slots__ = ("cuerpo", "etag", "modificado")
+
+    def __init__(self, cuerpo: bytes, modificado: float):
+        self.cuerpo = cuerpo
+        self.etag = '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+        self.modificado = modificado
+
+
+def invalidar_equipos():
+    # La entrada vieja queda solo como referencia de Last-Modified
+    global _version
+
+    with _lock:
+        _version += 1
+
+
+def _vigente(entrada) -> bool:
+    if entrada is None or entrada["version"] != _version:
+        return False
+    return ROSTER_CACHE_TTL_SECONDS <= 0 or time.time() - entrada["cargado_en"] <= ROSTER_CACHE_TTL_SECONDS
+
+
+def _respuesta(cuerpo: bytes, anterior: "_Respuesta | None", ahora: float) -> _Respuesta:
+    # Mismo contenido que la carga anterior: se conserva Last-Modified
+    nueva = _Respuesta(cuerpo, ahora)
+    if anterior is not None and anterior.etag == nueva.etag:
+        nueva.modificado = anterior.modificado
+    return nueva
+
+
+def _construir(anterior: dict | None) -> dict:
+    # Dos SELECT para todo: equipos y todos los jugadores (mismo orden que las rutas)
+    with SessionLocal() as db:
+        equipos = [
+            EquipoOut.model_validate(e, from_attributes=True).model_dump()
+            for e in db.scalars(select(Equipo).order_by(Equipo.nombre))
+        ]
+        jugadores = [
+            JugadorOut.model_validate(j, from_attributes=True).model_dump()
+            for j in db.scalars(select(Jugador).order_by(Jugador.equipo_id, nulls_last(Jugador.numero)))
+        ]
+
+    por_equipo: dict[int, list] = {}
+    for j in jugadores:
+        por_equipo.setdefault(j["equipo_id"], []).append(j)
+
+    ahora = time.time()
+    previas = anterior["plantillas"] if anterior else {}
+    plantillas = {
+        equipo_id: _respuesta(orjson.dumps(lista), previas.get(equipo_id), ahora)
+        for equipo_id, lista in por_equipo.items()
+    }
+    completo = [{**e, "jugadores": por_equipo.get(e["id"], [])} for e in equipos]
+
+    return {
+        "equipos": _respuesta(orjson.dumps(equipos), anterior and anterior["equipos"], ahora),
+        "plantillas": plantillas,
+        "completo": _respuesta(orjson.dumps(completo), anterior and anterior["completo"], ahora),
+        # Equipo sin jugadores (o inexistente): lista vacía, como la consulta
+        "vacia": anterior["vacia"] if anterior else _Respuesta(b"[]", ahora),
+    }
+
+
+def _snapshot() -> dict:
+    global _cache
+
+    with _lock:
+        entrada = _cache
+        if _vigente(entrada):
+            _contadores["hits"] += 1
+            return entrada
+
+    # Un solo hilo reconstruye; los demás esperan y reusan el resultado
+    with _carga:
+        with _lock:
+            if _vigente(_cache):
+                _contadores["hits"] += 1
+                return _cache
+            version, anterior = _version, entrada
+            _contadores["misses"] += 1
+
+        nuevo = {**_construir(anterior), "version": version, "cargado_en": time.time()}
+
+        with _lock:
+            # Si alguien invalidó mientras leíamos, no guardar datos viejos
+            if version == _version:
+                _cache = nuevo
+        return nuevo
+
+
+def equipos() -> _Respuesta:
+    return _snapshot()["equipos"]
+
+
+def plantilla_equipo(equipo_id: int) -> _Respuesta:
+    s = _snapshot()
+    return s["plantillas"].get(equipo_id, s["vacia"])
+
+
+def equipos_con_jugadores() -> _Respuesta:
+    return _snapshot()["completo"]
+
+
+async def obtener(fn, *args) -> _Respuesta:
+    """Desde rutas async: con la caché vigente no sale del event loop."""
+    with _lock:
+        vigente = _vigente(_cache)
+    if vigente:
+        return fn(*args)
+    return await run_in_threadpool(fn, *args)
+
+
+def _no_modificado(request: Request, r: _Respuesta) -> bool:
+    # If-None-Match manda sobre If-Modified-Since (RFC 9110 §13.2.2)
+    si_no_coincide = request.headers.get("if-none-match")
+    if si_no_coincide is not None:
+        etags = {e.strip().removeprefix("W/") for e in si_no_coincide.split(",")}
+        return "*" in etags or r.etag in etags
+
+    si_modificado = request.headers.get("if-modified-since")
+    if si_modificado:
+        try:
+            return int(r.modificado) <= parsedate_to_datetime(si_modificado).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def responder_cacheado(request: Request, r: _Respuesta) -> Response:
+    """200 con los bytes cacheados o 304 si el cliente ya tiene esta versión."""
+    headers = {
+        "ETag": r.etag,
+        "Last-Modified": formatdate(r.modificado, usegmt=True),
+        "Cache-Control": f"public, max-age={EQUIPOS_CACHE_MAX_AGE}, must-revalidate",
+    }
+    if _no_modificado(request, r):
+        with _lock:
+            _contadores["no_modificados"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(r.cuerpo, media_type="application/json", headers=headers)
+
+
+def estado() -> dict:
+    with _lock:
+        entrada = _cache
+        return {
+            **_contadores,
+            "version": _version,
+            "vigente": _vigente(entrada),
+            "equipos": len(entrada["plantillas"]) if entrada else 0,
+            "bytes": sum(len(r.cuerpo) for r in entrada["plantillas"].values()) if entrada else 0,
+        }
@@ -1,15 +1,21 @@
+from sqlalchemy import nulls_last, select
 from sqlalchemy.orm import Session
-from sqlalchemy import nulls_last
 from app.models.equipo import Equipo
 from app.models.jugador import Jugador
 
-def get_equipos(db: Session):
-    return db.query(Equipo).order_by(Equipo.nombre).all()
+# Consultas como statements 2.0: las mismas sirven para Session y AsyncSession
+def query_equipos():
+    return select(Equipo).order_by(Equipo.nombre)
 
-def get_jugadores_por_equipo(db: Session, equipo_id: int):
+def query_jugadores_por_equipo(equipo_id: int):
     return (
-        db.query(Jugador)
-        .filter(Jugador.equipo_id == equipo_id)
+        select(Jugador)
+        .where(Jugador.equipo_id == equipo_id)
         .order_by(nulls_last(Jugador.numero))  # ✅ FIX
-        .all()
     )
+
+def get_equipos(db: Session):
+    return db.scalars(query_equipos()).all()
+
+def get_jugadores_por_equipo(db: Session, equipo_id: int):
+    return db.scalars(query_jugadores_por_equipo(equipo_id)).all()
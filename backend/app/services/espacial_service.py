@@ -0,0 +1,234 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import ESPACIAL_CACHE_ENTRIES
+from app.models.evento import Evento
+from app.services.evento_service import CATEGORIAS, cargar_eventos
+from app.services.kpi_service import PASE, clasificar_eventos, detectar_columna_evento
+
+# ─────────────────────────────
+# Rejillas espaciales (heatmaps y flujos de pase)
+# ─────────────────────────────
+# Cancha normalizada 0–100 en x (largo) e y (ancho), igual que carril_por_y.
+# Cada evento cae en una celda (np.digitize); los conteos salen de un solo
+# np.bincount sobre (grupo, celda). Los conteos son aditivos: la temporada
+# es la suma de los partidos, y cada partido se cachea por separado.
+LARGO = 100.0
+ANCHO = 100.0
+MAX_CELDAS_LADO = 24
+AGRUPACIONES = ("equipo", "jugador", "periodo")
+
+# Presets: zonas (12x8) y tercios x carriles (mismos cortes que carril_por_y)
+REJILLAS = {
+    "zonas": (np.linspace(0, LARGO, 13), np.linspace(0, ANCHO, 9)),
+    "tercios": (np.array([0, 33.33, 66.66, LARGO]), np.array([0, 33.33, 66.66, ANCHO])),
+}
+
+_lock = threading.Lock()
+_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+
+
+def bordes_rejilla(rejilla: str | None, columnas: int | None, filas: int | None):
+    if columnas or filas:
+        columnas, filas = columnas or 12, filas or 8
+        if not (1 <= columnas <= MAX_CELDAS_LADO and 1 <= filas <= MAX_CELDAS_LADO):
+            raise HTTPException(status_code=400, detail=f"columnas/filas entre 1 y {MAX_CELDAS_LADO}")
+        return np.linspace(0, LARGO, columnas + 1), np.linspace(0, ANCHO, filas + 1)
+
+    if rejilla not in REJILLAS:
+        raise HTTPException(status_code=400, detail=f"Rejilla inválida, usa una de: {', '.join(REJILLAS)}")
+    return REJILLAS[rejilla]
+
+
+def celdas(x, y, bordes_x: np.ndarray, bordes_y: np.ndarray) -> np.ndarray:
+    """
+    Índice de celda (fila * columnas + columna) por evento; -1 fuera de la
+    cancha o sin coordenadas. El borde final cuenta dentro (x == 100).
+    """
+    x = pd.to_numeric(pd.Series(x), errors="coerce").to_numpy(dtype=float)
+    y = pd.to_numeric(pd.Series(y), errors="coerce").to_numpy(dtype=float)
+    columnas, filas = len(bordes_x) - 1, len(bordes_y) - 1
+
+    # digitize sobre los bordes interiores → 0..n-1
+    cx = np.digitize(x, bordes_x[1:-1])
+    cy = np.digitize(y, bordes_y[1:-1])
+
+    dentro = (x >= bordes_x[0]) & (x <= bordes_x[-1]) & (y >= bordes_y[0]) & (y <= bordes_y[-1])
+    return np.where(dentro, cy * columnas + cx, -1)
+
+
+def _claves_grupo(df: pd.DataFrame, agrupar: str):
+    if agrupar == "equipo":
+        return np.zeros(len(df), dtype=np.int64), ["equipo"]
+    if agrupar == "jugador":
+        codigos, claves = pd.factorize(df["jugador"])
+    else:
+        codigos, claves = pd.factorize(df["periodo"])
+    return codigos.astype(np.int64), [str(c) for c in claves]
+
+
+def agregar_partido(
+    df: pd.DataFrame,
+    bordes_x: np.ndarray,
+    bordes_y: np.ndarray,
+    agrupar: str = "equipo",
+    categoria: str | None = None,
+) -> dict:
+    """
+    Conteos de un conjunto de eventos: {grupo: {"heatmap": ndarray(filas, columnas),
+    "flujos": (claves origen*n+destino, conteos), "eventos": n}}.
+    """
+    n = (len(bordes_x) - 1) * (len(bordes_y) - 1)
+    forma = (len(bordes_y) - 1, len(bordes_x) - 1)
+    if df is None or df.empty:
+        return {}
+
+    grupos, nombres = _claves_grupo(df, agrupar)
+    event_col = detectar_columna_evento(df)
+    bits = clasificar_eventos(df[event_col]) if event_col else np.zeros(len(df), dtype=np.uint8)
+
+    origen = celdas(df["x"], df["y"], bordes_x, bordes_y)
+
+    # Heatmap: origen de los eventos (opcionalmente de una categoría)
+    mascara = (origen >= 0) & (grupos >= 0)
+    if categoria is not None:
+        mascara &= (bits & CATEGORIAS[categoria]).astype(bool)
+    heat = np.bincount(
+        grupos[mascara] * n + origen[mascara], minlength=len(nombres) * n
+    ).reshape(len(nombres), *forma)
+
+    # Flujos: pases con origen y destino dentro de la cancha
+    if "x2" in df.columns and "y2" in df.columns:
+        destino = celdas(df["x2"], df["y2"], bordes_x, bordes_y)
+    else:
+        destino = np.full(len(df), -1)
+    es_pase = (bits & PASE).astype(bool) & (origen >= 0) & (destino >= 0) & (grupos >= 0)
+    clave_flujo = (grupos[es_pase] * n + origen[es_pase]) * n + destino[es_pase]
+    unicas, conteos = np.unique(clave_flujo, return_counts=True)
+    grupo_flujo = unicas // (n * n)
+
+    resultado = {}
+    for g, nombre in enumerate(nombres):
+        sel = grupo_flujo == g
+        resultado[nombre] = {
+            "heatmap": heat[g],
+            "flujos": (unicas[sel] % (n * n), conteos[sel]),
+            "eventos": int(heat[g].sum()),
+        }
+    return resultado
+
+
+def _sumar(partes: list[dict]) -> dict:
+    total = {}
+    for parte in partes:
+        for nombre, datos in parte.items():
+            if nombre not in total:
+                # Copia: las entradas del caché no se tocan
+                total[nombre] = {
+                    "heatmap": datos["heatmap"].copy(),
+                    "flujos": [datos["flujos"]],
+                    "eventos": datos["eventos"],
+                }
+            else:
+                total[nombre]["heatmap"] += datos["heatmap"]
+                total[nombre]["flujos"].append(datos["flujos"])
+                total[nombre]["eventos"] += datos["eventos"]
+
+    for datos in total.values():
+        claves = np.concatenate([f[0] for f in datos["flujos"]])
+        conteos = np.concatenate([f[1] for f in datos["flujos"]])
+        unicas, inversa = np.unique(claves, return_inverse=True)
+        datos["flujos"] = (unicas, np.bincount(inversa, weights=conteos).astype(np.int64))
+    return total
+
+
+def _partido_cacheado(db: Session, partido_id: int, equipo_id: int, bordes_x, bordes_y, agrupar, categoria):
+    clave = (partido_id, equipo_id, tuple(bordes_x), tuple(bordes_y), agrupar, categoria)
+
+    with _lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+
+    # Los eventos de un partido no cambian (partido = hash del archivo)
+    datos = agregar_partido(
+        cargar_eventos(db, equipo_id=equipo_id, partido_id=partido_id),
+        bordes_x, bordes_y, agrupar, categoria,
+    )
+
+    with _lock:
+        _cache[clave] = datos
+        while len(_cache) > ESPACIAL_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return datos
+
+
+def _salida(datos: dict, top_flujos: int) -> dict:
+    n = len(datos["heatmap"].ravel())
+    claves, conteos = datos["flujos"]
+    orden = np.argsort(-conteos, kind="stable")[:top_flujos]
+    return {
+        "eventos": datos["eventos"],
+        "heatmap": datos["heatmap"].tolist(),
+        # [celda origen, celda destino, pases]; celda = fila * columnas + columna
+        "flujos": [
+            [int(claves[i] // n), int(claves[i] % n), int(conteos[i])]
+            for i in orden
+        ],
+    }
+
+
+def mapa_espacial(
+    db: Session,
+    equipo_id: int,
+    partido_id: int | None = None,
+    rejilla: str | None = "zonas",
+    columnas: int | None = None,
+    filas: int | None = None,
+    agrupar: str = "equipo",
+    categoria: str | None = None,
+    top_flujos: int = 50,
+) -> dict:
+    if agrupar not in AGRUPACIONES:
+        raise HTTPException(status_code=400, detail=f"agrupar debe ser uno de: {', '.join(AGRUPACIONES)}")
+    if categoria is not None and categoria not in CATEGORIAS:
+        raise HTTPException(status_code=400, detail=f"Categoría inválida, usa una de: {', '.join(CATEGORIAS)}")
+
+    bordes_x, bordes_y = bordes_rejilla(rejilla, columnas, filas)
+
+    if partido_id is not None:
+        partidos = [partido_id]
+    else:
+        partidos = db.execute(
+            select(Evento.partido_id).where(Evento.equipo_id == equipo_id).distinct()
+        ).scalars().all()
+
+    total = _sumar([
+        _partido_cacheado(db, p, equipo_id, bordes_x, bordes_y, agrupar, categoria)
+        for p in partidos
+    ])
+
+    return {
+        "rejilla": {
+            "columnas": len(bordes_x) - 1,
+            "filas": len(bordes_y) - 1,
+            "bordes_x": [round(float(b), 2) for b in bordes_x],
+            "bordes_y": [round(float(b), 2) for b in bordes_y],
+        },
+        "partidos": len(partidos),
+        "grupos": {
+            nombre: _salida(datos, top_flujos)
+            for nombre, datos in total.items()
+        },
+    }
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
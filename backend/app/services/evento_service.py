@@ -0,0 +1,279 @@
+import pandas as pd
+from fastapi import HTTPException
+from sqlalchemy import select, insert, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.metricas import medido
+from app.models.evento import Evento
+from app.models.partido import Partido
+from app.models.jugador import Jugador
+from app.utils.stats_loader import a_float64
+from app.services.kpi_service import (
+    PASE,
+    PASE_EXITOSO,
+    PASE_FALLIDO,
+    PERDIDA,
+    JUGADA_GANADA,
+    clasificar_eventos,
+    detectar_columna_evento,
+)
+
+COLUMNAS_NUMERICAS = ["x", "y", "x2", "y2", "xg"]
+BATCH_SIZE = 5000
+
+
+# ─────────────────────────────
+# Escritura
+# ─────────────────────────────
+def _entero(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype="Int64")
+    return pd.to_numeric(df[col], errors="coerce").astype("Int64")
+
+
+def _registros_eventos(df: pd.DataFrame, partido_id: int) -> list[dict]:
+    event_col = detectar_columna_evento(df)
+
+    data = pd.DataFrame(index=df.index)
+    data["partido_id"] = partido_id
+    data["equipo_id"] = _entero(df, "equipo_id")
+    data["id_jugador"] = _entero(df, "id_jugador")
+    data["periodo"] = df["periodo"].astype(str) if "periodo" in df.columns else None
+    data["evento"] = df[event_col].astype("string") if event_col else None
+
+    for col in COLUMNAS_NUMERICAS:
+        data[col] = a_float64(df[col]) if col in df.columns else None
+
+    # NaN/NA → None para el driver
+    return data.astype(object).where(data.notna(), None).to_dict("records")
+
+
+def registrar_partido(
+    db: Session,
+    hash_archivo: str,
+    filename: str | None = None,
+    user_file_id: int | None = None,
+) -> tuple[Partido, bool]:
+    """
+    Devuelve (partido, es_nuevo). Si el mismo archivo ya se guardó no se
+    crea otro partido: los eventos no se duplican.
+    """
+    partido = db.query(Partido).filter(Partido.hash == hash_archivo).first()
+    if partido:
+        return _partido_existente(db, partido, user_file_id), False
+
+    partido = Partido(hash=hash_archivo, filename=filename, user_file_id=user_file_id)
+    db.add(partido)
+    try:
+        db.flush()
+    except IntegrityError:
+        # El mismo archivo se subió a la vez en otro request/worker: gana
+        # el que insertó primero y este reutiliza su partido
+        db.rollback()
+        partido = db.query(Partido).filter(Partido.hash == hash_archivo).first()
+        if partido is None:
+            raise
+        return _partido_existente(db, partido, user_file_id), False
+
+    return partido, True
+
+
+def _partido_existente(db: Session, partido: Partido, user_file_id: int | None) -> Partido:
+    if user_file_id and not partido.user_file_id:
+        partido.user_file_id = user_file_id
+        db.commit()
+    return partido
+
+
+def insertar_eventos(db: Session, partido_id: int, df: pd.DataFrame):
+    registros = _registros_eventos(df, partido_id)
+    for i in range(0, len(registros), BATCH_SIZE):
+        db.execute(insert(Evento), registros[i:i + BATCH_SIZE])
+
+
+def guardar_eventos(
+    db: Session,
+    df: pd.DataFrame,
+    hash_archivo: str,
+    filename: str | None = None,
+    user_file_id: int | None = None,
+) -> Partido:
+    """
+    Persiste los eventos ya enriquecidos (merge_stats_with_players) de un
+    archivo subido. Si el mismo archivo ya se guardó, no duplica filas.
+    """
+    partido, nuevo = registrar_partido(db, hash_archivo, filename, user_file_id)
+    if not nuevo:
+        return partido
+
+    insertar_eventos(db, partido.id, df)
+    db.commit()
+    db.refresh(partido)
+    return partido
+
+
+# ─────────────────────────────
+# Lectura
+# ─────────────────────────────
+@medido("cargar_eventos")
+def cargar_eventos(
+    db: Session,
+    equipo_id: int | None = None,
+    partido_id: int | None = None,
+    partidos_de: int | None = None,
+) -> pd.DataFrame:
+    """
+    Eventos guardados, filtrados por equipo (índice eventos.equipo_id)
+    y/o partido, con las mismas columnas que produce merge_stats_with_players.
+    `partidos_de` trae los partidos completos (ambos equipos) en los que
+    jugó ese equipo.
+    """
+    query = (
+        select(
+            Evento.partido_id,
+            Evento.equipo_id,
+            Evento.id_jugador,
+            Evento.periodo,
+            Evento.evento,
+            Evento.x,
+            Evento.y,
+            Evento.x2,
+            Evento.y2,
+            Evento.xg,
+            Jugador.nombre.label("jugador"),
+            Jugador.imagen_url.label("imagen_jugador"),
+        )
+        .outerjoin(Jugador, Jugador.id == Evento.id_jugador)
+        .order_by(Evento.id)
+    )
+
+    if equipo_id is not None:
+        query = query.where(Evento.equipo_id == equipo_id)
+    if partido_id is not None:
+        query = query.where(Evento.partido_id == partido_id)
+    if partidos_de is not None:
+        query = query.where(
+            Evento.partido_id.in_(
+                select(Evento.partido_id).where(Evento.equipo_id == partidos_de).distinct()
+            )
+        )
+
+    df = pd.read_sql(query, db.connection())
+
+    df["jugador"] = df["jugador"].fillna("Desconocido")
+    df["imagen_jugador"] = df["imagen_jugador"].fillna("")
+    return df
+
+
+# ─────────────────────────────
+# Consulta paginada (keyset por id)
+# ─────────────────────────────
+CATEGORIAS = {
+    "pase": PASE,
+    "pase_exitoso": PASE_EXITOSO,
+    "pase_fallido": PASE_FALLIDO,
+    "perdida": PERDIDA,
+    "jugada_ganada": JUGADA_GANADA,
+}
+
+COLUMNAS_CONSULTA = [
+    "id", "partido_id", "equipo_id", "id_jugador", "jugador",
+    "periodo", "evento", "x", "y", "x2", "y2", "xg",
+]
+
+
+def etiquetas_categoria(db: Session, categoria: str, filtros: list) -> list[str]:
+    """
+    Etiquetas de evento (distintas, ya filtradas) que caen en la categoría,
+    con el mismo vocabulario que los KPIs. Son pocas: se clasifican en Python
+    y la consulta principal filtra con IN.
+    """
+    bit = CATEGORIAS.get(categoria)
+    if bit is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Categoría inválida, usa una de: {', '.join(CATEGORIAS)}"
+        )
+
+    etiquetas = pd.Series(
+        db.execute(select(Evento.evento).where(*filtros).distinct()).scalars().all(),
+        dtype=object,
+    )
+    mascara = clasificar_eventos(etiquetas) & bit
+    return etiquetas[mascara.astype(bool)].dropna().tolist()
+
+
+def consulta_eventos(
+    db: Session,
+    equipo_id: int | None = None,
+    partido_id: int | None = None,
+    id_jugador: int | None = None,
+    periodo: str | None = None,
+    categoria: str | None = None,
+    zona: tuple[float | None, float | None, float | None, float | None] | None = None,
+    despues_de: int | None = None,
+    limite: int = 1000,
+):
+    """
+    SELECT de eventos filtrado y ordenado por id, a partir del cursor
+    `despues_de` (keyset: nunca OFFSET). `zona` = (x_min, x_max, y_min, y_max)
+    sobre el origen del evento; cualquier límite puede ser None.
+    """
+    filtros = []
+    if equipo_id is not None:
+        filtros.append(Evento.equipo_id == equipo_id)
+    if partido_id is not None:
+        filtros.append(Evento.partido_id == partido_id)
+    if id_jugador is not None:
+        filtros.append(Evento.id_jugador == id_jugador)
+    if periodo is not None:
+        filtros.append(Evento.periodo == periodo)
+
+    if zona is not None:
+        x_min, x_max, y_min, y_max = zona
+        for col, minimo, maximo in ((Evento.x, x_min, x_max), (Evento.y, y_min, y_max)):
+            if minimo is not None:
+                filtros.append(col >= minimo)
+            if maximo is not None:
+                filtros.append(col <= maximo)
+
+    if categoria is not None:
+        filtros.append(Evento.evento.in_(etiquetas_categoria(db, categoria, filtros)))
+
+    if despues_de is not None:
+        filtros.append(Evento.id > despues_de)
+
+    return (
+        select(
+            Evento.id,
+            Evento.partido_id,
+            Evento.equipo_id,
+            Evento.id_jugador,
+            func.coalesce(Jugador.nombre, "Desconocido").label("jugador"),
+            Evento.periodo,
+            Evento.evento,
+            Evento.x,
+            Evento.y,
+            Evento.x2,
+            Evento.y2,
+            Evento.xg,
+        )
+        .outerjoin(Jugador, Jugador.id == Evento.id_jugador)
+        .where(*filtros)
+        .order_by(Evento.id)
+        .limit(limite)
+    )
+
+
+def iter_eventos(db: Session, query, lote: int = 500):
+    """
+    Recorre el resultado con cursor de servidor, `lote` filas a la vez:
+    la memoria no depende del tamaño del partido.
+    """
+    resultado = db.connection().execution_options(stream_results=True).execute(query)
+    try:
+        for filas in resultado.partitions(lote):
+            yield filas
+    finally:
+        resultado.close()
@@ -1,25 +1,39 @@
 import os
 from pathlib import Path
 from fastapi import HTTPException
+from sqlalchemy import select
 from app.models.user_file import UserFile
+from app.models.user_file_dataset import UserFileDataset
+from app.services.upload_cache import load_stats_cached, clave_upload
+from app.services.stats_service import merge_stats_with_players
+from app.services.kpi_agregado_service import guardar_partido
+from app.services.dataset_service import EXTENSIONES_STATS, guardar_dataset, info_dataset
+from app.utils.stats_loader import ESQUEMA_KPI, proyectar
 
 UPLOAD_DIR = Path("uploads")
 MAX_SIZE_MB = 20
 
-def save_file(db, user, file):
+def validar_upload(file):
     if not file.filename:
         raise HTTPException(status_code=400, detail="Archivo inválido")
 
     if hasattr(file, "size") and file.size > MAX_SIZE_MB * 1024 * 1024:
         raise HTTPException(status_code=413, detail="Archivo demasiado grande")
 
-    safe_name = file.filename.replace("..", "").replace("/", "")
+
+def save_file(db, user, filename: str, data: bytes):
+    """
+    Guarda el archivo subido (ya leído) y su registro. La conversión a
+    Parquet y la importación de eventos van aparte, en el pool de cómputo
+    (importar_archivo).
+    """
+    safe_name = filename.replace("..", "").replace("/", "")
     user_dir = UPLOAD_DIR / str(user.id)
     user_dir.mkdir(parents=True, exist_ok=True)
 
     path = user_dir / safe_name
     with open(path, "wb") as f:
-        f.write(file.file.read())
+        f.write(data)
 
     record = UserFile(
         user_id=user.id,
@@ -29,5 +43,47 @@ def save_file(db, user, file):
     db.add(record)
     db.commit()
     db.refresh(record)
-
     return record
+
+
+def importar_archivo(db, user_file_id: int, data: bytes):
+    """
+    Corre en el worker (compute_service.ejecutar). Si es una planilla de
+    estadísticas, se convierte una vez a Parquet (GET /files/{id}/kpis) y
+    sus eventos quedan guardados para que GET /kpis no dependa de volver a
+    subir el archivo. Devuelve la info del dataset Parquet, o None si no es
+    una planilla de estadísticas. Un archivo ilegible levanta el error (el
+    pool lo devuelve como 400); el archivo ya quedó guardado igual.
+    """
+    record = db.get(UserFile, user_file_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    importar_eventos(db, record, data)
+
+    dataset = db.scalar(select(UserFileDataset).where(UserFileDataset.user_file_id == record.id))
+    return info_dataset(dataset) if dataset else None
+
+
+def importar_eventos(db, record, data: bytes):
+    suffix = Path(record.filename).suffix.lower()
+    if suffix not in EXTENSIONES_STATS:
+        return None
+
+    # Un solo parseo completo: el Parquet guarda todas las columnas y los
+    # KPIs toman la proyección compacta del mismo DataFrame
+    df = load_stats_cached(data, suffix)
+    try:
+        guardar_dataset(db, record, df)
+    except Exception as e:
+        db.rollback()
+        print("⚠️ No se guardó el Parquet de", record.filename, "→", e)
+
+    merged = merge_stats_with_players(db, proyectar(df, ESQUEMA_KPI))
+    return guardar_partido(
+        db,
+        merged,
+        clave_upload(data, suffix),
+        filename=record.filename,
+        user_file_id=record.id
+    )
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException
+
+from app.core.config import JOB_RESULT_TTL_SECONDS
+from app.services import compute_service
+from app.services.pipeline_service import kpis_desde_archivo_stream
+from app.utils.respuestas import RECORDS
+
+# ─────────────────────────────
+# Jobs de KPIs (upload → id inmediato → polling)
+# ─────────────────────────────
+# Registro en memoria del proceso web; el cómputo corre en compute_service.
+# Un mismo archivo + equipo + opciones comparte un único job.
+PENDIENTE = "pendiente"
+PROCESANDO = "procesando"
+COMPLETADO = "completado"
+ERROR = "error"
+
+_lock = threading.Lock()
+_jobs: dict[str, dict] = {}
+_por_clave: dict[tuple, str] = {}
+
+
+def _purgar():
+    ahora = time.time()
+    with _lock:
+        vencidos = [
+            job_id for job_id, job in _jobs.items()
+            if job["terminado"] and ahora - job["terminado"] > JOB_RESULT_TTL_SECONDS
+        ]
+        for job_id in vencidos:
+            job = _jobs.pop(job_id)
+            _por_clave.pop(job["clave"], None)
+
+
+def _terminar(job_id: str, path: str, future):
+    with _lock:
+        job = _jobs.get(job_id)
+
+    try:
+        if job is not None:
+            try:
+                job["resultado"] = compute_service.resultado(future)
+                job["estado"] = COMPLETADO
+            except HTTPException as e:
+                job["error"] = {"status_code": e.status_code, "detail": e.detail}
+                job["estado"] = ERROR
+            except Exception as e:
+                job["error"] = {"status_code": 500, "detail": str(e)}
+                job["estado"] = ERROR
+            job["terminado"] = time.time()
+            # Foto final del progreso; el proxy compartido ya no hace falta
+            job["progreso"] = dict(job["_progreso"])
+            job["_progreso"] = {}
+    finally:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except PermissionError:
+            pass
+
+
+def crear_job(
+    path: str,
+    clave: str,
+    filename: str | None,
+    equipo_id: int,
+    incluir_eventos: bool = False,
+    formato: str = RECORDS,
+) -> dict:
+    """
+    Encola el procesamiento del archivo ya copiado en `path`.
+    Si el mismo archivo/equipo ya tiene un job vigente, devuelve ese.
+    """
+    _purgar()
+    clave_job = (clave, equipo_id, incluir_eventos, formato)
+
+    with _lock:
+        existente = _por_clave.get(clave_job)
+        if existente and _jobs[existente]["estado"] != ERROR:
+            os.remove(path)
+            return _estado(_jobs[existente])
+
+        job_id = uuid.uuid4().hex
+        progreso = compute_service.progreso_compartido()
+        job = {
+            "id": job_id,
+            "clave": clave_job,
+            "equipo_id": equipo_id,
+            "filename": filename,
+            "formato": formato,
+            "estado": PENDIENTE,
+            "creado": time.time(),
+            "terminado": None,
+            "error": None,
+            "resultado": None,
+            "progreso": None,
+            "_progreso": progreso,
+        }
+        _jobs[job_id] = job
+        _por_clave[clave_job] = job_id
+
+    try:
+        future = compute_service.enviar(
+            kpis_desde_archivo_stream, path, clave, filename, equipo_id, incluir_eventos, progreso, formato
+        )
+    except Exception:
+        with _lock:
+            _jobs.pop(job_id, None)
+            _por_clave.pop(clave_job, None)
+        os.remove(path)
+        raise
+
+    future.add_done_callback(lambda f: _terminar(job_id, path, f))
+
+    with _lock:
+        return _estado(job)
+
+
+def _obtener(job_id: str) -> dict:
+    job = _jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado o expirado")
+    return job
+
+
+def _estado(job: dict) -> dict:
+    progreso = job["progreso"]
+    if progreso is None:
+        progreso = dict(job["_progreso"])
+        if job["estado"] == PENDIENTE and progreso:
+            job["estado"] = PROCESANDO
+
+    expira = job["terminado"] + JOB_RESULT_TTL_SECONDS if job["terminado"] else None
+
+    return {
+        "job_id": job["id"],
+        "estado": job["estado"],
+        "equipo_id": job["equipo_id"],
+        "filename": job["filename"],
+        "formato": job["formato"],
+        "progreso": {
+            "hojas_total": progreso.get("hojas_total"),
+            "hojas_leidas": progreso.get("hojas_leidas", 0),
+            "filas_leidas": progreso.get("filas_leidas", 0),
+            "filas_procesadas": progreso.get("filas_procesadas", 0),
+        },
+        "error": job["error"],
+        "creado": job["creado"],
+        "terminado": job["terminado"],
+        "expira": expira,
+    }
+
+
+def estado_job(job_id: str) -> dict:
+    _purgar()
+    with _lock:
+        return _estado(_obtener(job_id))
+
+
+def resultado_job(job_id: str) -> dict:
+    _purgar()
+    with _lock:
+        job = _obtener(job_id)
+
+        if job["estado"] == ERROR:
+            raise HTTPException(status_code=job["error"]["status_code"], detail=job["error"]["detail"])
+
+        if job["estado"] != COMPLETADO:
+            raise HTTPException(status_code=409, detail=f"El job aún no termina ({job['estado']})")
+
+        return job["resultado"]
@@ -0,0 +1,249 @@
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, delete, func, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.metricas import medido
+from app.models.kpi_agregado import KpiAgregado
+from app.models.kpi_materializado import KpiMaterializado
+from app.models.partido import Partido
+from app.models.jugador import Jugador
+from app.services.evento_service import (
+    guardar_eventos,
+    registrar_partido,
+    insertar_eventos,
+    cargar_eventos,
+)
+from app.services.kpi_service import CONTADORES, contadores_kpi, construir_kpis
+
+ENTEROS = [c for c in CONTADORES if c != "xg"]
+
+
+# ─────────────────────────────
+# Escritura (incremental: solo el partido nuevo)
+# ─────────────────────────────
+def contadores_por_equipo(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Contadores de contadores_kpi por equipo, en la forma en que se guardan
+    (claves como texto, sin nombres de jugador).
+    """
+    if "equipo_id" not in df.columns:
+        return pd.DataFrame()
+
+    partes = []
+    equipos = pd.to_numeric(df["equipo_id"], errors="coerce")
+    for equipo_id, d in df.groupby(equipos):
+        cont = contadores_kpi(d)
+        cont = cont.drop(columns=["jugador", "imagen_jugador"], errors="ignore")
+        cont["clave"] = cont["clave"].astype(str)
+        cont["subclave"] = cont["subclave"].fillna("").astype(str)
+        cont["equipo_id"] = int(equipo_id)
+        partes.append(cont)
+
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+
+def reducir_contadores(partes: list[pd.DataFrame]) -> pd.DataFrame:
+    # Los contadores son aditivos: combinar bloques o partidos es sumar
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame()
+
+    return (
+        pd.concat(partes, ignore_index=True)
+        .groupby(["equipo_id", "dimension", "clave", "subclave"], sort=False)[CONTADORES]
+        .sum()
+        .reset_index()
+    )
+
+
+def _guardar_contadores(db: Session, partido_id: int, cont: pd.DataFrame):
+    db.execute(delete(KpiAgregado).where(KpiAgregado.partido_id == partido_id))
+
+    if not cont.empty:
+        cont = cont.copy()
+        cont[ENTEROS] = cont[ENTEROS].astype(np.int64)
+        cont["partido_id"] = partido_id
+        db.execute(insert(KpiAgregado), cont.astype(object).to_dict("records"))
+
+    # Marca en la misma transacción, aunque no haya filas (ningún evento
+    # con equipo): el partido no vuelve a quedar pendiente
+    if db.get(KpiMaterializado, partido_id) is None:
+        db.add(KpiMaterializado(partido_id=partido_id))
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # Otro worker materializó el mismo partido a la vez (mismos contadores)
+        db.rollback()
+
+
+def materializar_partido(db: Session, partido_id: int, df: pd.DataFrame):
+    """
+    Calcula los contadores KPI de un partido por equipo y los guarda.
+    Es idempotente: reemplaza los contadores previos de ese partido.
+    """
+    _guardar_contadores(db, partido_id, contadores_por_equipo(df))
+
+
+@medido("guardar_partido")
+def guardar_partido(
+    db: Session,
+    df: pd.DataFrame,
+    hash_archivo: str,
+    filename: str | None = None,
+    user_file_id: int | None = None,
+) -> Partido:
+    # Eventos + contadores: un upload repetido no recalcula nada
+    partido = guardar_eventos(db, df, hash_archivo, filename=filename, user_file_id=user_file_id)
+
+    if not _materializado(db, partido.id):
+        materializar_partido(db, partido.id, df)
+
+    return partido
+
+
+@medido("guardar_partido")
+def guardar_partido_stream(
+    db: Session,
+    bloques: Iterable[pd.DataFrame],
+    hash_archivo: str,
+    filename: str | None = None,
+    user_file_id: int | None = None,
+) -> Partido:
+    """
+    Igual que guardar_partido pero consumiendo bloques (iter_stats ya
+    enriquecidos): solo hay un bloque de eventos en memoria a la vez.
+    Si el archivo ya estaba guardado, los bloques ni se leen.
+    """
+    partido, nuevo = registrar_partido(db, hash_archivo, filename, user_file_id)
+    if not nuevo and _materializado(db, partido.id):
+        return partido
+
+    parciales = []
+    for bloque in bloques:
+        if nuevo:
+            insertar_eventos(db, partido.id, bloque)
+        parciales.append(contadores_por_equipo(bloque))
+
+        # Reducir sobre la marcha: memoria O(grupos), no O(bloques)
+        if len(parciales) >= 8:
+            parciales = [reducir_contadores(parciales)]
+
+    _guardar_contadores(db, partido.id, reducir_contadores(parciales))
+    db.refresh(partido)
+    return partido
+
+
+def _materializado(db: Session, partido_id: int) -> bool:
+    return db.get(KpiMaterializado, partido_id) is not None
+
+
+def partido_materializado(db: Session, hash_archivo: str) -> Partido | None:
+    """El partido de ese archivo si ya tiene contadores (no hace falta parsearlo)."""
+    partido = db.execute(select(Partido).where(Partido.hash == hash_archivo)).scalar_one_or_none()
+    if partido is None or not _materializado(db, partido.id):
+        return None
+    return partido
+
+
+def materializar_pendientes(db: Session) -> int:
+    """
+    Backfill (startup / app.scripts.materializar_kpis, nunca en lecturas):
+    materializa los partidos guardados sin marca en kpi_materializados,
+    p. ej. eventos cargados antes de existir los contadores.
+    """
+    sin_marca = ~exists().where(KpiMaterializado.partido_id == Partido.id)
+
+    # Partidos que ya tienen contadores (anteriores a la marca): solo se marcan
+    db.execute(
+        insert(KpiMaterializado).from_select(
+            ["partido_id"],
+            select(Partido.id).where(sin_marca, exists().where(KpiAgregado.partido_id == Partido.id)),
+        )
+    )
+    db.commit()
+
+    pendientes = db.execute(select(Partido.id).where(sin_marca)).scalars().all()
+    for partido_id in pendientes:
+        materializar_partido(db, partido_id, cargar_eventos(db, partido_id=partido_id))
+
+    return len(pendientes)
+
+
+# ─────────────────────────────
+# Lectura: O(grupos), no O(eventos)
+# ─────────────────────────────
+def contadores_equipo(db: Session, equipo_id: int, partido_ids: list[int] | None = None) -> pd.DataFrame:
+    query = (
+        select(
+            KpiAgregado.dimension,
+            KpiAgregado.clave,
+            KpiAgregado.subclave,
+            *[func.sum(getattr(KpiAgregado, c)).label(c) for c in CONTADORES],
+        )
+        .where(KpiAgregado.equipo_id == equipo_id)
+        .group_by(KpiAgregado.dimension, KpiAgregado.clave, KpiAgregado.subclave)
+        # Orden de inserción (primera aparición): desempata eventos_por_tipo
+        .order_by(func.min(KpiAgregado.id))
+    )
+
+    if partido_ids is not None:
+        query = query.where(KpiAgregado.partido_id.in_(partido_ids))
+
+    return pd.read_sql(query, db.connection())
+
+
+def contadores_por_partido(db: Session, equipo_id: int, partido_ids: list[int]) -> pd.DataFrame:
+    """Contadores de un equipo sin sumar: una fila por partido y grupo."""
+    query = (
+        select(
+            KpiAgregado.partido_id,
+            KpiAgregado.dimension,
+            KpiAgregado.clave,
+            KpiAgregado.subclave,
+            *[getattr(KpiAgregado, c) for c in CONTADORES],
+        )
+        .where(KpiAgregado.equipo_id == equipo_id, KpiAgregado.partido_id.in_(partido_ids))
+        .order_by(KpiAgregado.id)
+    )
+    return pd.read_sql(query, db.connection())
+
+
+@medido("kpis_temporada")
+def kpis_temporada(db: Session, equipo_id: int, partido_ids: list[int] | None = None) -> dict | None:
+    return kpis_desde_contadores(db, contadores_equipo(db, equipo_id, partido_ids))
+
+
+def kpis_desde_contadores(db: Session, cont: pd.DataFrame) -> dict | None:
+    """KPIs a partir de contadores ya sumados (dimension/clave/subclave)."""
+    if cont.empty:
+        return None
+
+    # Las claves de jugador se guardan como texto
+    es_jugador = cont["dimension"].isin(["jugador", "tipo"])
+    cont["clave"] = cont["clave"].astype(object)
+    cont.loc[es_jugador, "clave"] = cont.loc[es_jugador, "clave"].astype(np.int64)
+
+    ids = cont.loc[cont["dimension"] == "jugador", "clave"].astype(int).tolist()
+    nombres = {
+        r.id: (r.nombre, r.imagen_url)
+        for r in db.execute(
+            select(Jugador.id, Jugador.nombre, Jugador.imagen_url).where(Jugador.id.in_(ids))
+        )
+    }
+
+    es_fila_jugador = cont["dimension"] == "jugador"
+    cont["jugador"] = None
+    cont["imagen_jugador"] = None
+    cont.loc[es_fila_jugador, "jugador"] = [
+        nombres.get(i, (None, None))[0] or "Desconocido" for i in cont.loc[es_fila_jugador, "clave"]
+    ]
+    cont.loc[es_fila_jugador, "imagen_jugador"] = [
+        nombres.get(i, (None, None))[1] or "" for i in cont.loc[es_fila_jugador, "clave"]
+    ]
+
+    return construir_kpis(cont)
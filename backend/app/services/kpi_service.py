@@ -1,6 +1,58 @@
+import numpy as np
 import pandas as pd
 from fastapi import HTTPException
 
+from app.core.metricas import medido
+
+# =======================
+# VOCABULARIO DE EVENTOS
+# =======================
+# Cada categoría KPI es un bit; una etiqueta de evento puede activar varios.
+PASE = 1
+PASE_EXITOSO = 2
+PASE_FALLIDO = 4
+PERDIDA = 8
+JUGADA_GANADA = 16
+TIRO = 32
+CONDUCCION = 64
+
+PATRONES_CATEGORIA = {
+    PASE: "Pase|Centro|Asistencia",
+    PASE_EXITOSO: "Pase completo|Pase entre lineas|Pase filtrado|Centro completo|Asistencia",
+    PASE_FALLIDO: "Pase incompleto|Centro incompleto",
+    PERDIDA: "Pase incompleto|Centro incompleto|Balon aereo perdido|Duelo perdido|Regate fallido",
+    JUGADA_GANADA: "Pase completo|Pase entre lineas|Pase filtrado|Centro completo|Asistencia|Balon aereo ganado|Duelo ganado|Tiro|Remate|Gol",
+    TIRO: "Tiro|Remate|Shot|Gol",
+    CONDUCCION: "Conducci|Carry",
+}
+
+
+def detectar_columna_evento(df: pd.DataFrame):
+    return next(
+        (c for c in df.columns if c.lower() in ["event", "evento", "type"]),
+        None
+    )
+
+
+def clasificar_eventos(eventos: pd.Series) -> np.ndarray:
+    """
+    Devuelve un bitmask (uint8) por fila.
+
+    El regex se evalúa una sola vez por etiqueta distinta (categorías) y
+    luego se expande a todas las filas con los códigos categóricos.
+    """
+    cat = pd.Categorical(eventos)
+    etiquetas = pd.Series(cat.categories)
+
+    tabla = np.zeros(len(etiquetas) + 1, dtype=np.uint8)  # último = NaN
+    for bit, patron in PATRONES_CATEGORIA.items():
+        coincide = etiquetas.str.contains(patron, case=False, na=False, regex=True)
+        tabla[:-1] |= np.where(coincide.to_numpy(dtype=bool), bit, 0).astype(np.uint8)
+
+    # código -1 (NaN) apunta a la última posición de la tabla
+    return tabla[cat.codes]
+
+
 def carril_por_y(y):
     if y < 33.33:
         return "izquierdo"
@@ -10,214 +62,314 @@ def carril_por_y(y):
         return "derecho"
 
 
-def kpis_por_periodo(df_input: pd.DataFrame):
-    if df_input is None or df_input.empty:
-        raise HTTPException(status_code=422, detail="No hay datos para KPIs")
+CARRILES = ["izquierdo", "central", "derecho"]
 
-    df = df_input.copy()
 
-    if "periodo" not in df.columns:
-        raise HTTPException(status_code=422, detail="Columna 'periodo' no encontrada")
+def _codigos_carril(y: pd.Series) -> np.ndarray:
+    # Misma regla que carril_por_y (NaN cae en "derecho")
+    valores = pd.to_numeric(y, errors="coerce").to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        return np.select([valores < 33.33, valores < 66.66], [0, 1], default=2).astype(np.int8)
 
-    df["periodo"] = df["periodo"].astype(str)
 
-    event_col = next(
-        (c for c in df.columns if c.lower() in ["event", "evento", "type"]),
-        None
-    )
+def carriles_por_y(y: pd.Series) -> np.ndarray:
+    return np.asarray(CARRILES, dtype=object)[_codigos_carril(y)]
 
-    if not event_col:
-        raise HTTPException(status_code=422, detail="Columna de eventos no encontrada")
 
-    df[event_col] = df[event_col].astype(str)
+def _pct(parte, total):
+    return round(int(parte) / int(total) * 100, 2) if total else 0
 
-    result = {}
 
-    for periodo in df["periodo"].dropna().unique():
-        d = df[df["periodo"] == periodo]
-        eventos = d[event_col]
+# =======================
+# CONTADORES ADITIVOS
+# =======================
+# Todo KPI se deriva de estas sumas: se pueden acumular por partido y
+# combinar entre partidos sumando, los porcentajes se calculan al final.
+CONTADORES = ["eventos", "pases", "completados", "fallidos", "perdidas", "ganadas", "progresivos", "xg"]
+DIMENSIONES = ["general", "periodo", "carril", "jugador", "tipo"]
 
-        data = {
-            "eventos": int(len(d)),
-            "pases": int(eventos.str.contains("pase|centro|asistencia", case=False, na=False).sum()),
-            "tiros": int(eventos.str.contains("shot|tiro|remate", case=False, na=False).sum()),
-            "goles": int(eventos.str.contains(r"\b(?:goal|gol)\b", case=False, na=False, regex=True).sum()),
-        }
 
-        if "xg" in d.columns:
-            data["xg_total"] = float(pd.to_numeric(d["xg"], errors="coerce").fillna(0).sum())
-        else:
-            data["xg_total"] = 0.0
+def _contadores_por_fila(df: pd.DataFrame, eventos: pd.Series) -> pd.DataFrame:
+    mask = clasificar_eventos(eventos)
+    es_pase = (mask & PASE) != 0
 
-        result[periodo] = data
+    if {"x", "x2"}.issubset(df.columns):
+        progresivo = es_pase & ((df["x2"] - df["x"]) > 15).to_numpy()
+    else:
+        progresivo = np.zeros(len(df), dtype=bool)
 
-    return result
+    if "xg" in df.columns:
+        xg = pd.to_numeric(df["xg"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    else:
+        xg = np.zeros(len(df))
+
+    return pd.DataFrame(
+        {
+            "eventos": np.ones(len(mask), dtype=np.int64),
+            "pases": es_pase,
+            "completados": es_pase & ((mask & PASE_EXITOSO) != 0),
+            "fallidos": es_pase & ((mask & PASE_FALLIDO) != 0),
+            "perdidas": (mask & PERDIDA) != 0,
+            "ganadas": (mask & JUGADA_GANADA) != 0,
+            "progresivos": progresivo,
+            "xg": xg,
+        },
+        index=df.index
+    )
 
 
-def calcular_kpis(df):
-    df = df.copy()
-    event_col = next(
-        (c for c in df.columns if c.lower() in ["event", "evento", "type"]),
-        None
+def _bloque(dimension: str, sumas: pd.DataFrame) -> pd.DataFrame:
+    sumas = sumas.reset_index()
+    sumas.columns = ["clave"] + list(sumas.columns[1:])
+    sumas.insert(0, "dimension", dimension)
+    sumas.insert(2, "subclave", "")
+    return sumas
+
+
+def _bloques_jugador(df: pd.DataFrame, eventos: pd.Series, filas: pd.DataFrame) -> list[pd.DataFrame]:
+    """
+    Bloques "jugador" y "tipo" con una sola factorización de id_jugador:
+    sumas por np.bincount, primer nombre/imagen por posición y el crosstab
+    jugador × etiqueta sobre códigos (el lower() se aplica solo a las
+    etiquetas distintas, no a cada fila).
+    """
+    codigos, ids = pd.factorize(df["id_jugador"], sort=True)
+    validos = codigos >= 0
+    cod = codigos[validos]
+    n_jug = len(ids)
+    ids = np.asarray(ids).astype(np.int64)
+
+    sumas = {
+        c: np.bincount(cod, weights=filas[c].to_numpy(dtype=float)[validos], minlength=n_jug)
+        for c in CONTADORES if c != "xg"
+    }
+    # xG: bincount suma en otro orden y cambia el último bit. Se suma cada
+    # jugador sobre sus filas contiguas (en el orden original), como el
+    # d["xg"].sum() por grupo de la respuesta de siempre
+    orden = np.argsort(cod, kind="stable")
+    xg = filas["xg"].to_numpy(dtype=float)[validos][orden]
+    cortes = np.flatnonzero(np.diff(cod[orden])) + 1
+    sumas["xg"] = np.array([p.sum() for p in np.split(xg, cortes)]) if n_jug else np.zeros(0)
+    jugadores = pd.DataFrame(
+        {c: v if c == "xg" else v.astype(np.int64) for c, v in sumas.items()},
+        index=pd.Index(ids, name="id_jugador"),
     )
 
+    # Primer valor de cada jugador (mismo criterio que .iloc[0] por grupo)
+    _, primera = np.unique(cod, return_index=True)
+    posiciones = np.flatnonzero(validos)[primera]
+    for col, faltante in (("jugador", "Desconocido"), ("imagen_jugador", "")):
+        jugadores[col] = df[col].to_numpy()[posiciones] if col in df.columns else faltante
+
+    # Crosstab jugador × etiqueta (minúsculas) por códigos
+    cat = eventos.array
+    minusculas = pd.Series(cat.categories, dtype=object).str.lower()
+    cod_min, etiquetas = pd.factorize(minusculas)
+    etiqueta = np.where(cat.codes >= 0, np.append(cod_min, -1)[cat.codes], -1)
+
+    ok = validos & (etiqueta >= 0)
+    n_et = len(etiquetas)
+    celda = codigos[ok] * n_et + etiqueta[ok]
+    conteo = np.bincount(celda, minlength=n_jug * n_et)
+    # Por jugador, las etiquetas en orden de primera aparición (el orden en
+    # que value_counts deja los empates); construir_kpis lo conserva
+    celdas = pd.unique(celda)
+    if n_et:
+        celdas = celdas[np.argsort(celdas // n_et, kind="stable")]
+
+    tipos = pd.DataFrame({
+        "dimension": "tipo",
+        "clave": ids[celdas // n_et] if n_et else np.array([], dtype=np.int64),
+        "subclave": np.asarray(etiquetas, dtype=object)[celdas % n_et] if n_et else np.array([], dtype=object),
+        "eventos": conteo[celdas],
+    })
+
+    return [_bloque("jugador", jugadores), tipos]
+
+
+def contadores_kpi(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Contadores aditivos de un conjunto de eventos, en formato largo:
+    dimension | clave | subclave | eventos | pases | ... | xg
+
+    Las filas "jugador" llevan además jugador/imagen_jugador (primer valor).
+    """
+    event_col = detectar_columna_evento(df)
+
     if not event_col:
         raise HTTPException(status_code=422, detail="Columna de eventos no encontrada")
 
-    df_1t = df[df["periodo"].str.contains("1", case=False, na=False)]
-
-
-    df_sin_1t = df[~df.index.isin(df_1t.index)]
-  
-
-    # =======================
-    # DEFINICIONES (ÚNICAS Y CORRECTAS)
-    # =======================
-    es_pase = df[event_col].str.contains("Pase|Centro|Asistencia", case=False, na=False)
-
-    pase_exitoso = df[event_col].str.contains(
-        "Pase completo|Pase entre lineas|Pase filtrado|Centro completo|Asistencia",
-        case=False,
-        na=False,
-        regex=True
-    )
+    # Una sola factorización de la columna de eventos para todo el cálculo
+    eventos = df[event_col].astype("category")
+    filas = _contadores_por_fila(df, eventos)
+    bloques = [_bloque("general", filas.sum().to_frame().T.assign(clave="").set_index("clave"))]
 
-    pase_fallido = df[event_col].str.contains(
-        "Pase incompleto|Centro incompleto",
-        case=False,
-        na=False,
-        regex=True
-    )
+    bloques.append(_bloque("periodo", filas.groupby(df["periodo"], observed=True).sum()))
 
-    perdida_total = df[event_col].str.contains(
-        "Pase incompleto|Centro incompleto|Balon aereo perdido|Duelo perdido|Regate fallido",
-        case=False,
-        na=False,
-        regex=True
-    )
+    if "y" in df.columns:
+        # Agrupar por código (int8) y poner la etiqueta después
+        por_carril = filas.groupby(_codigos_carril(df["y"])).sum()
+        por_carril.index = pd.Index([CARRILES[i] for i in por_carril.index], name="carril")
+        bloques.append(_bloque("carril", por_carril))
 
+    bloques.extend(_bloques_jugador(df, eventos, filas))
 
-    jugada_ganada = df[event_col].str.contains(
-        "Pase completo|Pase entre lineas|Pase filtrado|Centro completo|Asistencia|Balon aereo ganado|Duelo ganado|Tiro|Remate|Gol",
-        case=False,
-        na=False,
-        regex=True
-    )
+    cont = pd.concat(bloques, ignore_index=True)
+    cont[CONTADORES] = cont[CONTADORES].fillna(0)
+    return cont
 
-    # =======================
-    # GENERAL
-    # =======================
-    total_eventos = len(df)
-    pases = df[es_pase]
-    pases_completados = df[es_pase & pase_exitoso]
-    pases_fallidos = df[es_pase & pase_fallido]
 
+def construir_kpis(cont: pd.DataFrame) -> dict:
+    """
+    Deriva el JSON de KPIs (porcentajes incluidos) a partir de contadores
+    aditivos, ya sean de un solo upload o sumados para toda la temporada.
+    """
     result = {
-        "general": {
-            "eventos": int(total_eventos),
-            "pases_totales": int(len(pases)),
-            "pases_completados": int(len(pases_completados)),
-            "pct_pase_completado": round(len(pases_completados) / len(pases) * 100, 2) if len(pases) else 0,
-            "pct_pase_perdido": round(len(pases_fallidos) / len(pases) * 100, 2) if len(pases) else 0,
-            "pct_perdidas_totales": round(len(df[perdida_total]) / total_eventos * 100, 2) if total_eventos else 0,
-            "pct_jugadas_ganadas": round(
-                len(df[jugada_ganada]) / (len(df[jugada_ganada]) + len(df[perdida_total])) * 100, 2
-            ) if (len(df[jugada_ganada]) + len(df[perdida_total])) else 0,
-        },
+        "general": {},
         "por_periodo": {},
         "por_carril": {},
         "por_jugador": {},
         "pases_progresivos": {}
     }
 
+    bloques = {dim: d for dim, d in cont.groupby("dimension", sort=False)}
+    vacio = pd.DataFrame(columns=cont.columns)
+
     # =======================
-    # POR PERIODO
+    # GENERAL
     # =======================
-    for periodo, d in df.groupby("periodo"):
-        es_p = d[event_col].str.contains("Pase|Centro|Asistencia", case=False, na=False)
-        ex = d[event_col].str.contains(
-            "Pase completo|Pase entre lineas|Pase filtrado|Centro completo|Asistencia",
-            case=False,
-            na=False,
-            regex=True
-        )
-        fa = d[event_col].str.contains(
-            "Pase incompleto|Centro incompleto",
-            case=False,
-            na=False,
-            regex=True
-        )
-
-        pases_p = d[es_p]
+    gen = bloques.get("general", vacio)
+    g = gen[CONTADORES].sum() if not gen.empty else pd.Series(0, index=CONTADORES)
+    result["general"] = {
+        "eventos": int(g["eventos"]),
+        "pases_totales": int(g["pases"]),
+        "pases_completados": int(g["completados"]),
+        "pct_pase_completado": _pct(g["completados"], g["pases"]),
+        "pct_pase_perdido": _pct(g["fallidos"], g["pases"]),
+        "pct_perdidas_totales": _pct(g["perdidas"], g["eventos"]),
+        "pct_jugadas_ganadas": _pct(g["ganadas"], g["ganadas"] + g["perdidas"]),
+    }
 
+    # =======================
+    # POR PERIODO
+    # =======================
+    periodos = bloques.get("periodo", vacio)
+    for periodo, c in periodos.groupby("clave")[CONTADORES].sum().iterrows():
         result["por_periodo"][periodo] = {
-            "eventos": int(len(d)),          # ← ESTO FALTABA
-            "pases": int(len(pases_p)),
-            "pct_completado": round(len(d[es_p & ex]) / len(pases_p) * 100, 2) if len(pases_p) else 0,
-            "pct_perdida": round(len(d[es_p & fa]) / len(pases_p) * 100, 2) if len(pases_p) else 0,
+            "eventos": int(c["eventos"]),
+            "pases": int(c["pases"]),
+            "pct_completado": _pct(c["completados"], c["pases"]),
+            "pct_perdida": _pct(c["fallidos"], c["pases"]),
         }
 
-
     # =======================
     # POR JUGADOR
     # =======================
-    for jugador_id, d in df.groupby("id_jugador"):
-        result["por_jugador"][int(jugador_id)] = {
-            "jugador": d["jugador"].iloc[0] if "jugador" in d.columns else "Desconocido",
-            "imagen_jugador": d["imagen_jugador"].iloc[0] if "imagen_jugador" in d.columns else "",
-            "eventos_total": int(len(d)),
-            "eventos_por_tipo": d[event_col].str.lower().value_counts().to_dict(),
-            "xg": float(d["xg"].sum()) if "xg" in d.columns else 0.0,
-        }
+    jugadores = bloques.get("jugador", vacio)
+    tipos = bloques.get("tipo", vacio)
+
+    por_tipo = {}
+    if not tipos.empty:
+        # Orden final: más frecuente primero; los empates quedan en el orden
+        # de llegada (primera aparición), como value_counts
+        t = tipos.groupby(["clave", "subclave"], sort=False)["eventos"].sum().reset_index()
+        t = t.sort_values(["clave", "eventos"], ascending=[True, False], kind="stable")
+        claves = t["clave"].to_numpy(dtype=np.int64)
+        cortes = np.flatnonzero(np.diff(claves)) + 1
+        for bloque_c, bloque_s, bloque_n in zip(
+            np.split(claves, cortes),
+            np.split(t["subclave"].to_numpy(dtype=object), cortes),
+            np.split(t["eventos"].to_numpy(dtype=np.int64), cortes),
+        ):
+            por_tipo[int(bloque_c[0])] = dict(zip(bloque_s.tolist(), bloque_n.tolist()))
+
+    if not jugadores.empty:
+        jug = jugadores.groupby("clave").agg(
+            {**{c: "sum" for c in CONTADORES}, "jugador": "first", "imagen_jugador": "first"}
+        )
+        jug.index = jug.index.astype(np.int64)
+        jug = jug.sort_index()
+
+        # Armado del dict solo aquí (frontera de serialización), por columnas
+        for jugador_id, nombre, imagen, eventos, xg in zip(
+            jug.index.tolist(),
+            jug["jugador"].tolist(),
+            jug["imagen_jugador"].tolist(),
+            jug["eventos"].astype(np.int64).tolist(),
+            jug["xg"].astype(float).tolist(),
+        ):
+            result["por_jugador"][jugador_id] = {
+                "jugador": nombre,
+                "imagen_jugador": imagen,
+                "eventos_total": eventos,
+                "eventos_por_tipo": por_tipo.get(jugador_id, {}),
+                "xg": xg,
+            }
 
-    # =======================
-    # PASES PROGRESIVOS
-    # =======================
-    if {"x", "x2", "id_jugador"}.issubset(df.columns):
-        progresivos = df[es_pase & ((df["x2"] - df["x"]) > 15)]
-        ranking = progresivos.groupby("id_jugador").size().sort_values(ascending=False).head(10)
+        # =======================
+        # PASES PROGRESIVOS
+        # =======================
+        progresivos = jug.loc[jug["progresivos"] > 0, "progresivos"].astype(np.int64)
+        ranking = progresivos.sort_values(ascending=False).head(10)
         result["pases_progresivos"] = {int(k): int(v) for k, v in ranking.items()}
 
     # =======================
     # CARRILES
     # =======================
-    if "y" in df.columns:
-        df["carril"] = df["y"].apply(carril_por_y)
-
-  
-        for carril, d in df.groupby("carril"):
-            es_p = d[event_col].str.contains("Pase|Centro|Asistencia", case=False, na=False)
-
-            ex = d[event_col].str.contains(
-                "Pase completo|Pase entre lineas|Pase filtrado|Centro completo|Asistencia",
-                case=False,
-                na=False,
-                regex=True
-            )
-
-            fa = d[event_col].str.contains(
-                "Pase incompleto|Centro incompleto|Balon aereo perdido|Duelo perdido|Regate fallido",
-                case=False,
-                na=False,
-                regex=True
-            )
-
-            pases_c = d[es_p]
-            perdidas = d[fa]
-
-            result["por_carril"][carril] = {
-                "pct_completado": round(
-                    len(d[es_p & ex]) / len(pases_c) * 100, 2
-                ) if len(pases_c) else 0,
-                "pct_perdida": round(
-                    len(d[es_p & d[event_col].str.contains(
-                        "Pase incompleto|Centro incompleto",
-                        case=False,
-                        na=False,
-                        regex=True
-                    )]) / len(pases_c) * 100, 2
-                ) if len(pases_c) else 0,
-            }
+    carriles = bloques.get("carril", vacio)
+    for carril, c in carriles.groupby("clave")[CONTADORES].sum().iterrows():
+        result["por_carril"][carril] = {
+            "pct_completado": _pct(c["completados"], c["pases"]),
+            "pct_perdida": _pct(c["fallidos"], c["pases"]),
+        }
+
+    return result
+
+
+def kpis_por_periodo(df_input: pd.DataFrame):
+    if df_input is None or df_input.empty:
+        raise HTTPException(status_code=422, detail="No hay datos para KPIs")
+
+    df = df_input.copy()
+
+    if "periodo" not in df.columns:
+        raise HTTPException(status_code=422, detail="Columna 'periodo' no encontrada")
 
+    df["periodo"] = df["periodo"].astype(str)
+
+    event_col = next(
+        (c for c in df.columns if c.lower() in ["event", "evento", "type"]),
+        None
+    )
+
+    if not event_col:
+        raise HTTPException(status_code=422, detail="Columna de eventos no encontrada")
+
+    df[event_col] = df[event_col].astype(str)
+
+    result = {}
+
+    for periodo in df["periodo"].dropna().unique():
+        d = df[df["periodo"] == periodo]
+        eventos = d[event_col]
+
+        data = {
+            "eventos": int(len(d)),
+            "pases": int(eventos.str.contains("pase|centro|asistencia", case=False, na=False).sum()),
+            "tiros": int(eventos.str.contains("shot|tiro|remate", case=False, na=False).sum()),
+            "goles": int(eventos.str.contains(r"\b(?:goal|gol)\b", case=False, na=False, regex=True).sum()),
+        }
+
+        if "xg" in d.columns:
+            data["xg_total"] = float(pd.to_numeric(d["xg"], errors="coerce").fillna(0).sum())
+        else:
+            data["xg_total"] = 0.0
+
+        result[periodo] = data
 
     return result
+
+
+@medido("kpis")
+def calcular_kpis(df):
+    return construir_kpis(contadores_kpi(df))
@@ -0,0 +1,238 @@
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.metricas import medido
+from app.models.user_file import UserFile
+from app.services.upload_cache import load_stats_cached, clave_upload
+from app.services.dataset_service import dataset_de_archivo, leer_dataset
+from app.services.stats_service import merge_stats_with_players, filter_stats_by_equipo
+from app.services.kpi_service import calcular_kpis, detectar_columna_evento
+from app.services.kpi_agregado_service import guardar_partido, guardar_partido_stream, kpis_temporada
+from app.services.evento_service import cargar_eventos
+from app.services.posesion_service import analizar_posesiones
+from app.services.xt_service import asignar_xt, modelo_xt, xt_kpis
+from app.utils.stats_loader import ESQUEMA_KPI, a_float64, iter_stats
+from app.utils.respuestas import RECORDS
+
+# ─────────────────────────────
+# Pipelines de upload: load_stats → merge → KPIs
+# ─────────────────────────────
+# Funciones síncronas y autocontenidas (solo reciben bytes/rutas y una
+# sesión) para poder ejecutarlas tanto en el request como en un worker.
+
+
+def procesar_datos_kpi(db, equipo_id, df_input=None, formato: str = RECORDS):
+    filtered = filter_stats_by_equipo(db, df_input, equipo_id)
+
+    if filtered is None or (isinstance(filtered, pd.DataFrame) and filtered.empty):
+        return None
+
+    kpis = calcular_kpis(filtered)
+    return {**kpis, "eventos": eventos_payload(filtered, formato)}
+
+
+def _codificar(serie: pd.Series) -> dict:
+    # Columna de texto → códigos int32 (-1 = vacío) + etiquetas únicas
+    codigos, etiquetas = pd.factorize(serie)
+    return {"codigos": codigos.astype(np.int32), "etiquetas": [str(e) for e in etiquetas]}
+
+
+def eventos_columnas(filtered) -> dict:
+    """
+    Mismos eventos que eventos_payload pero por columnas: x, y, x2, y2 como
+    arreglos float y el evento como {"codigos", "etiquetas"}.
+    """
+    if filtered is None or filtered.empty:
+        return {}
+
+    salida = {
+        c: a_float64(filtered[c]).fillna(0).to_numpy(dtype=np.float64)
+        for c in ["x", "y", "x2", "y2", "xt"]
+        if c in filtered.columns
+    }
+
+    event_col = detectar_columna_evento(filtered)
+    if event_col:
+        salida["evento"] = _codificar(filtered[event_col])
+
+    return salida
+
+
+def _fechas(serie: pd.Series) -> list:
+    # ISO 8601 y null para NaT (orjson no serializa datetime64 NaT)
+    texto = serie.map(lambda t: t.isoformat(), na_action="ignore")
+    return texto.astype(object).where(serie.notna(), None).tolist()
+
+
+def tabla_columnas(df: pd.DataFrame) -> dict:
+    """
+    Cualquier DataFrame por columnas; las de texto van codificadas y las
+    fechas como texto ISO 8601 (null si falta).
+    """
+    salida = {}
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            salida[str(col)] = _fechas(serie)
+        elif pd.api.types.is_numeric_dtype(serie):
+            salida[str(col)] = serie.to_numpy()
+        else:
+            salida[str(col)] = _codificar(serie)
+    return salida
+
+
+@medido("eventos")
+def eventos_payload(filtered, formato: str = RECORDS):
+    if formato != RECORDS:
+        return eventos_columnas(filtered)
+
+    if filtered is None or filtered.empty:
+        return []
+
+    event_col = detectar_columna_evento(filtered)
+    columnas = ["x", "y", "x2", "y2", "xt"]
+    if event_col:
+        columnas.append(event_col)
+
+    cols_to_use = [c for c in columnas if c in filtered.columns]
+    # float32 / categorías del esquema compacto → tipos planos antes de serializar.
+    # El evento siempre sale como "event" (lo que lee el frontend), venga de
+    # la planilla o de la tabla eventos (columna "evento")
+    salida = pd.DataFrame({
+        ("event" if c == event_col else c): (
+            a_float64(filtered[c]) if c != event_col else filtered[c].astype(object)
+        )
+        for c in cols_to_use
+    })
+    return salida.fillna(0).to_dict("records")
+
+
+@medido("xt")
+def agregar_xt(df, equipo_id: int):
+    """
+    Columna xt por evento (si hay modelo ajustado) y rankings de xT.
+    Devuelve None cuando aún no hay modelo (ver app.scripts.ajustar_xt).
+    """
+    modelo = modelo_xt()
+    if modelo is None or df is None:
+        return None
+
+    if not df.empty:
+        df["xt"] = asignar_xt(df, modelo)
+    return xt_kpis(df, equipo_id, modelo)
+
+
+def kpis_desde_upload(
+    db: Session,
+    data: bytes,
+    suffix: str,
+    filename: str | None,
+    equipo_id: int,
+    formato: str = RECORDS,
+):
+    # Cargar Excel (o reutilizar el parseo si ya se subió antes): solo las
+    # columnas que usan los KPIs, con tipos compactos
+    df = load_stats_cached(data, suffix, ESQUEMA_KPI)
+
+    merged = merge_stats_with_players(db, df)
+    guardar_partido(db, merged, clave_upload(data, suffix), filename=filename)
+
+    return _kpis_partido(db, merged, equipo_id, formato)
+
+
+def kpis_desde_dataset(
+    db: Session,
+    user_file_id: int,
+    equipo_id: int,
+    formato: str = RECORDS,
+):
+    """
+    KPIs de un archivo ya guardado (save_file) desde su dataset Parquet:
+    solo las columnas del esquema KPI, sin reparsear el Excel.
+    """
+    record = db.get(UserFile, user_file_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    df = leer_dataset(dataset_de_archivo(db, record), ESQUEMA_KPI)
+    return _kpis_partido(db, merge_stats_with_players(db, df), equipo_id, formato)
+
+
+def _kpis_partido(db: Session, merged, equipo_id: int, formato: str):
+    # xT sobre el partido completo: ranking de ambos equipos
+    xt = agregar_xt(merged, equipo_id)
+    resultado = procesar_datos_kpi(db, equipo_id, df_input=merged, formato=formato)
+
+    if not resultado:
+        raise HTTPException(status_code=422, detail="No hay datos para este equipo")
+
+    resultado["xt"] = xt
+
+    # Posesiones sobre el partido completo (el corte depende del rival)
+    resultado["posesiones"] = analizar_posesiones(merged, equipo_id)
+    return resultado
+
+
+def kpis_desde_archivo_stream(
+    db: Session,
+    path: str,
+    clave: str,
+    filename: str | None,
+    equipo_id: int,
+    incluir_eventos: bool = False,
+    progreso=None,
+    formato: str = RECORDS,
+):
+    """
+    Lectura por bloques y KPIs desde los contadores aditivos del partido:
+    el archivo nunca está entero en memoria. Las posesiones (y los eventos,
+    si se piden) se calculan después sobre los eventos ya guardados en la
+    tabla eventos.
+    """
+    def bloques():
+        for b in iter_stats(path, progreso=progreso, esquema=ESQUEMA_KPI):
+            merged = merge_stats_with_players(db, b)
+            yield merged
+            if progreso is not None:
+                progreso["filas_procesadas"] = progreso.get("filas_procesadas", 0) + len(merged)
+
+    partido = guardar_partido_stream(db, bloques(), clave, filename=filename)
+
+    kpis = kpis_temporada(db, equipo_id, partido_ids=[partido.id])
+    if not kpis:
+        raise HTTPException(status_code=422, detail="No hay datos para este equipo")
+
+    # Partido guardado completo (ambos equipos), como en _kpis_partido:
+    # el ranking de xT y el corte de posesiones dependen del rival
+    df_partido = cargar_eventos(db, partido_id=partido.id)
+    xt = agregar_xt(df_partido, equipo_id)
+
+    eventos = [] if formato == RECORDS else {}
+    if incluir_eventos:
+        # Solo los del equipo (ya con la columna xt si hay modelo)
+        df_equipo = df_partido[df_partido["equipo_id"] == equipo_id].reset_index(drop=True)
+        eventos = eventos_payload(df_equipo, formato)
+
+    # En el orden del archivo, sin columna de minuto
+    posesiones = analizar_posesiones(df_partido, equipo_id)
+
+    return {**kpis, "eventos": eventos, "xt": xt, "posesiones": posesiones}
+
+
+def stats_desde_upload(
+    db: Session,
+    data: bytes,
+    suffix: str,
+    equipo_id: int | None = None,
+    formato: str = RECORDS,
+):
+    df = load_stats_cached(data, suffix)
+    # El filtro por equipo se aplica antes de enriquecer
+    merged = merge_stats_with_players(db, df, equipo_id=equipo_id)
+
+    if formato != RECORDS:
+        return {"filas": len(merged), "columnas": tabla_columnas(merged)}
+
+    return merged.fillna("").to_dict(orient="records")
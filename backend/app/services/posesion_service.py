@@ -0,0 +1,244 @@
+import numpy as np
+import pandas as pd
+
+from app.core.metricas import medido
+from app.services.kpi_service import (
+    PASE,
+    PASE_EXITOSO,
+    PERDIDA,
+    TIRO,
+    clasificar_eventos,
+    detectar_columna_evento,
+)
+
+# ─────────────────────────────
+# Posesiones y ventanas móviles
+# ─────────────────────────────
+# El stream de eventos (en el orden del archivo) se corta en posesiones:
+# una nueva empieza cuando cambia el equipo o el periodo, o después de una
+# pérdida (el mismo vocabulario que pct_perdidas_totales). Todo sale de
+# shift/cumsum y np.bincount sobre el id de posesión: sin loops por evento.
+COLUMNAS_MINUTO = ["minuto", "minute", "min"]
+
+# Con columna de minuto: ventana de 5' evaluada minuto a minuto.
+# Sin ella el reloj es el orden de los eventos: 50 eventos, cada 10.
+VENTANA_MINUTOS = 5
+VENTANA_EVENTOS = 50
+PASO_EVENTOS = 10
+
+COLUMNAS_SECUENCIA = [
+    "posesion", "equipo_id", "periodo", "inicio", "eventos", "pases",
+    "pases_completados", "progresion", "xg", "termina_en_tiro",
+]
+
+
+def detectar_columna_minuto(df: pd.DataFrame):
+    return next((c for c in df.columns if c.lower() in COLUMNAS_MINUTO), None)
+
+
+def _numerico(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+
+
+def _etiquetas(valores) -> list:
+    # equipo_id llega como float si hay nulos; las claves salen como int
+    return [int(v) if isinstance(v, (int, float, np.integer, np.floating)) else str(v) for v in valores]
+
+
+def _preparar(df: pd.DataFrame) -> dict:
+    n = len(df)
+    event_col = detectar_columna_evento(df)
+    bits = clasificar_eventos(df[event_col]) if event_col else np.zeros(n, dtype=np.uint8)
+
+    equipos = df["equipo_id"] if "equipo_id" in df.columns else pd.Series(0, index=df.index)
+    cod_equipo, equipos = pd.factorize(equipos)
+    if "periodo" in df.columns:
+        cod_periodo, periodos = pd.factorize(df["periodo"])
+    else:
+        cod_periodo, periodos = np.zeros(n, dtype=np.int64), ["1T"]
+
+    x, x2 = _numerico(df, "x"), _numerico(df, "x2")
+    xg = np.nan_to_num(_numerico(df, "xg"))
+
+    es_pase = (bits & PASE) != 0
+    # Progresión: avance x → x2 de los pases con ambas coordenadas
+    avance = np.where(es_pase & np.isfinite(x) & np.isfinite(x2), x2 - x, 0.0)
+
+    return {
+        "n": n,
+        "bits": bits,
+        "equipo": cod_equipo,
+        "equipos": _etiquetas(equipos),
+        "periodo": cod_periodo,
+        "periodos": [str(p) for p in periodos],
+        "es_pase": es_pase,
+        "completado": es_pase & ((bits & PASE_EXITOSO) != 0),
+        "avance": avance,
+        "xg": xg,
+    }
+
+
+def _cortes(p: dict) -> np.ndarray:
+    # True donde empieza una posesión (comparación con el evento anterior)
+    n = p["n"]
+    corte = np.ones(n, dtype=bool)
+    if n > 1:
+        perdida = (p["bits"] & PERDIDA) != 0
+        corte[1:] = (
+            (p["equipo"][1:] != p["equipo"][:-1])
+            | (p["periodo"][1:] != p["periodo"][:-1])
+            | perdida[:-1]
+        )
+    return corte
+
+
+def segmentar_posesiones(df: pd.DataFrame) -> np.ndarray:
+    """Id de posesión (0..P-1) por evento, en el orden del DataFrame."""
+    return np.cumsum(_cortes(_preparar(df))) - 1
+
+
+def _secuencias(p: dict) -> pd.DataFrame:
+    if p["n"] == 0:
+        return pd.DataFrame(columns=COLUMNAS_SECUENCIA)
+
+    corte = _cortes(p)
+    posesion = np.cumsum(corte) - 1
+    inicios = np.flatnonzero(corte)
+    finales = np.append(inicios[1:], p["n"]) - 1
+    total = len(inicios)
+
+    def suma(valores):
+        return np.bincount(posesion, weights=valores, minlength=total)
+
+    cod_equipo = p["equipo"][inicios]
+    return pd.DataFrame({
+        "posesion": np.arange(total),
+        "equipo_id": pd.Series([p["equipos"][c] if c >= 0 else None for c in cod_equipo], dtype=object),
+        "periodo": np.asarray(p["periodos"], dtype=object)[p["periodo"][inicios]],
+        "inicio": inicios,
+        "eventos": np.diff(np.append(inicios, p["n"])),
+        "pases": suma(p["es_pase"]).astype(np.int64),
+        "pases_completados": suma(p["completado"]).astype(np.int64),
+        "progresion": suma(p["avance"]).round(2),
+        "xg": suma(p["xg"]).round(3),
+        "termina_en_tiro": (p["bits"][finales] & TIRO) != 0,
+    })
+
+
+def secuencias_posesion(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Una fila por posesión: equipo, periodo, fila de inicio, eventos,
+    pases, progresión (suma de x2 - x de los pases), xG y si termina en tiro.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=COLUMNAS_SECUENCIA)
+    return _secuencias(_preparar(df))
+
+
+def _resumen(sec: pd.DataFrame) -> dict:
+    resumen = {}
+    conocidas = sec[sec["equipo_id"].notna()]
+    for equipo, s in conocidas.groupby("equipo_id", sort=True):
+        tiros = int(s["termina_en_tiro"].sum())
+        resumen[equipo] = {
+            "posesiones": int(len(s)),
+            "eventos_promedio": round(float(s["eventos"].mean()), 2),
+            "progresion_promedio": round(float(s["progresion"].mean()), 2),
+            "terminan_en_tiro": tiros,
+            "pct_terminan_en_tiro": round(tiros / len(s) * 100, 2),
+            "xg": round(float(s["xg"].sum()), 3),
+        }
+    return resumen
+
+
+def _ventana_movil(matriz: np.ndarray, k: int) -> np.ndarray:
+    # Suma de los últimos k slots por fila: cumsum menos cumsum desplazado
+    acumulado = np.cumsum(matriz, axis=1)
+    desplazado = np.zeros_like(acumulado)
+    desplazado[:, k:] = acumulado[:, :-k]
+    return acumulado - desplazado
+
+
+def _curvas(df: pd.DataFrame, p: dict, ventana: int | None, paso: int | None) -> dict:
+    col_minuto = detectar_columna_minuto(df)
+    if col_minuto:
+        unidad, t = "minuto", _numerico(df, col_minuto)
+        paso, ventana = paso or 1, ventana or VENTANA_MINUTOS
+    else:
+        unidad, t = "evento", np.arange(p["n"], dtype=float)
+        paso, ventana = paso or PASO_EVENTOS, ventana or VENTANA_EVENTOS
+
+    ok = np.isfinite(t) & (t >= 0) & (p["equipo"] >= 0)
+    if not ok.any():
+        return {"unidad": unidad, "paso": paso, "ventana": ventana, "t": [], "por_equipo": {}}
+
+    slot = np.zeros(p["n"], dtype=np.int64)
+    slot[ok] = (t[ok] // paso).astype(np.int64)
+    n_slots = int(slot[ok].max()) + 1
+    n_equipos = len(p["equipos"])
+    k = max(1, ventana // paso)
+
+    # Matriz equipo × slot por métrica, con un solo bincount cada una
+    celda = p["equipo"][ok] * n_slots + slot[ok]
+
+    def movil(valores):
+        m = np.bincount(celda, weights=valores[ok], minlength=n_equipos * n_slots)
+        return _ventana_movil(m.reshape(n_equipos, n_slots), k)
+
+    xg = movil(p["xg"])
+    pases = movil(p["es_pase"].astype(float))
+    completados = movil(p["completado"].astype(float))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = np.where(pases > 0, np.round(completados / pases * 100, 2), 0.0)
+
+    return {
+        "unidad": unidad,
+        "paso": paso,
+        "ventana": ventana,
+        # Fin de cada slot: el punto i resume (t[i] - ventana, t[i]]
+        "t": ((np.arange(n_slots) + 1) * paso).tolist(),
+        "por_equipo": {
+            equipo: {
+                "xg": np.round(xg[i], 3).tolist(),
+                "pases": pases[i].astype(np.int64).tolist(),
+                "pct_pase_completado": pct[i].tolist(),
+            }
+            for i, equipo in enumerate(p["equipos"])
+        },
+    }
+
+
+@medido("posesiones")
+def analizar_posesiones(
+    df: pd.DataFrame,
+    equipo_id: int | None = None,
+    ventana: int | None = None,
+    paso: int | None = None,
+    incluir_secuencias: bool = True,
+) -> dict:
+    """
+    Posesiones, resumen por equipo y curvas móviles de xG / % de pase de
+    un partido completo (ambos equipos: el corte depende del rival).
+    Con `equipo_id` solo se devuelven las secuencias y curvas de ese equipo.
+    """
+    if df is None or df.empty:
+        return {"total": 0, "por_equipo": {}, "secuencias": [], "curvas": {}}
+
+    p = _preparar(df)
+    sec = _secuencias(p)
+    curvas = _curvas(df, p, ventana, paso)
+
+    if equipo_id is not None:
+        sec = sec[sec["equipo_id"] == equipo_id]
+        curvas["por_equipo"] = {
+            k: v for k, v in curvas["por_equipo"].items() if k == equipo_id
+        }
+
+    return {
+        "total": int(len(sec)),
+        "por_equipo": _resumen(sec),
+        "secuencias": sec.to_dict("records") if incluir_secuencias else [],
+        "curvas": curvas,
+    }
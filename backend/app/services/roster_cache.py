@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import ROSTER_CACHE_TTL_SECONDS
+from app.core.metricas import medido
+from app.models.equipo import Equipo
+from app.models.jugador import Jugador
+
+# ─────────────────────────────
+# Caché de plantilla (jugadores + logo del equipo)
+# ─────────────────────────────
+# La plantilla casi no cambia entre seeds: se carga una vez por proceso
+# con un solo SELECT y se reutiliza en cada upload.
+# load_excel llama invalidar_plantilla() al escribir; los otros procesos
+# (workers de cómputo) la recargan al vencer ROSTER_CACHE_TTL_SECONDS.
+COLUMNAS = ["player_id", "jugador", "imagen_jugador", "equipo_id", "logo_equipo"]
+
+_lock = threading.Lock()
+_version = 0
+_cache = None  # (version, cargado_en, DataFrame)
+
+
+def invalidar_plantilla():
+    global _version, _cache
+
+    with _lock:
+        _version += 1
+        _cache = None
+
+
+def version_plantilla() -> int:
+    with _lock:
+        return _version
+
+
+def _vigente(entrada) -> bool:
+    version, cargado_en, _ = entrada
+    if version != _version:
+        return False
+    return ROSTER_CACHE_TTL_SECONDS <= 0 or time.time() - cargado_en <= ROSTER_CACHE_TTL_SECONDS
+
+
+@medido("plantilla")
+def _cargar(db: Session) -> pd.DataFrame:
+    filas = db.execute(
+        select(
+            Jugador.id,
+            Jugador.nombre,
+            Jugador.imagen_url,
+            Jugador.equipo_id,
+            Equipo.logo_url,
+        )
+        .outerjoin(Equipo, Equipo.id == Jugador.equipo_id)
+        .order_by(Jugador.id)
+    ).all()
+
+    df = pd.DataFrame(filas, columns=COLUMNAS)
+
+    # Tipos compactos: ids int32 y textos repetidos como categorías
+    return df.astype({
+        "player_id": "int32",
+        "equipo_id": "int32",
+        "jugador": "category",
+        "imagen_jugador": "category",
+        "logo_equipo": "category",
+    })
+
+
+def plantilla(db: Session) -> pd.DataFrame:
+    """
+    DataFrame compartido de la plantilla (no modificar en sitio), ordenado
+    por player_id. Columnas: player_id, jugador, imagen_jugador, equipo_id,
+    logo_equipo.
+    """
+    global _cache
+
+    with _lock:
+        entrada = _cache
+        if entrada is not None and _vigente(entrada):
+            return entrada[2]
+        version = _version
+
+    df = _cargar(db)
+
+    with _lock:
+        # Si alguien invalidó mientras leíamos, no guardar datos viejos
+        if version == _version:
+            _cache = (version, time.time(), df)
+
+    return df
@@ -0,0 +1,147 @@
+import threading
+import time
+
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+
+from app.core.config import SEED_ON_STARTUP
+from app.db.session import SessionLocal
+from app.models.equipo import Equipo
+from app.models.kpi_materializado import KpiMaterializado
+from app.models.partido import Partido
+
+# ─────────────────────────────
+# Seed inicial fuera del arranque
+# ─────────────────────────────
+# El chequeo es una sola consulta EXISTS; solo si la base está vacía se
+# importa load_excel (pandas/openpyxl) y se leen los Excel.
+# SEED_ON_STARTUP: "background" (hilo aparte), "sync" (antes de aceptar
+# tráfico, como antes) u "off" (seed con `python -m app.scripts.load_excel --seed`).
+PENDIENTE = "pendiente"
+CARGANDO = "cargando"
+LISTO = "listo"
+ERROR = "error"
+
+_lock = threading.Lock()
+_estado = {"estado": PENDIENTE, "modo": SEED_ON_STARTUP, "error": None, "segundos": None}
+
+
+def seed_pendiente(db: Session) -> bool:
+    return db.execute(select(Equipo.id).limit(1)).first() is None
+
+
+def _marcar(**cambios):
+    with _lock:
+        _estado.update(cambios)
+
+
+def _base_con_datos() -> bool:
+    db = SessionLocal()
+    try:
+        return not seed_pendiente(db)
+    finally:
+        db.close()
+
+
+def _sembrar():
+    inicio = time.perf_counter()
+    _marcar(estado=CARGANDO, error=None)
+
+    try:
+        from app.scripts.load_excel import seed_if_empty
+        ok = seed_if_empty()
+    except Exception as e:
+        ok = False
+        print("❌ Error cargando datos:", e)
+
+    _marcar(
+        estado=LISTO if ok else ERROR,
+        error=None if ok else "El seed falló, revisa los logs",
+        segundos=round(time.perf_counter() - inicio, 3),
+    )
+
+
+def iniciar_seed():
+    """Llamado desde el startup de la API según SEED_ON_STARTUP."""
+    try:
+        if _base_con_datos():
+            _marcar(estado=LISTO)
+            return
+    except Exception as e:
+        print("❌ No se pudo verificar el seed:", e)
+        _marcar(estado=ERROR, error=str(e))
+        return
+
+    if SEED_ON_STARTUP == "sync":
+        _sembrar()
+    elif SEED_ON_STARTUP == "background":
+        threading.Thread(target=_sembrar, name="seed", daemon=True).start()
+    else:
+        print("ℹ️ Base vacía: ejecuta `python -m app.scripts.load_excel --seed`")
+
+
+def estado_seed() -> dict:
+    """
+    Estado para /ready. Si aún no está listo y nadie está cargando, vuelve
+    a consultar la base (el seed pudo correr en otro proceso).
+    """
+    with _lock:
+        estado = dict(_estado)
+
+    if estado["estado"] in (PENDIENTE, ERROR):
+        try:
+            if _base_con_datos():
+                _marcar(estado=LISTO, error=None)
+                estado.update(estado=LISTO, error=None)
+        except Exception as e:
+            estado.update(estado=ERROR, error=str(e))
+
+    return estado
+
+
+# ─────────────────────────────
+# Backfill de contadores KPI
+# ─────────────────────────────
+# Partidos guardados sin contadores materializados (anteriores a
+# kpi_agregados / kpi_materializados) se completan una vez al arrancar,
+# no en GET /kpis. Mismo modo que el seed; con "off":
+# `python -m app.scripts.materializar_kpis`.
+def _hay_pendientes() -> bool:
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(Partido.id).where(~exists().where(KpiMaterializado.partido_id == Partido.id)).limit(1)
+        ).first() is not None
+    finally:
+        db.close()
+
+
+def _materializar():
+    inicio = time.perf_counter()
+    db = SessionLocal()
+    try:
+        from app.services.kpi_agregado_service import materializar_pendientes
+        n = materializar_pendientes(db)
+        print(f"✅ Contadores KPI materializados: {n} partidos ({time.perf_counter() - inicio:.1f}s)")
+    except Exception as e:
+        db.rollback()
+        print("❌ Error materializando contadores KPI:", e)
+    finally:
+        db.close()
+
+
+def iniciar_materializacion():
+    """Llamado desde el startup de la API; solo importa pandas si hay pendientes."""
+    try:
+        if not _hay_pendientes():
+            return
+    except Exception as e:
+        print("❌ No se pudo verificar los contadores KPI:", e)
+        return
+
+    if SEED_ON_STARTUP == "sync":
+        _materializar()
+    elif SEED_ON_STARTUP == "background":
+        threading.Thread(target=_materializar, name="materializar_kpis", daemon=True).start()
+    else:
+        print("ℹ️ Hay partidos sin contadores: ejecuta `python -m app.scripts.materializar_kpis`")
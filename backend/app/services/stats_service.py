@@ -1,7 +1,8 @@
+import numpy as np
 import pandas as pd
 from sqlalchemy.orm import Session
-from app.models.jugador import Jugador
-from app.models.equipo import Equipo
+from app.core.metricas import medido
+from app.services.roster_cache import plantilla
 
 def normalize_stats(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = df.columns.str.strip().str.lower()
@@ -24,46 +25,83 @@ def sanitize_df(df: pd.DataFrame) -> pd.DataFrame:
     ]
     return df.loc[:, ~df.columns.duplicated()]
 
-def merge_stats_with_players(db: Session, df_stats: pd.DataFrame):
-    df_stats = sanitize_df(normalize_stats(df_stats))
-
-    jugadores = db.query(Jugador).all()
-    equipos = db.query(Equipo).all()
-
-    df_jug = pd.DataFrame([
-        {
-            "player_id": j.id,
-            "jugador": j.nombre,
-            "imagen_jugador": j.imagen_url,
-            "equipo_id": j.equipo_id
-        }
-        for j in jugadores
-    ])
-
-    df_eq = pd.DataFrame([
-        {
-            "equipo_id": e.id,
-            "logo_equipo": e.logo_url
-        }
-        for e in equipos
-    ])
-
-    df_jug["player_id"] = pd.to_numeric(df_jug["player_id"], errors="coerce")
-    df_jug["equipo_id"] = pd.to_numeric(df_jug["equipo_id"], errors="coerce")
-    df_eq["equipo_id"] = pd.to_numeric(df_eq["equipo_id"], errors="coerce")
-
-    result = (
-        df_stats
-        .merge(df_jug, on="player_id", how="left")
-        .merge(df_eq, on="equipo_id", how="left")
-    )
-
-    result["jugador"] = result["jugador"].fillna("Desconocido")
-    result["imagen_jugador"] = result["imagen_jugador"].fillna("")
+# Rango máximo de ids para usar la tabla densa id → posición
+_MAX_RANGO_DENSO = 4_000_000
+
+
+def _posiciones(ids: np.ndarray, player_id: pd.Series) -> np.ndarray:
+    """Posición de cada player_id en la plantilla ordenada (-1 si no está)."""
+    p = player_id.to_numpy(dtype="float64", na_value=np.nan)
+    if len(ids) == 0:
+        return np.full(len(p), -1, dtype=np.intp)
+
+    minimo, maximo = int(ids[0]), int(ids[-1])
+
+    if maximo - minimo < _MAX_RANGO_DENSO:
+        # Tabla densa: una sola lectura indexada por fila
+        tabla = np.full(maximo - minimo + 1, -1, dtype=np.intp)
+        tabla[ids - minimo] = np.arange(len(ids))
+
+        valido = (p >= minimo) & (p <= maximo)  # NaN → False
+        offset = np.where(valido, p - minimo, 0).astype(np.intp)
+        pos = tabla.take(offset)
+        # Ids no enteros (p. ej. 1001001.5) no corresponden a nadie
+        return np.where(valido & (offset + minimo == p), pos, -1)
+
+    # Ids muy dispersos: búsqueda binaria sobre la plantilla ordenada
+    pos = np.minimum(np.searchsorted(ids, p), len(ids) - 1)
+    return np.where(ids.take(pos) == p, pos, -1)
+
+
+def _tomar(col: pd.Series, pos: np.ndarray, faltante) -> np.ndarray:
+    """Gather de una columna categórica de la plantilla → array object."""
+    codigos = col.cat.codes.to_numpy()
+    # El valor faltante va al final: el código -1 lo toma con take
+    valores = np.append(np.asarray(col.cat.categories, dtype=object), [faltante])
+
+    if len(codigos) == 0:
+        return valores.take(np.full(len(pos), -1))
+
+    c = np.where(pos >= 0, codigos.take(np.maximum(pos, 0)), -1)
+    return valores.take(c)
+
+
+@medido("merge")
+def merge_stats_with_players(db: Session, df_stats: pd.DataFrame, equipo_id: int | None = None):
+    """
+    Agrega jugador, imagen_jugador, equipo_id y logo_equipo a cada evento.
+
+    Con `equipo_id`, las filas de otros equipos se descartan antes de
+    enriquecer (mismo resultado que filter_stats_by_equipo después).
+    """
+    # Copia superficial: las columnas nuevas no tocan el DataFrame de entrada
+    df_stats = sanitize_df(normalize_stats(df_stats)).copy(deep=False)
+    df_stats.index = pd.RangeIndex(len(df_stats))
+
+    # Plantilla cacheada por proceso, ordenada por id: player_id → posición
+    roster = plantilla(db)
+    pos = _posiciones(roster["player_id"].to_numpy(), df_stats["player_id"])
+
+    equipos = roster["equipo_id"].to_numpy()
+    equipo = np.where(pos >= 0, equipos.take(np.maximum(pos, 0)) if len(equipos) else 0, np.nan)
+
+    if equipo_id is not None:
+        mantener = equipo == equipo_id
+        df_stats = df_stats[mantener].copy()
+        pos = pos[mantener]
+        equipo = equipo[mantener]
+
+    result = df_stats
+    result["jugador"] = _tomar(roster["jugador"], pos, "Desconocido")
+    result["imagen_jugador"] = _tomar(roster["imagen_jugador"], pos, "")
+    # Siempre float64 (NaN si no se encontró), como salía del doble merge:
+    # /api/stats serializa 1001.0 sin importar si faltó algún jugador
+    result["equipo_id"] = equipo.astype("float64")
+    result["logo_equipo"] = _tomar(roster["logo_equipo"], pos, np.nan)
 
     if "player_id" in result.columns and "id_jugador" not in result.columns:
-        result = result.rename(columns={"player_id": "id_jugador"})
-        
+        result = result.rename(columns={"player_id": "id_jugador"}, copy=False)
+
     return result
 
 def filter_stats_by_equipo(db: Session, df_stats: pd.DataFrame, equipo_id: int):
@@ -73,5 +111,6 @@ def filter_stats_by_equipo(db: Session, df_stats: pd.DataFrame, equipo_id: int):
     if "equipo_id" not in df_stats.columns:
         return df_stats
 
-    df_stats["equipo_id"] = pd.to_numeric(df_stats["equipo_id"], errors="coerce")
+    if not pd.api.types.is_numeric_dtype(df_stats["equipo_id"]):
+        df_stats["equipo_id"] = pd.to_numeric(df_stats["equipo_id"], errors="coerce")
     return df_stats[df_stats["equipo_id"] == equipo_id]
\ No newline at end of file
@@ -0,0 +1,205 @@
+import io
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.config import TEMPORADA_MAX_PARTIDOS, TEMPORADA_MAX_MB
+from app.services.kpi_agregado_service import (
+    contadores_por_partido,
+    guardar_partido,
+    kpis_desde_contadores,
+    partido_materializado,
+)
+from app.services.kpi_service import CONTADORES
+from app.services.stats_service import merge_stats_with_players
+from app.services.upload_cache import clave_upload, load_stats_cached
+from app.utils.stats_loader import ESQUEMA_KPI
+
+# ─────────────────────────────
+# Temporada: lote de partidos → KPIs + forma
+# ─────────────────────────────
+# Cada partido se parsea y materializa en un worker del pool (en paralelo);
+# luego la temporada es la suma de sus contadores y la forma es una suma
+# móvil de los últimos N partidos. El orden del lote es el cronológico
+# (en un zip, el orden alfabético de los nombres).
+EXTENSIONES = (".xlsx", ".csv")
+MAX_BYTES = TEMPORADA_MAX_MB * 1024 * 1024
+
+
+def _sufijo(nombre: str) -> str:
+    return os.path.splitext(nombre)[1].lower()
+
+
+def expandir_lote(archivos: list[tuple[str | None, bytes]]) -> list[tuple[str, bytes, str]]:
+    """
+    (nombre, bytes) subidos → [(nombre, bytes, sufijo)] por partido.
+    Los .zip se abren y aportan sus .xlsx/.csv en orden alfabético.
+    Un archivo repetido (mismo contenido) cuenta una sola vez.
+    """
+    partidos, total, vistos = [], 0, set()
+
+    def agregar(nombre, data):
+        nonlocal total
+        total += len(data)
+        if total > MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"El lote supera {TEMPORADA_MAX_MB} MB")
+        clave = clave_upload(data, _sufijo(nombre))
+        if clave not in vistos:
+            vistos.add(clave)
+            partidos.append((nombre, data, _sufijo(nombre)))
+
+    for nombre, data in archivos:
+        nombre = nombre or "partido.xlsx"
+        sufijo = _sufijo(nombre)
+
+        if sufijo == ".zip":
+            try:
+                with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                    internos = [
+                        i for i in zf.infolist()
+                        if not i.is_dir()
+                        and _sufijo(i.filename) in EXTENSIONES
+                        and not os.path.basename(i.filename).startswith((".", "~$"))
+                        and "__MACOSX" not in i.filename
+                    ]
+                    # Tamaño declarado antes de descomprimir nada
+                    if total + sum(i.file_size for i in internos) > MAX_BYTES:
+                        raise HTTPException(status_code=413, detail=f"El lote supera {TEMPORADA_MAX_MB} MB")
+                    for info in sorted(internos, key=lambda i: i.filename):
+                        agregar(os.path.basename(info.filename), zf.read(info))
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"Zip inválido: {nombre}")
+        elif sufijo in EXTENSIONES:
+            agregar(nombre, data)
+        else:
+            raise HTTPException(status_code=400, detail=f"Formato no soportado: {nombre}")
+
+    if not partidos:
+        raise HTTPException(status_code=400, detail="El lote no contiene partidos (.xlsx/.csv)")
+    if len(partidos) > TEMPORADA_MAX_PARTIDOS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo {TEMPORADA_MAX_PARTIDOS} partidos por lote ({len(partidos)} recibidos)"
+        )
+
+    return partidos
+
+
+def procesar_partido(db: Session, data: bytes, suffix: str, filename: str | None) -> dict:
+    """
+    Corre en un worker: parsea, enriquece y guarda eventos + contadores de
+    un partido. Si el archivo ya estaba materializado no se vuelve a leer.
+    """
+    clave = clave_upload(data, suffix)
+
+    partido = partido_materializado(db, clave)
+    if partido is not None:
+        return {"partido_id": partido.id, "archivo": filename, "nuevo": False}
+
+    merged = merge_stats_with_players(db, load_stats_cached(data, suffix, ESQUEMA_KPI))
+    partido = guardar_partido(db, merged, clave, filename=filename)
+    return {"partido_id": partido.id, "archivo": filename, "nuevo": True}
+
+
+# ─────────────────────────────
+# Agregación (contadores aditivos)
+# ─────────────────────────────
+FORMA = ["eventos", "pases", "completados", "fallidos", "perdidas", "ganadas", "xg"]
+
+
+def _pct(parte: pd.Series, total: pd.Series) -> pd.Series:
+    # Igual que kpi_service._pct, por columnas
+    total = total.astype(float)
+    return (parte / total.where(total > 0) * 100).round(2).fillna(0)
+
+
+def _metricas(c: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "eventos": c["eventos"].astype(np.int64),
+        "pases": c["pases"].astype(np.int64),
+        "pct_pase_completado": _pct(c["completados"], c["pases"]),
+        "pct_pase_perdido": _pct(c["fallidos"], c["pases"]),
+        "pct_perdidas_totales": _pct(c["perdidas"], c["eventos"]),
+        "pct_jugadas_ganadas": _pct(c["ganadas"], c["ganadas"] + c["perdidas"]),
+        "xg": c["xg"].astype(float).round(3),
+    }, index=c.index)
+
+
+def _forma_equipo(cont: pd.DataFrame, orden: list[int], ventana: int) -> pd.DataFrame:
+    """
+    Por partido (en orden): métricas del partido y de la ventana móvil.
+    La forma suma contadores de los últimos `ventana` partidos y recién
+    ahí saca porcentajes (no es un promedio de porcentajes).
+    """
+    gen = (
+        cont[cont["dimension"] == "general"]
+        .groupby("partido_id")[FORMA].sum()
+        .reindex(orden)
+        .fillna(0)
+    )
+    movil = gen.rolling(ventana, min_periods=1).sum()
+    return _metricas(gen).join(_metricas(movil), rsuffix="_forma")
+
+
+def _forma_jugadores(cont: pd.DataFrame, ultimos: list[int]) -> dict:
+    jug = cont[(cont["dimension"] == "jugador") & cont["partido_id"].isin(ultimos)]
+    if jug.empty:
+        return {}
+
+    claves = jug["clave"].astype(np.int64)
+    sumas = jug.groupby(claves)[FORMA].sum()
+    sumas = _metricas(sumas).assign(partidos=jug.groupby(claves)["partido_id"].nunique())
+    sumas = sumas.sort_index()
+
+    columnas = ["partidos", "eventos", "pases", "pct_pase_completado", "xg"]
+    return {
+        int(jugador_id): dict(zip(columnas, fila))
+        for jugador_id, *fila in zip(sumas.index.tolist(), *(sumas[c].tolist() for c in columnas))
+    }
+
+
+def kpis_lote(db: Session, equipo_id: int, partidos: list[dict], ventana: int) -> dict:
+    """
+    KPIs de temporada y forma de un equipo para los partidos del lote
+    (ya materializados por procesar_partido), en el orden del lote.
+    """
+    ids = list(dict.fromkeys(p["partido_id"] for p in partidos))
+    archivos = {}
+    for p in partidos:
+        archivos.setdefault(p["partido_id"], p["archivo"])
+
+    # Una sola consulta: contadores por partido; la temporada es su suma
+    cont = contadores_por_partido(db, equipo_id, ids)
+    if cont.empty:
+        raise HTTPException(status_code=422, detail="No hay datos para este equipo en el lote")
+
+    temporada = (
+        cont.groupby(["dimension", "clave", "subclave"], sort=False)[CONTADORES]
+        .sum()
+        .reset_index()
+    )
+    kpis = kpis_desde_contadores(db, temporada)
+
+    # Solo los partidos en los que jugó el equipo cuentan para su forma
+    jugados = set(cont["partido_id"].unique().tolist())
+    orden = [i for i in ids if i in jugados]
+
+    forma = _forma_equipo(cont, orden, ventana)
+    por_partido = [
+        {"partido_id": partido_id, "archivo": archivos[partido_id], **fila}
+        for partido_id, fila in zip(orden, forma.to_dict("records"))
+    ]
+
+    return {
+        **kpis,
+        "partidos": len(orden),
+        "forma": {
+            "ventana": ventana,
+            "por_partido": por_partido,
+            "jugadores": _forma_jugadores(cont, orden[-ventana:]),
+        },
+    }
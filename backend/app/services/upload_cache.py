@@ -0,0 +1,283 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+from app.core.config import (
+    COMPUTE_POOL_ENABLED,
+    COMPUTE_WORKERS,
+    UPLOAD_CACHE_ENABLED,
+    UPLOAD_CACHE_DIR,
+    UPLOAD_CACHE_DISK_MAX_MB,
+    UPLOAD_CACHE_MAX_MB,
+    UPLOAD_CACHE_TTL_SECONDS,
+    UPLOAD_COPY_CHUNK_KB,
+)
+from app.core.metricas import etapa, registrar
+from app.utils.stats_loader import load_stats
+
+# ─────────────────────────────
+# Caché de uploads parseados
+# ─────────────────────────────
+# Clave: SHA-256 del contenido subido (+ extensión).
+# Nivel 1: LRU en memoria con presupuesto de bytes, uno por proceso: con el
+# pool de procesos el parseo corre en los workers, así que el total es
+# UPLOAD_CACHE_MAX_MB × COMPUTE_WORKERS (ver cache_stats_pool).
+# Nivel 2: Parquet en disco (sobrevive reinicios y se comparte entre workers),
+# con presupuesto UPLOAD_CACHE_DISK_MAX_MB: cada escritura poda los vencidos
+# y, si hace falta, los más viejos.
+CACHE_DIR = Path(UPLOAD_CACHE_DIR)
+MAX_BYTES = UPLOAD_CACHE_MAX_MB * 1024 * 1024
+MAX_BYTES_DISCO = UPLOAD_CACHE_DISK_MAX_MB * 1024 * 1024
+# Temporales de escritura huérfanos (un worker que murió a mitad)
+TMP_HUERFANO_SEGUNDOS = 3600
+
+_lock = threading.Lock()
+_memoria: "OrderedDict[str, tuple[float, int, pd.DataFrame]]" = OrderedDict()
+_bytes_en_memoria = 0
+_contadores = {
+    "hits_memoria": 0,
+    "hits_disco": 0,
+    "misses": 0,
+    "evictions": 0,
+    "evictions_disco": 0,
+    "expirados": 0,
+}
+
+
+def clave_upload(data: bytes, suffix: str) -> str:
+    return f"{hashlib.sha256(data).hexdigest()}{suffix.lower()}"
+
+
+def copiar_upload(fileobj, suffix: str) -> tuple[str, str]:
+    """
+    Copia el upload a un temporal por bloques (sin leerlo entero en memoria)
+    y calcula la misma clave que clave_upload en la misma pasada.
+    """
+    sha = hashlib.sha256()
+    with etapa("lectura_upload", bytes_=0) as info, tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        while bloque := fileobj.read(UPLOAD_COPY_CHUNK_KB * 1024):
+            sha.update(bloque)
+            tmp.write(bloque)
+            info["bytes"] += len(bloque)
+        return tmp.name, f"{sha.hexdigest()}{suffix.lower()}"
+
+
+def _ruta_parquet(clave: str) -> Path:
+    return CACHE_DIR / f"{clave.replace('.', '_')}.parquet"
+
+
+def _expirado(creado: float) -> bool:
+    return UPLOAD_CACHE_TTL_SECONDS > 0 and time.time() - creado > UPLOAD_CACHE_TTL_SECONDS
+
+
+def _guardar_en_memoria(clave: str, df: pd.DataFrame, creado: float):
+    global _bytes_en_memoria
+
+    tamano = int(df.memory_usage(deep=True).sum())
+    if tamano > MAX_BYTES:
+        return
+
+    with _lock:
+        anterior = _memoria.pop(clave, None)
+        if anterior:
+            _bytes_en_memoria -= anterior[1]
+
+        _memoria[clave] = (creado, tamano, df)
+        _bytes_en_memoria += tamano
+
+        while _bytes_en_memoria > MAX_BYTES and _memoria:
+            _, (_, liberado, _) = _memoria.popitem(last=False)
+            _bytes_en_memoria -= liberado
+            _contadores["evictions"] += 1
+
+
+def _leer_memoria(clave: str):
+    global _bytes_en_memoria
+
+    with _lock:
+        entrada = _memoria.get(clave)
+        if entrada is None:
+            return None
+
+        creado, tamano, df = entrada
+        if _expirado(creado):
+            del _memoria[clave]
+            _bytes_en_memoria -= tamano
+            _contadores["expirados"] += 1
+            return None
+
+        _memoria.move_to_end(clave)
+        _contadores["hits_memoria"] += 1
+        return df
+
+
+def _leer_disco(clave: str):
+    ruta = _ruta_parquet(clave)
+    if not ruta.exists():
+        return None
+
+    creado = ruta.stat().st_mtime
+    if _expirado(creado):
+        ruta.unlink(missing_ok=True)
+        with _lock:
+            _contadores["expirados"] += 1
+        return None
+
+    try:
+        df = pd.read_parquet(ruta)
+    except Exception:
+        ruta.unlink(missing_ok=True)
+        return None
+
+    with _lock:
+        _contadores["hits_disco"] += 1
+
+    _guardar_en_memoria(clave, df, creado)
+    return df
+
+
+def _guardar_disco(clave: str, df: pd.DataFrame):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    ruta = _ruta_parquet(clave)
+    # Temporal único: dos workers pueden escribir la misma clave a la vez
+    fd, nombre = tempfile.mkstemp(dir=CACHE_DIR, prefix=ruta.stem + ".", suffix=".tmp")
+    os.close(fd)
+    tmp = Path(nombre)
+
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, ruta)
+    except Exception as e:
+        # Columnas con tipos mixtos no son serializables en Parquet:
+        # la entrada se queda solo en memoria.
+        tmp.unlink(missing_ok=True)
+        print("⚠️ No se pudo persistir en caché:", e)
+        return
+
+    _podar_disco()
+
+
+def _podar_disco():
+    """Borra vencidos y, si el directorio pasa MAX_BYTES_DISCO, los más viejos."""
+    ahora = time.time()
+    entradas = []
+    for ruta in CACHE_DIR.iterdir():
+        try:
+            st = ruta.stat()
+        except FileNotFoundError:
+            continue  # otro worker lo borró
+
+        if ruta.suffix == ".tmp":
+            if ahora - st.st_mtime > TMP_HUERFANO_SEGUNDOS:
+                ruta.unlink(missing_ok=True)
+        elif ruta.suffix == ".parquet":
+            if _expirado(st.st_mtime):
+                ruta.unlink(missing_ok=True)
+                with _lock:
+                    _contadores["expirados"] += 1
+            else:
+                entradas.append((st.st_mtime, st.st_size, ruta))
+
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, ruta in sorted(entradas, key=lambda e: e[0]):
+        if total <= MAX_BYTES_DISCO:
+            break
+        ruta.unlink(missing_ok=True)
+        total -= tamano
+        with _lock:
+            _contadores["evictions_disco"] += 1
+
+
+def _clave_cache(clave: str, esquema: dict | None) -> str:
+    # La proyección es otra entrada de caché (la clave del archivo no cambia)
+    if esquema is None:
+        return clave
+    firma = hashlib.sha256(repr(sorted(esquema.items())).encode()).hexdigest()[:8]
+    return f"{clave}.{firma}"
+
+
+def load_stats_cached(data: bytes, suffix: str, esquema: dict | None = None) -> pd.DataFrame:
+    """
+    Igual que load_stats pero a partir de los bytes subidos. Con `esquema`
+    (ver stats_loader.ESQUEMA_KPI) solo las columnas que usan los KPIs.
+
+    Devuelve siempre una copia: los servicios de merge modifican el
+    DataFrame en sitio y la entrada cacheada debe quedar intacta.
+
+    Solo el parseo real se mide como etapa "parseo"; los hits de caché
+    (memoria o disco) van a la etapa "cache_upload".
+    """
+    clave = None
+    if UPLOAD_CACHE_ENABLED:
+        clave = _clave_cache(clave_upload(data, suffix), esquema)
+
+        inicio = time.perf_counter()
+        df = _leer_memoria(clave)
+        if df is None:
+            df = _leer_disco(clave)
+        if df is not None:
+            registrar("cache_upload", time.perf_counter() - inicio, len(df))
+            return df.copy()
+
+        with _lock:
+            _contadores["misses"] += 1
+
+    # Directo desde memoria: sin temporal en disco
+    with etapa("parseo") as info:
+        df = load_stats(data, suffix, esquema)
+        info["filas"] = len(df)
+
+    if clave is None:
+        return df
+
+    _guardar_disco(clave, df)
+    _guardar_en_memoria(clave, df, time.time())
+    return df.copy()
+
+
+def cache_stats() -> dict:
+    with _lock:
+        return {
+            **_contadores,
+            "entradas": len(_memoria),
+            "bytes": _bytes_en_memoria,
+            "max_bytes": MAX_BYTES,
+            "max_bytes_disco": MAX_BYTES_DISCO,
+            "ttl_segundos": UPLOAD_CACHE_TTL_SECONDS,
+        }
+
+
+def cache_stats_pool(workers: dict[int, dict]) -> dict:
+    """
+    Contadores de este proceso más los de cada worker del pool (los que
+    devolvió su último trabajo, compute_service.estados_workers()).
+    """
+    procesos = {"web": cache_stats(), **{f"worker-{pid}": e for pid, e in workers.items()}}
+    sumables = [*_contadores, "entradas", "bytes"]
+    return {
+        **{k: sum(p.get(k, 0) for p in procesos.values()) for k in sumables},
+        "max_bytes": MAX_BYTES,
+        # Presupuesto real en memoria: uno por proceso que parsea
+        "max_bytes_total": MAX_BYTES * (COMPUTE_WORKERS if COMPUTE_POOL_ENABLED else 1),
+        "max_bytes_disco": MAX_BYTES_DISCO,
+        "ttl_segundos": UPLOAD_CACHE_TTL_SECONDS,
+        "procesos": procesos,
+    }
+
+
+def clear_cache(disco: bool = False):
+    global _bytes_en_memoria
+
+    with _lock:
+        _memoria.clear()
+        _bytes_en_memoria = 0
+
+    if disco and CACHE_DIR.exists():
+        for ruta in CACHE_DIR.glob("*.parquet"):
+            ruta.unlink(missing_ok=True)
@@ -0,0 +1,256 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import XT_COLUMNAS, XT_FILAS, XT_MODEL_PATH
+from app.models.evento import Evento
+from app.services.espacial_service import ANCHO, LARGO, celdas
+from app.services.kpi_service import (
+    CONDUCCION,
+    PASE,
+    PASE_EXITOSO,
+    TIRO,
+    clasificar_eventos,
+    detectar_columna_evento,
+)
+
+# ─────────────────────────────
+# Expected threat (xT)
+# ─────────────────────────────
+# Superficie de valor por celda (filas x columnas, como los heatmaps de
+# espacial_service) ajustada por iteración de valor sobre los eventos
+# guardados:  xT = P(tiro)·P(gol|tiro) + P(mover)·Σ T(origen→destino)·xT
+# El ajuste es un job offline (python -m app.scripts.ajustar_xt) que deja
+# un .npz; las requests solo lo leen (caché en memoria por mtime) y hacen
+# lookups vectorizados: xT de un pase/conducción = V[destino] - V[origen].
+PATRON_GOL = r"\bgol\b|\bgoal\b"
+MAX_ITERACIONES = 100
+TOLERANCIA = 1e-6
+LOTE_AJUSTE = 100_000
+TOP_RANKING = 10
+
+_lock = threading.Lock()
+_cache = {"mtime": None, "modelo": None}
+
+
+def _bordes(columnas: int, filas: int):
+    return np.linspace(0, LARGO, columnas + 1), np.linspace(0, ANCHO, filas + 1)
+
+
+def _movimientos(bits: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Intentos (pases + conducciones) y los que llegan a destino
+    intento = (bits & (PASE | CONDUCCION)) != 0
+    exitoso = (((bits & PASE) != 0) & ((bits & PASE_EXITOSO) != 0)) | ((bits & CONDUCCION) != 0)
+    return intento, exitoso
+
+
+def _es_gol(eventos: pd.Series) -> np.ndarray:
+    cat = pd.Categorical(eventos)
+    tabla = pd.Series(cat.categories).str.contains(PATRON_GOL, case=False, regex=True, na=False)
+    return np.append(tabla.to_numpy(dtype=bool), False)[cat.codes]
+
+
+# ─────────────────────────────
+# Ajuste (offline)
+# ─────────────────────────────
+def huella_corpus(db: Session) -> str:
+    """Cambia si se agregan o borran eventos: sirve para no reajustar en vano."""
+    total, ultimo = db.execute(select(func.count(Evento.id), func.max(Evento.id))).one()
+    return f"{total}:{ultimo or 0}"
+
+
+def _acumular(df: pd.DataFrame, bordes_x, bordes_y, n: int, conteos: dict):
+    bits = clasificar_eventos(df["evento"])
+    origen = celdas(df["x"], df["y"], bordes_x, bordes_y)
+    destino = celdas(df["x2"], df["y2"], bordes_x, bordes_y)
+    valido = origen >= 0
+
+    tiro = valido & ((bits & TIRO) != 0)
+    intento, exitoso = _movimientos(bits)
+    intento &= valido
+    exitoso &= valido & (destino >= 0)
+
+    conteos["tiros"] += np.bincount(origen[tiro], minlength=n)
+    conteos["goles"] += np.bincount(origen[tiro & _es_gol(df["evento"])], minlength=n)
+    conteos["movimientos"] += np.bincount(origen[intento], minlength=n)
+    conteos["transiciones"] += np.bincount(
+        origen[exitoso] * n + destino[exitoso], minlength=n * n
+    ).reshape(n, n)
+    conteos["eventos"] += len(df)
+
+
+def iteracion_valor(tiros, goles, movimientos, transiciones) -> tuple[np.ndarray, int]:
+    """Resuelve xT = s·g + m·(T @ xT) por iteración de valor; devuelve (xT, iteraciones)."""
+    acciones = tiros + movimientos
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p_tiro = np.where(acciones > 0, tiros / acciones, 0.0)
+        p_mover = np.where(acciones > 0, movimientos / acciones, 0.0)
+        p_gol = np.where(tiros > 0, goles / tiros, 0.0)
+        # Los movimientos fallidos cuentan en el denominador: valen 0
+        t = np.where(movimientos[:, None] > 0, transiciones / movimientos[:, None], 0.0)
+
+    recompensa = p_tiro * p_gol
+    xt = np.zeros_like(recompensa)
+    for i in range(1, MAX_ITERACIONES + 1):
+        nuevo = recompensa + p_mover * (t @ xt)
+        if np.abs(nuevo - xt).max() < TOLERANCIA:
+            return nuevo, i
+        xt = nuevo
+    return xt, MAX_ITERACIONES
+
+
+def ajustar_xt(db: Session, columnas: int = XT_COLUMNAS, filas: int = XT_FILAS) -> dict:
+    """
+    Ajusta la superficie con todos los eventos guardados, leídos por lotes
+    (memoria O(celdas²), no O(eventos)).
+    """
+    bordes_x, bordes_y = _bordes(columnas, filas)
+    n = columnas * filas
+    conteos = {
+        "tiros": np.zeros(n), "goles": np.zeros(n), "movimientos": np.zeros(n),
+        "transiciones": np.zeros((n, n)), "eventos": 0,
+    }
+    huella = huella_corpus(db)
+
+    query = select(Evento.evento, Evento.x, Evento.y, Evento.x2, Evento.y2).order_by(Evento.id)
+    for df in pd.read_sql(query, db.connection(), chunksize=LOTE_AJUSTE):
+        _acumular(df, bordes_x, bordes_y, n, conteos)
+
+    valores, iteraciones = iteracion_valor(
+        conteos["tiros"], conteos["goles"], conteos["movimientos"], conteos["transiciones"]
+    )
+
+    return {
+        "valores": valores.reshape(filas, columnas),
+        "eventos": conteos["eventos"],
+        "iteraciones": iteraciones,
+        "huella": huella,
+        "origen": "ajuste",
+        "ajustado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def importar_superficie(ruta: str) -> dict:
+    """Superficie ya calculada (.npy o .csv de filas x columnas)."""
+    if ruta.lower().endswith(".csv"):
+        valores = np.loadtxt(ruta, delimiter=",", dtype=float, ndmin=2)
+    else:
+        valores = np.load(ruta, allow_pickle=False).astype(float)
+
+    if valores.ndim != 2:
+        raise ValueError("La superficie xT debe ser una matriz filas x columnas")
+
+    return {
+        "valores": valores,
+        "eventos": 0,
+        "iteraciones": 0,
+        "huella": "",
+        "origen": os.path.basename(ruta),
+        "ajustado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def guardar_modelo(modelo: dict, ruta: str = XT_MODEL_PATH):
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    tmp = f"{ruta}.tmp"
+    # Escritura atómica: las requests nunca leen un archivo a medias
+    with open(tmp, "wb") as f:
+        np.savez(f, **{k: np.asarray(v) for k, v in modelo.items()})
+    os.replace(tmp, ruta)
+
+    with _lock:
+        _cache["mtime"] = None
+
+
+# ─────────────────────────────
+# Lectura (requests)
+# ─────────────────────────────
+def modelo_xt(ruta: str = XT_MODEL_PATH) -> dict | None:
+    """Modelo guardado o None si todavía no se ajustó ninguno."""
+    try:
+        mtime = os.stat(ruta).st_mtime
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        if _cache["mtime"] == mtime:
+            return _cache["modelo"]
+
+    with np.load(ruta, allow_pickle=False) as datos:
+        modelo = {k: datos[k] if k == "valores" else datos[k].item() for k in datos.files}
+
+    with _lock:
+        _cache.update(mtime=mtime, modelo=modelo)
+    return modelo
+
+
+def info_modelo(modelo: dict) -> dict:
+    filas, columnas = modelo["valores"].shape
+    return {
+        "columnas": columnas,
+        "filas": filas,
+        "origen": modelo["origen"],
+        "ajustado": modelo["ajustado"],
+        "eventos": modelo["eventos"],
+    }
+
+
+def asignar_xt(df: pd.DataFrame, modelo: dict) -> np.ndarray:
+    """xT por evento: V[destino] - V[origen] en pases completos y conducciones, 0 en el resto."""
+    event_col = detectar_columna_evento(df)
+    if df.empty or not event_col or not {"x", "y", "x2", "y2"}.issubset(df.columns):
+        return np.zeros(len(df))
+
+    valores = modelo["valores"]
+    filas, columnas = valores.shape
+    bordes_x, bordes_y = _bordes(columnas, filas)
+    plano = valores.ravel()
+
+    origen = celdas(df["x"], df["y"], bordes_x, bordes_y)
+    destino = celdas(df["x2"], df["y2"], bordes_x, bordes_y)
+    _, exitoso = _movimientos(clasificar_eventos(df[event_col]))
+    ok = exitoso & (origen >= 0) & (destino >= 0)
+
+    # Lookups con índices seguros; los eventos que no cuentan quedan en 0
+    return np.where(ok, plano[np.maximum(destino, 0)] - plano[np.maximum(origen, 0)], 0.0)
+
+
+def _ranking(claves: pd.Series, xt: np.ndarray) -> dict:
+    sumas = pd.Series(xt).groupby(claves.to_numpy()).sum().sort_values(ascending=False, kind="stable")
+    return {int(k): round(float(v), 4) for k, v in sumas.items()}
+
+
+def xt_kpis(df: pd.DataFrame, equipo_id: int | None = None, modelo: dict | None = None) -> dict | None:
+    """
+    Rankings de xT (suma de lo generado con pases/conducciones) por equipo
+    y por jugador; los jugadores se limitan a `equipo_id` si viene.
+    None si no hay modelo ajustado.
+    """
+    modelo = modelo or modelo_xt()
+    if modelo is None or df is None:
+        return None
+
+    # Si el pipeline ya asignó la columna xt no se recalcula
+    xt = df["xt"].to_numpy(dtype=float) if "xt" in df.columns else asignar_xt(df, modelo)
+    equipos = pd.to_numeric(df["equipo_id"], errors="coerce") if "equipo_id" in df.columns else None
+    jugadores = pd.to_numeric(df["id_jugador"], errors="coerce") if "id_jugador" in df.columns else None
+
+    mascara = np.ones(len(df), dtype=bool)
+    if equipo_id is not None and equipos is not None:
+        mascara = (equipos == equipo_id).to_numpy()
+
+    por_equipo = _ranking(equipos, xt) if equipos is not None else {}
+    por_jugador = _ranking(jugadores[mascara], xt[mascara]) if jugadores is not None else {}
+
+    return {
+        "modelo": info_modelo(modelo),
+        "total": round(float(xt[mascara].sum()), 4),
+        "por_equipo": por_equipo,
+        "por_jugador": por_jugador,
+        "ranking_jugadores": dict(list(por_jugador.items())[:TOP_RANKING]),
+    }
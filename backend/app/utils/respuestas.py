@@ -0,0 +1,118 @@
+import gzip
+
+import numpy as np
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+from app.core.metricas import medido
+
+# ─────────────────────────────
+# Respuestas compactas (opt-in)
+# ─────────────────────────────
+# formato=records  → lista de dicts (por defecto, igual que siempre)
+# formato=columnas → un arreglo por columna, eventos como códigos + etiquetas
+# formato=arrow    → Apache Arrow IPC stream
+# También por Accept: application/vnd.apache.arrow.stream o
+# application/vnd.datastrike.columnas+json.
+RECORDS = "records"
+COLUMNAS = "columnas"
+ARROW = "arrow"
+FORMATOS = (RECORDS, COLUMNAS, ARROW)
+
+MEDIA_COLUMNAS = "application/vnd.datastrike.columnas+json"
+MEDIA_ARROW = "application/vnd.apache.arrow.stream"
+
+# Los KPIs traen claves no str (p. ej. carriles) y arreglos NumPy
+_OPCIONES_JSON = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Por debajo de esto comprimir no compensa
+MIN_BYTES_COMPRIMIR = 1024
+
+try:
+    import brotli  # opcional
+except ImportError:
+    brotli = None
+
+
+def formato_pedido(request: Request, formato: str | None) -> str:
+    if formato:
+        formato = formato.lower()
+        if formato not in FORMATOS:
+            raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato}")
+        return formato
+
+    accept = request.headers.get("accept", "")
+    if MEDIA_ARROW in accept:
+        return ARROW
+    if MEDIA_COLUMNAS in accept:
+        return COLUMNAS
+    return RECORDS
+
+
+def _aceptadas(request: Request) -> set[str]:
+    aceptadas = set()
+    for parte in request.headers.get("accept-encoding", "").split(","):
+        nombre, _, q = parte.strip().partition(";")
+        if q.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if nombre:
+            aceptadas.add(nombre.lower())
+    return aceptadas
+
+
+def _comprimir(request: Request, cuerpo: bytes) -> tuple[bytes, dict]:
+    headers = {"Vary": "Accept-Encoding"}
+    if len(cuerpo) < MIN_BYTES_COMPRIMIR:
+        return cuerpo, headers
+
+    aceptadas = _aceptadas(request)
+    if brotli is not None and "br" in aceptadas:
+        return brotli.compress(cuerpo, quality=4), {**headers, "Content-Encoding": "br"}
+    if "gzip" in aceptadas:
+        return gzip.compress(cuerpo, compresslevel=5), {**headers, "Content-Encoding": "gzip"}
+
+    return cuerpo, headers
+
+
+def _tabla_arrow(columnas: dict):
+    import pyarrow as pa
+
+    arreglos = {}
+    for nombre, valores in columnas.items():
+        if isinstance(valores, dict) and "codigos" in valores:
+            # Columna diccionario: códigos int32 (-1 = nulo) + etiquetas
+            codigos = np.asarray(valores["codigos"], dtype=np.int32)
+            arreglos[nombre] = pa.DictionaryArray.from_arrays(
+                pa.array(codigos, mask=codigos < 0),
+                pa.array(valores["etiquetas"], type=pa.string()),
+            )
+        else:
+            arreglos[nombre] = pa.array(valores)
+    return pa.table(arreglos)
+
+
+@medido("respuesta")
+def responder(request: Request, contenido: dict, formato: str, tabla: str) -> Response:
+    """
+    Serializa `contenido` en formato columnas/arrow. `tabla` es la clave
+    del contenido con las columnas ({col: arreglo}); en Arrow viaja como
+    el stream y el resto (p. ej. los KPIs) como metadata JSON del schema.
+    """
+    if formato == ARROW:
+        import pyarrow as pa
+
+        resto = {k: v for k, v in contenido.items() if k != tabla}
+        t = _tabla_arrow(contenido.get(tabla) or {})
+        t = t.replace_schema_metadata({"contenido": orjson.dumps(resto, option=_OPCIONES_JSON)})
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, t.schema) as writer:
+            writer.write_table(t)
+        cuerpo, media = sink.getvalue().to_pybytes(), MEDIA_ARROW
+    else:
+        cuerpo = orjson.dumps(contenido, option=_OPCIONES_JSON)
+        media = "application/json"
+
+    cuerpo, headers = _comprimir(request, cuerpo)
+    return Response(content=cuerpo, media_type=media, headers=headers)
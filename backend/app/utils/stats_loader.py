@@ -1,4 +1,14 @@
+import io
+import os
+from operator import itemgetter
+from typing import BinaryIO, Iterator
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import infer_dtype, union_categoricals
+
+from app.core.config import STATS_CHUNK_ROWS, STATS_CHUNK_MAX_MB
+
 
 def infer_periodo(sheet_name: str) -> str:
     s = sheet_name.lower()
@@ -16,36 +26,436 @@ def infer_periodo(sheet_name: str) -> str:
     return "1T"
 
 
-def load_stats(file_path: str) -> pd.DataFrame:
-    if file_path.lower().endswith(".xlsx"):
-        xls = pd.ExcelFile(file_path)
-        dfs = []
+# ─────────────────────────────
+# Lectura por bloques (memoria acotada)
+# ─────────────────────────────
+class _TamanoBloque:
+    """
+    Filas por bloque: arranca en STATS_CHUNK_ROWS y se reduce cuando el
+    primer bloque muestra que las filas son más pesadas que el presupuesto.
+    """
 
-        for sheet in xls.sheet_names:
-            df = xls.parse(sheet)
+    def __init__(self, filas: int | None = None, max_mb: int | None = None):
+        self.filas = filas or STATS_CHUNK_ROWS
+        self.max_bytes = (max_mb or STATS_CHUNK_MAX_MB) * 1024 * 1024
 
-            if df.empty or len(df.columns) == 0:
-                continue
+    def ajustar(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        bytes_por_fila = df.memory_usage(deep=True).sum() / len(df)
+        self.filas = max(1, min(self.filas, int(self.max_bytes // max(bytes_por_fila, 1))))
 
-            df.columns = df.columns.str.strip().str.lower()
-            df["periodo"] = infer_periodo(sheet)
 
-            # ✅ PRINT CORRECTO
-            print("HOJA:", sheet, "→ periodo:", df["periodo"].iloc[0])
+# ─────────────────────────────
+# Esquema: proyección de columnas + tipos compactos
+# ─────────────────────────────
+# Columna lógica → (alias en orden de prioridad, dtype). Los alias son los
+# mismos que buscan normalize_stats, detectar_columna_evento y
+# detectar_columna_minuto; de cada grupo se lee solo el primero presente
+# y conserva su nombre (los servicios lo detectan igual que antes).
+ESQUEMA_KPI = {
+    "evento": (["event", "evento", "type"], "category"),
+    "jugador": (["player", "player_id", "id_jugador", "idjugador", "jugador"], "Int32"),
+    "x": (["x"], "float32"),
+    "y": (["y"], "float32"),
+    "x2": (["x2"], "float32"),
+    "y2": (["y2"], "float32"),
+    "xg": (["xg"], "float64"),
+    "minuto": (["minuto", "minute", "min"], "float32"),
+}
 
-            dfs.append(df)
+# float32 guarda ~7 cifras significativas: al volver a float64 se redondea
+# a esas cifras (12.3 vuelve como 12.3, no como 12.300000190734863)
+CIFRAS_FLOAT32 = 7
 
-        if not dfs:
-            raise ValueError("El archivo Excel no contiene hojas válidas")
 
-        return pd.concat(dfs, ignore_index=True)
+def proyeccion(columnas, esquema: dict) -> dict[str, str]:
+    """{columna original: dtype} de las columnas del esquema presentes en `columnas`."""
+    por_nombre = {}
+    for c in columnas:
+        por_nombre.setdefault(str(c).strip().lower(), c)
 
-    # CSV
-    df = pd.read_csv(file_path)
-    if df.empty:
-        raise ValueError("El CSV está vacío")
-    df.columns = df.columns.str.strip().str.lower()
-    df["periodo"] = "1T"
+    tipos = {}
+    for alias, dtype in esquema.values():
+        original = next((por_nombre[a] for a in alias if a in por_nombre), None)
+        if original is not None:
+            tipos[original] = dtype
+    return tipos
+
+
+def _entero_compacto(serie: pd.Series) -> pd.Series:
+    valores = pd.to_numeric(serie, errors="coerce")
+    v = valores.to_numpy(dtype="float64", na_value=np.nan)
+    v = v[~np.isnan(v)]
+    # Ids no enteros o fuera de int32 quedan como float (no coinciden con nadie)
+    if len(v) and ((v != np.floor(v)).any() or v.min() < -2**31 or v.max() >= 2**31):
+        return valores.astype("float64")
+    return valores.astype("Int32")
+
+
+def _tipar(df: pd.DataFrame, tipos: dict[str, str]) -> pd.DataFrame:
+    for col, dtype in tipos.items():
+        if dtype == "category":
+            df[col] = df[col].astype("category")
+        elif dtype == "Int32":
+            df[col] = _entero_compacto(df[col])
+        else:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+    return df
+
+
+def proyectar(df: pd.DataFrame, esquema: dict) -> pd.DataFrame:
+    """Lo mismo que leer con `esquema`, a partir de un DataFrame ya leído completo."""
+    tipos = proyeccion(df.columns, esquema)
+    salida = _tipar(df[list(tipos)].copy(), tipos)
+    if "periodo" in df.columns:
+        salida["periodo"] = df["periodo"].astype("category")
+    return salida
+
+
+def a_float64(serie: pd.Series) -> pd.Series:
+    """Columna numérica para persistir/serializar: float32 → float64 sin ruido de redondeo."""
+    valores = pd.to_numeric(serie, errors="coerce")
+    if valores.dtype != np.float32:
+        return valores
+
+    v = valores.to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        escala = 10.0 ** (CIFRAS_FLOAT32 - 1 - np.floor(np.log10(np.abs(v))))
+        redondeado = np.round(v * escala) / escala
+    # 0 y NaN no tienen escala: quedan como están
+    return pd.Series(np.where(np.isfinite(redondeado), redondeado, v), index=valores.index)
+
+
+def huella_memoria(df: pd.DataFrame) -> dict:
+    """Memoria del DataFrame parseado (deep): total, por fila y por columna."""
+    por_columna = df.memory_usage(deep=True, index=False)
+    total = int(por_columna.sum())
+    return {
+        "filas": len(df),
+        "columnas": len(df.columns),
+        "bytes": total,
+        "bytes_por_fila": round(total / len(df), 1) if len(df) else 0.0,
+        "por_columna": {str(c): int(b) for c, b in por_columna.items()},
+    }
+
+
+def _normalizar(df: pd.DataFrame, periodo: str, tipos: dict | None = None) -> pd.DataFrame:
+    if tipos:
+        _tipar(df, tipos)
+    df.columns = df.columns.astype(str).str.strip().str.lower()
+    df["periodo"] = pd.Categorical([periodo] * len(df)) if tipos else periodo
+    return df
+
+
+def _encabezado(fila) -> list[str]:
+    columnas, vistos = [], {}
+    for i, c in enumerate(fila):
+        nombre = f"Unnamed: {i}" if c is None else str(c)
+        # Igual que pandas: columnas repetidas → "col.1", "col.2"
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        else:
+            vistos[nombre] = 0
+        columnas.append(nombre)
+    return columnas
+
+
+def _avanzar(progreso, clave: str, n: int = 1):
+    if progreso is not None:
+        progreso[clave] = progreso.get(clave, 0) + n
+
+
+def _selector(indices: list[int]):
+    # itemgetter con un solo índice devuelve el valor, no una tupla
+    if len(indices) == 1:
+        i = indices[0]
+        return lambda fila: (fila[i],)
+    if not indices:
+        return lambda fila: ()
+    return itemgetter(*indices)
+
+
+# ─────────────────────────────
+# Celdas de Excel → mismos valores y tipos que pd.read_excel
+# ─────────────────────────────
+# Marcadores NA por defecto de read_excel/read_csv (lista documentada en
+# `na_values` de pandas 2.x; tests/test_stats_loader la compara con read_excel)
+_NA_PANDAS = frozenset((
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+))
+_ERRORES_EXCEL = frozenset(("#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"))
+# Igual que read_excel: celdas vacías, marcadores NA y errores de fórmula → NaN
+_NA_CELDA = _NA_PANDAS | _ERRORES_EXCEL
+_NUMERICOS = {"integer", "floating", "mixed-integer-float", "decimal", "empty"}
+NUMERO, TEXTO, OTRO = "numero", "texto", "otro"
+
+
+def _celda(valor):
+    if valor is None:
+        return np.nan
+    if isinstance(valor, str):
+        return np.nan if valor in _NA_CELDA else valor
+    # Números enteros guardados como float (1001002.0) → int, como read_excel
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def _tipo_columna(serie: pd.Series) -> tuple[str, pd.Series]:
+    """
+    (clase, columna) con los tipos que infiere read_excel: numérica solo si
+    todos los valores lo son (incluidos textos como '1001002'); si no, objeto
+    con los valores originales. Booleanos con vacíos → 1.0 / 0.0 / NaN.
+    """
+    tipo = infer_dtype(serie, skipna=True)
+    if tipo == "boolean" and serie.isna().any():
+        return NUMERO, serie.astype("float64")
+
+    if tipo in _NUMERICOS or tipo in ("string", "mixed-integer", "mixed"):
+        numeros = pd.to_numeric(serie, errors="coerce")
+        if numeros.notna().sum() == serie.notna().sum():
+            return NUMERO, numeros
+        if tipo not in _NUMERICOS:
+            return TEXTO, serie
+
+    # Fechas y booleanos (datetime64 / bool)
+    return OTRO, serie.infer_objects()
+
+
+def _inferir(df: pd.DataFrame, estado: dict | None = None, excluir=()) -> pd.DataFrame:
+    """
+    Sin `estado`: tipos de read_excel sobre la columna completa.
+
+    Con `estado` (compartido entre los bloques de una hoja) el primer bloque
+    fija la clase de cada columna y los siguientes la respetan, así todos
+    los bloques tienen el mismo dtype: números siempre float64 (un texto
+    suelto en una columna numérica queda NaN) y texto siempre objeto.
+    """
+    for col in df.columns:
+        if col in excluir:
+            continue
+
+        # from_records ya tipó las columnas homogéneas (int64, float64, bool...)
+        serie = df[col]
+        clase = estado.get(col) if estado is not None else None
+        if clase is None:
+            if serie.dtype == object:
+                clase, df[col] = _tipo_columna(serie)
+            else:
+                clase = NUMERO if pd.api.types.is_numeric_dtype(serie) and serie.dtype != bool else OTRO
+            if estado is None:
+                continue
+            estado[col] = clase
+            serie = df[col]
+
+        if clase == NUMERO:
+            df[col] = pd.to_numeric(serie, errors="coerce").astype("float64")
+        elif clase == TEXTO:
+            df[col] = serie.astype(object)
+        elif serie.dtype == object:
+            df[col] = serie.infer_objects()
     return df
 
 
+def _bloques_xlsx(file_path, tamano: _TamanoBloque, progreso=None, esquema=None):
+    """
+    Por hoja: (periodo, tipos del esquema, bloques de celdas crudas).
+    Las filas vacías intermedias se conservan (read_excel las devuelve
+    como filas NaN); las del final de la hoja se descartan.
+    """
+    from openpyxl import load_workbook
+
+    # read_only: openpyxl lee las filas en streaming sin cargar la hoja
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    if progreso is not None:
+        progreso["hojas_total"] = len(wb.sheetnames)
+
+    def bloques(filas, columnas, ancho, tomar):
+        bloque, vacias = [], 0
+        for fila in filas:
+            if all(c is None for c in fila):
+                vacias += 1
+                continue
+            if vacias:
+                bloque.extend([(np.nan,) * len(columnas)] * vacias)
+                vacias = 0
+
+            fila = tuple(map(_celda, fila[:ancho])) + (np.nan,) * (ancho - len(fila))
+            bloque.append(tomar(fila) if tomar else fila)
+
+            if len(bloque) >= tamano.filas:
+                df = pd.DataFrame.from_records(bloque, columns=columnas)
+                tamano.ajustar(df)
+                bloque = []
+                _avanzar(progreso, "filas_leidas", len(df))
+                yield df
+
+        if bloque:
+            _avanzar(progreso, "filas_leidas", len(bloque))
+            yield pd.DataFrame.from_records(bloque, columns=columnas)
+
+    try:
+        for sheet in wb.sheetnames:
+            filas = wb[sheet].iter_rows(values_only=True)
+            header = next(filas, None)
+            if header is None or all(c is None for c in header):
+                _avanzar(progreso, "hojas_leidas")
+                continue
+
+            columnas = _encabezado(header)
+            ancho = len(columnas)
+            periodo = infer_periodo(sheet)
+            tipos = None
+            tomar = None
+            if esquema is not None:
+                # Solo las celdas de las columnas del esquema pasan al DataFrame
+                tipos = proyeccion(columnas, esquema)
+                indices = [columnas.index(c) for c in tipos]
+                columnas = list(tipos)
+                tomar = _selector(indices)
+
+            yield periodo, tipos, bloques(filas, columnas, ancho, tomar)
+
+            _avanzar(progreso, "hojas_leidas")
+            print("HOJA:", sheet, "→ periodo:", periodo)
+    finally:
+        wb.close()
+
+
+def _iter_xlsx(file_path, tamano: _TamanoBloque, progreso=None, esquema=None) -> Iterator[pd.DataFrame]:
+    for periodo, tipos, bloques in _bloques_xlsx(file_path, tamano, progreso, esquema):
+        estado = {}
+        for df in bloques:
+            yield _normalizar(_inferir(df, estado, excluir=tipos or ()), periodo, tipos)
+
+
+def _hojas_xlsx(file_path, tamano: _TamanoBloque) -> Iterator[pd.DataFrame]:
+    # Una hoja entera por vez: los tipos se infieren sobre la columna
+    # completa, igual que read_excel (sin depender de dónde cae un bloque)
+    for periodo, _, bloques in _bloques_xlsx(file_path, tamano):
+        partes = list(bloques)
+        if partes:
+            df = partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+            yield _normalizar(_inferir(df), periodo)
+
+
+def _iter_csv(file_path, tamano: _TamanoBloque, progreso=None, esquema=None, completo=False) -> Iterator[pd.DataFrame]:
+    if progreso is not None:
+        progreso["hojas_total"] = 1
+
+    if completo:
+        # Una sola lectura: tipos inferidos sobre la columna completa
+        df = pd.read_csv(file_path)
+        _avanzar(progreso, "filas_leidas", len(df))
+        yield _normalizar(df, "1T")
+        return
+
+    tipos = None
+    opciones = {}
+    if esquema is not None:
+        # Encabezado primero para elegir las columnas; el parser salta el resto
+        columnas = pd.read_csv(file_path, nrows=0).columns
+        if hasattr(file_path, "seek"):
+            file_path.seek(0)
+        tipos = proyeccion(columnas, esquema)
+        opciones["usecols"] = list(tipos)
+
+    with pd.read_csv(file_path, iterator=True, **opciones) as reader:
+        while True:
+            try:
+                df = reader.get_chunk(tamano.filas)
+            except StopIteration:
+                _avanzar(progreso, "hojas_leidas")
+                return
+            tamano.ajustar(df)
+            _avanzar(progreso, "filas_leidas", len(df))
+            yield _normalizar(df, "1T", tipos)
+
+
+Fuente = str | os.PathLike | bytes | bytearray | memoryview | BinaryIO
+
+
+def _abrir(fuente: Fuente, suffix: str | None) -> tuple[object, bool]:
+    """
+    (origen para openpyxl/read_csv, es_xlsx). Acepta una ruta, los bytes
+    del upload o un archivo binario abierto (p. ej. el SpooledTemporaryFile
+    de UploadFile): nada se copia a un temporal en disco.
+    """
+    if isinstance(fuente, (str, os.PathLike)):
+        ruta = os.fspath(fuente)
+        return ruta, (suffix or ruta).lower().endswith(".xlsx")
+
+    es_xlsx = (suffix or "").lower() == ".xlsx"
+    if isinstance(fuente, (bytes, bytearray, memoryview)):
+        # BytesIO sobre bytes comparte el buffer (no copia)
+        return io.BytesIO(fuente), es_xlsx
+
+    fuente.seek(0)
+    return fuente, es_xlsx
+
+
+def iter_stats(
+    fuente: Fuente,
+    chunk_rows: int | None = None,
+    max_chunk_mb: int | None = None,
+    progreso=None,
+    suffix: str | None = None,
+    esquema: dict | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Devuelve bloques ya normalizados (columnas en minúscula + periodo).
+    Nunca hay más de un bloque en memoria a la vez.
+
+    `fuente` es una ruta, bytes o un archivo binario; fuera de las rutas
+    el formato lo da `suffix` (".xlsx" o CSV).
+    Con `esquema` (p. ej. ESQUEMA_KPI) solo se leen esas columnas, con
+    tipos compactos; sin él, todas las columnas como siempre.
+    `progreso` (dict opcional) recibe hojas_total, hojas_leidas y filas_leidas.
+    """
+    tamano = _TamanoBloque(chunk_rows, max_chunk_mb)
+    origen, es_xlsx = _abrir(fuente, suffix)
+
+    if es_xlsx:
+        return _iter_xlsx(origen, tamano, progreso, esquema)
+
+    return _iter_csv(origen, tamano, progreso, esquema)
+
+
+def _concatenar(dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    # Cada bloque trae sus propias categorías: unificarlas antes de concatenar
+    # (si no, pandas vuelve la columna a object)
+    if len(dfs) > 1:
+        for col in dfs[0].columns:
+            if all(isinstance(df[col].dtype, pd.CategoricalDtype) for df in dfs if col in df.columns):
+                categorias = union_categoricals([df[col] for df in dfs if col in df.columns]).categories
+                for df in dfs:
+                    if col in df.columns:
+                        df[col] = df[col].cat.set_categories(categorias)
+
+    return pd.concat(dfs, ignore_index=True)
+
+
+def load_stats(fuente: Fuente, suffix: str | None = None, esquema: dict | None = None) -> pd.DataFrame:
+    """
+    Archivo completo. Sin `esquema` devuelve lo mismo que read_excel /
+    read_csv (tipos inferidos por hoja); con `esquema`, por bloques y con
+    los tipos del esquema.
+    """
+    if esquema is not None:
+        bloques = iter_stats(fuente, suffix=suffix, esquema=esquema)
+    else:
+        origen, es_xlsx = _abrir(fuente, suffix)
+        tamano = _TamanoBloque()
+        bloques = _hojas_xlsx(origen, tamano) if es_xlsx else _iter_csv(origen, tamano, completo=True)
+
+    dfs = [df for df in bloques if not df.empty]
+
+    if not dfs:
+        if _abrir(fuente, suffix)[1]:
+            raise ValueError("El archivo Excel no contiene hojas válidas")
+        raise ValueError("El CSV está vacío")
+
+    return _concatenar(dfs)
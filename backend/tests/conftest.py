@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import pytest
+
+# Base y caché propias antes de importar la app (config lee el entorno al importar)
+_TMP = tempfile.mkdtemp(prefix="datastrike-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_TMP}/tests.db",
+    UPLOAD_CACHE_DIR=os.path.join(_TMP, "cache"),
+    XT_MODEL_PATH=os.path.join(_TMP, "xt_model.npz"),
+    COMPUTE_POOL_ENABLED="0",
+    SEED_ON_STARTUP="off",
+)
+
+EQUIPO, RIVAL = 91001, 91002
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    """App con tablas creadas y dos equipos de 4 jugadores (ids equipo*1000 + n)."""
+    from fastapi.testclient import TestClient
+
+    from app.db.session import SessionLocal
+    from app.main import app
+    from app.models.equipo import Equipo
+    from app.models.jugador import Jugador
+    from app.services.roster_cache import invalidar_plantilla
+
+    with TestClient(app) as c:
+        with SessionLocal() as db:
+            for equipo in (EQUIPO, RIVAL):
+                if db.get(Equipo, equipo) is None:
+                    db.add(Equipo(id=equipo, nombre=f"Equipo {equipo}"))
+                    db.add_all(
+                        Jugador(id=equipo * 1000 + n, nombre=f"Jugador {n}", equipo_id=equipo)
+                        for n in range(4)
+                    )
+            db.commit()
+        invalidar_plantilla()
+        yield c
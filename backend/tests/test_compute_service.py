@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import compute_service
+
+
+def _falla(db):
+    raise ValueError("File is not a zip file")
+
+
+def _lento(db, segundos):
+    time.sleep(segundos)
+    return segundos
+
+
+def test_error_del_worker_es_400():
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(compute_service.ejecutar(_falla))
+    assert e.value.status_code == 400
+    assert "zip" in e.value.detail
+
+
+def test_timeout_libera_el_cupo_de_lo_encolado(monkeypatch):
+    monkeypatch.setattr(compute_service, "COMPUTE_WORKERS", 1)
+    monkeypatch.setattr(compute_service, "_executor", None)
+
+    async def escenario():
+        ocupado = compute_service.enviar(_lento, 0.5)
+        with pytest.raises(HTTPException) as e:
+            await compute_service.ejecutar(_lento, 0, timeout=0.05)
+        assert e.value.status_code == 504
+        # El segundo trabajo seguía en cola: se cancela y su cupo vuelve enseguida
+        assert compute_service.estado()["pendientes"] == 1
+        return await asyncio.wrap_future(ocupado)
+
+    asyncio.run(escenario())
+    compute_service.shutdown()
@@ -0,0 +1,39 @@
+import pytest
+
+from app.auth.deps import get_current_user
+from app.services import file_service
+
+
+@pytest.fixture
+def usuario(cliente, tmp_path, monkeypatch):
+    from app.db.session import SessionLocal
+    from app.main import app
+    from app.models.user import User
+
+    monkeypatch.setattr(file_service, "UPLOAD_DIR", tmp_path)
+    with SessionLocal() as db:
+        user = db.query(User).filter_by(email="archivos@tests").one_or_none()
+        if user is None:
+            user = User(email="archivos@tests", nombre="Tests")
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        db.expunge(user)
+
+    app.dependency_overrides[get_current_user] = lambda: user
+    yield user
+    app.dependency_overrides.pop(get_current_user)
+
+
+def test_upload_devuelve_el_error_de_importacion(cliente, usuario):
+    r = cliente.post("/api/files/upload", files={"file": ("roto.xlsx", b"no es un zip")})
+    assert r.status_code == 200, r.text
+    assert r.json()["dataset"] is None
+    assert "zip" in r.json()["dataset_error"]
+
+
+def test_upload_de_archivo_sin_estadisticas_no_es_error(cliente, usuario):
+    r = cliente.post("/api/files/upload", files={"file": ("notas.txt", b"hola")})
+    assert r.status_code == 200, r.text
+    assert r.json()["dataset"] is None
+    assert r.json()["dataset_error"] is None
@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from conftest import EQUIPO, RIVAL
+
+
+EVENTOS = ["Tiro", "Pase incompleto", "Pase completo", "Duelo ganado", "Gol", "Centro completo"]
+
+
+def _filas():
+    for i in range(40):
+        equipo = EQUIPO if i % 3 else RIVAL
+        yield [EVENTOS[i % len(EVENTOS)], equipo * 1000 + i % 4, 10.5 + i, 5.25 * (i % 11), 30.0 + i, 12.5, 0.01 * (i % 7)]
+
+
+def _planilla() -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "1er tiempo"
+    ws.append(["Event", "id_jugador", "x", "y", "x2", "y2", "xG"])
+    for fila in _filas():
+        ws.append(fila)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def test_get_y_post_devuelven_los_mismos_eventos(cliente):
+    post = cliente.post(f"/api/kpis/by-equipo/{EQUIPO}", files={"file": ("partido.xlsx", _planilla())})
+    assert post.status_code == 200, post.text
+
+    get = cliente.get(f"/api/kpis/by-equipo/{EQUIPO}")
+    assert get.status_code == 200, get.text
+
+    eventos = post.json()["eventos"]
+    assert eventos and all("event" in e for e in eventos)
+    assert get.json()["eventos"] == eventos
+
+
+def test_eventos_por_tipo_empates_en_orden_de_aparicion(cliente):
+    post = cliente.post(f"/api/kpis/by-equipo/{EQUIPO}", files={"file": ("partido.xlsx", _planilla())})
+    get = cliente.get(f"/api/kpis/by-equipo/{EQUIPO}")
+
+    for jugador, datos in post.json()["por_jugador"].items():
+        # Lo que devolvía value_counts: más frecuente primero, empates por primera aparición
+        etiquetas = [f[0].lower() for f in _filas() if f[1] == int(jugador)]
+        esperado = sorted(dict.fromkeys(etiquetas), key=lambda e: -etiquetas.count(e))
+        assert list(datos["eventos_por_tipo"]) == esperado
+        # Mismo orden de claves desde los contadores guardados
+        assert list(get.json()["por_jugador"][jugador]["eventos_por_tipo"].items()) == list(
+            datos["eventos_por_tipo"].items()
+        )
+
+
+@pytest.fixture
+def modelo_xt_ajustado():
+    import os
+
+    import numpy as np
+
+    from app.core.config import XT_MODEL_PATH
+    from app.services.xt_service import guardar_modelo
+
+    valores = np.linspace(0.0, 0.3, 12 * 8).reshape(8, 12)
+    guardar_modelo(
+        {"valores": valores, "eventos": 0, "iteraciones": 0, "huella": "", "origen": "tests", "ajustado": ""},
+        XT_MODEL_PATH,
+    )
+    yield
+    os.remove(XT_MODEL_PATH)
+
+
+def test_get_y_post_devuelven_el_mismo_xt(cliente, modelo_xt_ajustado):
+    post = cliente.post(f"/api/kpis/by-equipo/{EQUIPO}", files={"file": ("partido.xlsx", _planilla())})
+    assert post.status_code == 200, post.text
+    get = cliente.get(f"/api/kpis/by-equipo/{EQUIPO}")
+    assert get.status_code == 200, get.text
+
+    xt = post.json()["xt"]
+    # El ranking por equipo es del partido completo: incluye al rival
+    assert {str(EQUIPO), str(RIVAL)} <= set(map(str, xt["por_equipo"]))
+    assert get.json()["xt"] == xt
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+@pytest.mark.skipif(
+    not (BACKEND / "data" / "Equipos.xlsx").exists(), reason="Sin los Excel de /data"
+)
+def test_seed_en_base_vacia(tmp_path):
+    # Proceso aparte: solo los modelos que importa el propio script
+    url = f"sqlite:///{tmp_path / 'vacia.db'}"
+    salida = subprocess.run(
+        [sys.executable, "-m", "app.scripts.load_excel", "--seed"],
+        cwd=BACKEND,
+        env={**os.environ, "DATABASE_URL": url},
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert salida.returncode == 0, salida.stdout + salida.stderr
+
+    engine = create_engine(url)
+    assert {"equipos", "jugadores", "user_files", "partidos", "eventos"} <= set(inspect(engine).get_table_names())
+    with engine.connect() as con:
+        assert con.execute(text("select count(*) from equipos")).scalar() > 0
+        assert con.execute(text("select count(*) from jugadores")).scalar() > 0
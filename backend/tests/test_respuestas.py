@@ -0,0 +1,48 @@
+import datetime as dt
+
+import numpy as np
+import orjson
+import pandas as pd
+import pytest
+from starlette.requests import Request
+
+from app.services.pipeline_service import tabla_columnas
+from app.utils.respuestas import ARROW, COLUMNAS, responder
+
+
+def _request(headers: dict | None = None) -> Request:
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    })
+
+
+@pytest.fixture
+def stats():
+    return pd.DataFrame({
+        "x": [1.5, np.nan, 3.0],
+        "evento": ["Pase", None, "Tiro"],
+        # Fecha con una celda vacía (NaT)
+        "fecha": pd.to_datetime([dt.datetime(2024, 1, 1, 20, 30), None, dt.datetime(2024, 1, 2)]),
+    })
+
+
+def test_columnas_fechas_con_nat(stats):
+    columnas = tabla_columnas(stats)
+    assert columnas["fecha"] == ["2024-01-01T20:30:00", None, "2024-01-02T00:00:00"]
+
+    r = responder(_request(), {"filas": 3, "columnas": columnas}, COLUMNAS, tabla="columnas")
+    cuerpo = orjson.loads(r.body)
+    assert cuerpo["columnas"]["fecha"] == ["2024-01-01T20:30:00", None, "2024-01-02T00:00:00"]
+    assert cuerpo["columnas"]["evento"] == {"codigos": [0, -1, 1], "etiquetas": ["Pase", "Tiro"]}
+
+
+def test_arrow_fechas_con_nat(stats):
+    pa = pytest.importorskip("pyarrow")
+
+    r = responder(_request(), {"filas": 3, "columnas": tabla_columnas(stats)}, ARROW, tabla="columnas")
+    tabla = pa.ipc.open_stream(r.body).read_all()
+    assert tabla.column("fecha").to_pylist() == ["2024-01-01T20:30:00", None, "2024-01-02T00:00:00"]
+    assert orjson.loads(tabla.schema.metadata[b"contenido"]) == {"filas": 3}
@@ -0,0 +1,37 @@
+import threading
+
+from sqlalchemy import create_engine
+
+from app.db import session
+
+
+def test_pool_mide_espera_y_overflow(tmp_path):
+    eng = create_engine(
+        f"sqlite:///{tmp_path}/pool.db",
+        connect_args={"check_same_thread": False},
+        poolclass=session._QueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=5,
+    )
+    session._medir_pool(eng, "prueba")
+
+    primera, segunda = eng.connect(), eng.connect()
+    # Pool y overflow ocupados: la tercera espera a que se libere una
+    threading.Timer(0.2, primera.close).start()
+    with eng.connect():
+        pass
+    segunda.close()
+    eng.dispose()
+
+    m = session._metricas.pop("prueba")
+    assert m["checkouts"] == 3
+    assert m["overflow_max"] == 1
+    assert m["espera_max_ms"] >= 150
+    assert m["espera_total_ms"] >= m["espera_max_ms"]
+
+
+def test_metricas_pool_exporta_espera_y_overflow(cliente):
+    db = cliente.get("/api/stats/cache").json()["db"]["sync"]
+    assert db["pool"] == "QueuePool"
+    assert {"en_uso", "overflow", "overflow_max", "espera_promedio_ms", "espera_max_ms"} <= set(db)
@@ -0,0 +1,159 @@
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from app.utils.stats_loader import infer_periodo, iter_stats, load_stats
+
+
+def _referencia(path) -> pd.DataFrame:
+    # Lo que hacía load_stats antes de leer por bloques: read_excel por hoja
+    xls = pd.ExcelFile(path)
+    dfs = []
+    for sheet in xls.sheet_names:
+        df = xls.parse(sheet)
+        if df.empty or len(df.columns) == 0:
+            continue
+        df.columns = df.columns.str.strip().str.lower()
+        df["periodo"] = infer_periodo(sheet)
+        dfs.append(df)
+    return pd.concat(dfs, ignore_index=True)
+
+
+@pytest.fixture
+def planilla(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "1er tiempo"
+    ws.append(["Event", "id_jugador", "x", "y", "nota", "fecha", "ok", "mixta"])
+    for i in range(30):
+        ws.append([
+            "Pase completo" if i % 3 else "n/a",
+            # ids como texto y como número en la misma columna
+            str(1001000 + i) if i % 2 else 1001000 + i,
+            10.5 + i if i % 5 else "NA",
+            i,
+            "N/A" if i % 4 == 0 else "texto",
+            dt.datetime(2024, 1, 1 + i % 20) if i % 7 else None,
+            bool(i % 2),
+            "abc" if i == 25 else i,
+        ])
+        # Filas vacías intermedias
+        if i in (3, 4, 17):
+            ws.append([None] * 8)
+        if i == 10:
+            ws.append([])
+    # Filas vacías al final de la hoja
+    ws.append([None] * 8)
+    ws.append([None] * 8)
+
+    ws2 = wb.create_sheet("2do tiempo")
+    ws2.append(["Event", "id_jugador", "x", "y"])
+    ws2.append(["Tiro", "1001005", "#DIV/0!", 3.0])
+    ws2.append(["Tiro", None, 2, "null"])
+
+    path = tmp_path / "partido.xlsx"
+    wb.save(path)
+    return path
+
+
+def test_load_stats_igual_a_read_excel(planilla):
+    esperado = _referencia(planilla)
+    df = load_stats(str(planilla))
+
+    pd.testing.assert_frame_equal(df, esperado)
+    assert df["id_jugador"].dtype == "float64"
+    assert df["x"].dtype == "float64"
+
+
+def test_load_stats_desde_bytes(planilla):
+    df = load_stats(planilla.read_bytes(), ".xlsx")
+    pd.testing.assert_frame_equal(df, _referencia(planilla))
+
+
+def test_bloques_con_el_mismo_dtype(planilla):
+    bloques = list(iter_stats(str(planilla), chunk_rows=7))
+    assert sum(len(b) for b in bloques) == len(_referencia(planilla))
+
+    hoja = [b for b in bloques if (b["periodo"] == "1T").all()]
+    for col in ["id_jugador", "x", "y", "mixta"]:
+        assert {str(b[col].dtype) for b in hoja} == {"float64"}, col
+    assert {str(b["nota"].dtype) for b in hoja} == {"object"}
+
+
+def _libro(tmp_path, hojas: dict[str, list[list]]):
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for nombre, filas in hojas.items():
+        ws = wb.create_sheet(nombre)
+        for fila in filas:
+            ws.append(fila)
+    path = tmp_path / "libro.xlsx"
+    wb.save(path)
+    return path
+
+
+def _igual_a_read_excel(path):
+    df = load_stats(str(path))
+    pd.testing.assert_frame_equal(df, _referencia(path))
+    return df
+
+
+def test_tipos_mixtos(tmp_path):
+    filas = [["Event", "enteros_y_texto", "floats_y_texto", "numeros_texto", "texto", "bool_vacio", "entero_float"]]
+    for i in range(12):
+        filas.append([
+            "Pase",
+            i if i % 4 else f"j{i}",
+            i + 0.5 if i % 5 else "sin dato",
+            str(100 + i),
+            f"t{i}",
+            (i % 2 == 0) if i % 3 else None,
+            float(i),
+        ])
+    df = _igual_a_read_excel(_libro(tmp_path, {"1er tiempo": filas}))
+    assert df["numeros_texto"].dtype == "int64"
+    assert df["bool_vacio"].dtype == "float64"
+    assert df["enteros_y_texto"].dtype == object
+
+
+def test_fechas(tmp_path):
+    filas = [["Event", "fecha", "fecha_vacia", "fecha_y_texto", "hora"]]
+    for i in range(10):
+        filas.append([
+            "Tiro",
+            dt.datetime(2024, 3, 1 + i, 18, 30),
+            dt.datetime(2024, 3, 1 + i) if i % 3 else None,
+            dt.datetime(2024, 3, 1 + i) if i % 2 else "pendiente",
+            dt.time(20, i),
+        ])
+    df = _igual_a_read_excel(_libro(tmp_path, {"2do tiempo": filas}))
+    assert pd.api.types.is_datetime64_any_dtype(df["fecha"])
+    assert df["fecha_vacia"].isna().sum() == 4
+
+
+def test_celdas_vacias(tmp_path):
+    filas = [["Event", "x", "vacia", "y"]]
+    filas.append([None, None, None, None])  # vacía justo después del encabezado
+    for i in range(8):
+        filas.append(["Pase", i if i != 3 else None, None, 1.5 * i])
+        if i == 5:
+            filas.append([])
+    filas.append(["Gol"])  # fila más corta que el encabezado
+    filas.append([None, None, None, None])
+    hojas = {"1er tiempo": filas, "2do tiempo": [["Event", "x"], ["Tiro", 2]], "Vacía": []}
+    df = _igual_a_read_excel(_libro(tmp_path, hojas))
+    assert df["vacia"].isna().all()
+
+
+@pytest.mark.parametrize("marcador", sorted(
+    ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+     "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+))
+def test_marcadores_na(tmp_path, marcador):
+    filas = [["Event", "valor", "texto"], ["Pase", 1.5, "a"], ["Pase", marcador, marcador], ["Pase", 3, "c"]]
+    df = _igual_a_read_excel(_libro(tmp_path, {"1er tiempo": filas}))
+    assert df["valor"].dtype == "float64"
+    assert pd.isna(df.loc[1, "texto"])
@@ -0,0 +1,34 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from conftest import EQUIPO, RIVAL
+
+
+def _csv(ids) -> bytes:
+    df = pd.DataFrame({"Event": "Pase completo", "id_jugador": ids, "x": np.arange(len(ids), dtype=float)})
+    return df.to_csv(index=False).encode()
+
+
+def test_equipo_id_siempre_float(cliente):
+    from app.db.session import SessionLocal
+    from app.services.stats_service import merge_stats_with_players
+
+    completos = pd.DataFrame({"player_id": [EQUIPO * 1000, RIVAL * 1000 + 1]})
+    con_faltante = pd.DataFrame({"player_id": [EQUIPO * 1000, 123]})
+    with SessionLocal() as db:
+        assert merge_stats_with_players(db, completos)["equipo_id"].dtype == "float64"
+        assert merge_stats_with_players(db, con_faltante)["equipo_id"].dtype == "float64"
+
+
+def test_stats_serializa_equipo_id_como_float(cliente):
+    r = cliente.post(
+        f"/api/stats/by-equipo/{EQUIPO}",
+        files={"file": ("partido.csv", _csv([EQUIPO * 1000, EQUIPO * 1000 + 1, RIVAL * 1000]))},
+    )
+    assert r.status_code == 200, r.text
+    filas = r.json()
+    assert len(filas) == 2
+    assert f'"equipo_id":{float(EQUIPO)}' in r.text.replace(" ", "")
+    assert all(isinstance(f["equipo_id"], float) for f in json.loads(r.text))